@@ -11,6 +11,7 @@ from typing import Any, AsyncGenerator, Dict, List, Optional
 from backend.agents.agents.intent_recognition_agent import IntentRecognitionAgent
 from backend.agents.manager.factories.intent_factory import IntentHandlerFactory
 from backend.agents.schema.agent import AgentState
+from backend.agents.tools.mcp_client import mcp_client
 from backend.common.log import logger
 
 # 导入新的模块化组件
@@ -36,11 +37,14 @@ class Agent:
         """智能编排主方法"""
         from backend.agents.schema.agent import InterruptedException
 
+        # 意图识别阶段预取的MCP请求哈希，流结束或中断时取消未被取用的预取
+        prefetched: List[str] = []
         try:
             async for intent_message in self.intent_recognition_agent.execute(
                 user_query=user_query,
                 conversation_history=conversation_history,
                 action=action,
+                prefetched=prefetched,
                 **kwargs,
             ):
                 yield intent_message
@@ -90,6 +94,8 @@ class Agent:
         except Exception as e:
             logger.error(f"❌ intent result is None: {str(e)}")
             yield {"type": "error", "message": f"❌ intent result is None: {str(e)}"}
+        finally:
+            mcp_client.cancel_prefetch(prefetched)
 
 
 # 创建全局代理实例
@@ -28,6 +28,7 @@ from backend.agents.schema.agent import AgentState, Base, ExecuteStatus, Respons
 from backend.agents.schema.analyze import AnalyzeMessagesResult
 from backend.agents.utils.data_reduce_strategy import DataReduceStrategy
 from backend.agents.utils.format_output import convert_to_dict, get_current_weekday, response_to_json
+from backend.agents.utils.llm_client_pool import llm_client_pool
 from backend.common.log import logger
 
 
@@ -44,7 +45,15 @@ class DataAnalyzeAgent(Base):
         self.task_id = task_id if task_id else str(uuid.uuid4())
 
         # 初始化数据缩减策略
-        self.data_reduce_strategy = DataReduceStrategy(self.llm)
+        llm_config = self.config.get("llm", {})
+        # 分块阶段的429重试由限流器负责，客户端自身不再重试，避免重试次数叠加且绕过令牌桶
+        map_llm = llm_client_pool.get({**llm_config, "max_retries": 0}, intent_name=f"{self.name}_map")
+        self.data_reduce_strategy = DataReduceStrategy(
+            map_llm,
+            model_name=llm_config.get("model_name"),
+            context_window=llm_config.get("context_window"),
+            task_id=self.task_id,
+        )
         # self.is_should_reduce_data = False
 
     async def stream_analyze_data(
@@ -166,6 +175,8 @@ class DataAnalyzeAgent(Base):
         try:
             self.bebug.append("大数据量的分析")
             start_time = time.time()
+            # 中断时由缩减策略取消仍在进行中的分片分析
+            kwargs.setdefault("interruption_checker", self.interruption_checker)
 
             # 直接使用异步生成器，无需队列轮询
             async for event in self.data_reduce_strategy.reduce_data_async_stream(
@@ -276,8 +287,12 @@ class DataAnalyzeAgent(Base):
 
             is_save_file = kwargs.get("is_save_file", True)
             if is_save_file:
-                self.result["file"] = self.data_export_tool.export_to_markdown(
-                    self.result["output"], self.task_id, f"data_analyze_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+                # 写文件放到线程中执行，避免阻塞事件循环
+                self.result["file"] = await asyncio.to_thread(
+                    self.data_export_tool.export_to_markdown,
+                    self.result["output"],
+                    self.task_id,
+                    f"data_analyze_{datetime.now().strftime('%Y%m%d%H%M%S')}",
                 )
                 ## 如果要求导出html，则将结果推给llm 生成一份html文件
                 if kwargs.get("result_format", "word") == "html":
@@ -353,7 +368,7 @@ class DataAnalyzeAgent(Base):
             response = await self.llm.ainvoke(messages)
             html_content = response.content.strip()
             logger.info(f"html_content: {html_content}")
-            return self.data_export_tool.export_to_html(html_content, task_id, filename)
+            return await asyncio.to_thread(self.data_export_tool.export_to_html, html_content, task_id, filename)
 
         except Exception as e:
             logger.error(f"convert_to_web_html failed: {str(e)}")
@@ -368,7 +383,7 @@ class DataAnalyzeAgent(Base):
     <pre>{content_str if 'content_str' in locals() else output}</pre>
 </body>
 </html>"""
-            return self.data_export_tool.export_to_html(fallback_html, task_id, filename)
+            return await asyncio.to_thread(self.data_export_tool.export_to_html, fallback_html, task_id, filename)
 
     async def get_system_prompt(self, user_query: str, **kwargs):
         """获取系统提示词"""
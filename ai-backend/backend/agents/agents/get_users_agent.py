@@ -7,6 +7,7 @@
 # -*- coding: utf-8 -*-
 
 
+import asyncio
 import time
 import uuid
 
@@ -17,6 +18,7 @@ from backend.agents.config.setting import settings
 from backend.agents.schema.agent import AgentState, Base, ExecuteStatus, ResponseType, YieldResponse
 from backend.agents.tools.data_to_markdown import users_to_markdown
 from backend.agents.tools.mcp_client import mcp_client
+from backend.agents.utils.token_utils import get_chunk_token_budget
 from backend.common.log import logger
 
 
@@ -39,22 +41,7 @@ class GetUsersAgent(Base):
             if not request:
                 return {"success": False, "message": "请求数据为空", "data": []}
             # 注入 crm_user_id 到顶层请求，满足 MCP 服务授权校验
-            crm_user_id = kwargs.get("crm_user_id")
-            logger.info(f"GetUsersAgent 接收到的crm_user_id: {crm_user_id}")
-            try:
-                if crm_user_id is not None:
-                    crm_str = str(crm_user_id).strip()
-                    if crm_str.isdigit():
-                        request["crm_user_id"] = int(crm_str)
-                        logger.info(f"GetUsersAgent 设置request中的crm_user_id: {request['crm_user_id']}")
-                    else:
-                        logger.warning(f"GetUsersAgent crm_user_id不是有效数字: {crm_str}")
-                else:
-                    logger.warning("GetUsersAgent crm_user_id为None")
-            except Exception as e:
-                # 保持健壮性，不因转换问题中断流程
-                logger.warning(f"GetUsersAgent 处理crm_user_id时出错: {e}")
-                pass
+            request = self.build_request(request, kwargs.get("crm_user_id"))
             self.result["request"] = request
             logger.debug("GetUsersAgent request", request)
             self.result["assistant"] = kwargs.get("assistant", None)
@@ -77,6 +64,29 @@ class GetUsersAgent(Base):
             error_msg = f"获取用户异常 <{str(e)}>"
             return {"success": False, "message": error_msg, "data": []}
 
+    @staticmethod
+    def build_request(request: Dict[str, Any], crm_user_id: Any) -> Dict[str, Any]:
+        """
+        组装MCP查询请求：将 crm_user_id 注入到顶层请求（原地修改）
+
+        意图识别阶段的数据预取也使用该方法，保证与正式查询的请求一致
+        """
+        logger.info(f"GetUsersAgent 接收到的crm_user_id: {crm_user_id}")
+        try:
+            if crm_user_id is not None:
+                crm_str = str(crm_user_id).strip()
+                if crm_str.isdigit():
+                    request["crm_user_id"] = int(crm_str)
+                    logger.info(f"GetUsersAgent 设置request中的crm_user_id: {request['crm_user_id']}")
+                else:
+                    logger.warning(f"GetUsersAgent crm_user_id不是有效数字: {crm_str}")
+            else:
+                logger.warning("GetUsersAgent crm_user_id为None")
+        except Exception as e:
+            # 保持健壮性，不因转换问题中断流程
+            logger.warning(f"GetUsersAgent 处理crm_user_id时出错: {e}")
+        return request
+
     def request_assistant(self, request: Dict[str, Any], query_types: List[str]):
         copy_request = request.copy()
         user_data = copy_request.get("user_data", {})
@@ -134,14 +144,23 @@ class GetUsersAgent(Base):
             users_markdown_data = None
             user_data = users_info.get("data", {})
             if users_info.get("success") and users_info.get("data"):
-                users_markdown_data = users_to_markdown(users_info)
+                llm_config = self.config.get("llm", {})
+                model_name = llm_config.get("model_name")
+                users_markdown_data = users_to_markdown(
+                    users_info,
+                    max_tokens=get_chunk_token_budget(model_name, llm_config.get("context_window")),
+                    model_name=model_name,
+                )
             self.result["data"] = user_data
             is_save_file = kwargs.get("is_save_file", True)
             if is_save_file and users_markdown_data and isinstance(users_markdown_data, list):
                 files = []
                 for index, users_markdown_data_item in enumerate(users_markdown_data):
-                    file = self.data_export_tool.export_to_markdown(
-                        users_markdown_data_item, self.task_id, f"users_info_{len(user_data)}_{index + 1}"
+                    file = await asyncio.to_thread(
+                        self.data_export_tool.export_to_markdown,
+                        users_markdown_data_item,
+                        self.task_id,
+                        f"users_info_{len(user_data)}_{index + 1}",
                     )
                     logger.debug(f"GetUsersAgent file :{file}")
                     files.append(file)
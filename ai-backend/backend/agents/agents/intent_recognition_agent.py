@@ -6,24 +6,48 @@
 # !/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import copy
 import json
 import uuid
 
 from datetime import datetime
-from typing import Any, AsyncGenerator, Dict, List, Optional
+from functools import lru_cache
+from string import Template
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
 
 from backend.agents.agents.extract_parameters_agent import ExtractParametersAgent
+from backend.agents.agents.get_users_agent import GetUsersAgent
 from backend.agents.config.examples import intent_examples, intent_parameters_examples
-from backend.agents.config.mcp import get_data_sources_prompt
+from backend.agents.config.mcp import INTENT_PATTERNS, get_data_sources_prompt
 from backend.agents.config.prompt.agent import ERROR_SYSTEM_PROMPT
 from backend.agents.config.prompt.extract_parameters import INTENT_PARAMETERS_PROMPT
-from backend.agents.config.prompt.intent_analysis import INTENT_PROMPT
+from backend.agents.config.prompt.intent_analysis import INTENT_COMBINED_PROMPT, INTENT_PROMPT
+from backend.agents.config.setting import settings
 from backend.agents.schema.agent import AgentState, Base, ExecuteStatus, ResponseType, YieldResponse
 from backend.agents.services.assistant_service import assistant_service
-from backend.agents.utils.format_output import convert_to_dict, response_to_json, simulate_stream
+from backend.agents.tools.mcp_client import mcp_client
+from backend.agents.utils.format_output import convert_to_dict, response_to_json
 from backend.common.log import logger
 
 
+@lru_cache(maxsize=64)
+def _precompile(template: Template, static_items: Tuple[Tuple[str, str], ...]) -> Template:
+    """预先填充模板中的静态部分（数据源说明、示例），返回只含动态占位符的模板"""
+    return Template(template.safe_substitute({key: value.replace("$", "$$") for key, value in static_items}))
+
+
+def _intent_template(combined: bool) -> Template:
+    """意图识别模板，合并模式下包含全部数据源的参数说明"""
+    static_items = (("data_sources", get_data_sources_prompt()), ("examples", intent_examples))
+    if not combined:
+        return _precompile(INTENT_PROMPT, static_items)
+    static_items += (
+        ("parameters", get_data_sources_prompt(tuple(INTENT_PATTERNS))),
+        ("parameter_examples", intent_parameters_examples),
+    )
+    return _precompile(INTENT_COMBINED_PROMPT, static_items)
+
+
 class IntentRecognitionAgent(Base):
     """
     意图识别智能体，专门负责识别用户意图
@@ -37,17 +61,14 @@ class IntentRecognitionAgent(Base):
         self.task_id = task_id if task_id else str(uuid.uuid4())
         self.extract_parameters_agent = ExtractParametersAgent(task_id=task_id, config=config)
 
-    async def get_intent_prompt(self, user_query: str):
-        """获取意图识别提示词"""
+    async def get_intent_prompt(self, user_query: str, combined: bool = False):
+        """获取意图识别提示词，combined 为 True 时同时要求提取参数"""
         try:
             agent_assistant = await assistant_service.get_agent_assistant()
-            data_sources = get_data_sources_prompt()
 
-            prompt = INTENT_PROMPT.substitute(
+            prompt = _intent_template(combined).substitute(
                 user_query=user_query,
                 agent_assistant=agent_assistant,
-                data_sources=data_sources,
-                examples=intent_examples,
                 current_time=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             )
             return prompt
@@ -64,9 +85,10 @@ class IntentRecognitionAgent(Base):
                 next_step = "正在获取数据"
             else:
                 next_step = "正在制定任务计划"
-            prompt = INTENT_PARAMETERS_PROMPT.substitute(
-                parameters=parameters,
-                examples=intent_parameters_examples,
+            template = _precompile(
+                INTENT_PARAMETERS_PROMPT, (("parameters", parameters), ("examples", intent_parameters_examples))
+            )
+            prompt = template.substitute(
                 current_time=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
                 user_query=user_query,
                 next_step=next_step,
@@ -91,8 +113,9 @@ class IntentRecognitionAgent(Base):
             logger.info("Extracting intent parameters")
 
             action = kwargs.get("action")
-            prompt = await self.get_intent_prompt(user_query)
-            self.add_log("提示词模板", INTENT_PROMPT.template)
+            combined = settings.INTENT_COMBINED_MODE
+            prompt = await self.get_intent_prompt(user_query, combined)
+            self.add_log("提示词模板", (INTENT_COMBINED_PROMPT if combined else INTENT_PROMPT).template)
             self.add_log("组装提示词", prompt)
 
             # print("intent_recognition_agent prompt=========", prompt)
@@ -133,19 +156,22 @@ class IntentRecognitionAgent(Base):
                 )
                 return
 
-            if data.get("tip") and data.get("selected_service") != "chat":
-                async for chunk in simulate_stream(f"{data.get('tip')}\n"):
-                    yield YieldResponse(
-                        name=f"{self.name}_tip",
-                        type=ResponseType.CHAT,
-                        status=ExecuteStatus.RUNNING,
-                        message=chunk,
-                    )
-
             data = self.check_action(action, data)
             # print("intent_recognition_agent data=========", data)
 
-            if data.get("data_sources", []) and data.get("selected_service") != "chat":
+            # 合并模式下模型已返回各数据源的参数，无需再次提取
+            parameters_ready = combined and isinstance(data.get("data_sources"), dict)
+
+            # 提示语来自 JSON 结果，整段输出
+            if data.get("tip") and data.get("selected_service") != "chat":
+                yield YieldResponse(
+                    name=f"{self.name}_tip",
+                    type=ResponseType.CHAT,
+                    status=ExecuteStatus.RUNNING,
+                    message=f"{data.get('tip')}\n",
+                )
+
+            if not parameters_ready and data.get("data_sources", []) and data.get("selected_service") != "chat":
                 prompt = await self.get_intent_parameters_prompt(user_query, data)
                 # print("参数提取prompt=========", prompt)
                 parameters_data = {}
@@ -154,19 +180,21 @@ class IntentRecognitionAgent(Base):
                         parameters_data = yieldResponse.output
                         break
                 self.bebug = self.bebug + self.extract_parameters_agent.bebug
-                if parameters_data.get("tip") and data.get("selected_service") != "chat":
-                    async for chunk in simulate_stream(f"{parameters_data.get('tip')}\n"):
-                        yield YieldResponse(
-                            name=f"{self.name}_tip",
-                            type=ResponseType.CHAT,
-                            status=ExecuteStatus.RUNNING,
-                            message=chunk,
-                        )
                 data["data_sources"] = parameters_data.get("data_sources")
+                if parameters_data.get("tip") and data.get("selected_service") != "chat":
+                    yield YieldResponse(
+                        name=f"{self.name}_tip",
+                        type=ResponseType.CHAT,
+                        status=ExecuteStatus.RUNNING,
+                        message=f"{parameters_data.get('tip')}\n",
+                    )
                 # print("参数提取data_sources=========", data["data_sources"])
 
             if data["data_sources"] and data.get("do_next") == False:
                 data["do_next"] = True
+            # 澄清轮次（do_next 为 False）不会继续执行任务，不预取
+            if data.get("do_next") != False:
+                self.prefetch_data(data, kwargs.get("crm_user_id"), kwargs.get("prefetched"))
             log_result["content"] = json.dumps(data, ensure_ascii=False, indent=2)
             # print("log_result=========", log_result)
             self.add_log("输出返回的结果", log_result)
@@ -197,16 +225,14 @@ class IntentRecognitionAgent(Base):
                 self.state = AgentState.FAILED
                 return
 
-            # Add streaming simulation for intent data
             if intent_data.get("do_next") == False:
                 if intent_data.get("suggested_response"):
-                    async for chunk in simulate_stream(intent_data.get("suggested_response")):
-                        yield YieldResponse(
-                            name=f"{self.name}_suggested_response",
-                            type=ResponseType.CHAT,
-                            status=ExecuteStatus.RUNNING,
-                            message=chunk,
-                        )
+                    yield YieldResponse(
+                        name=f"{self.name}_suggested_response",
+                        type=ResponseType.CHAT,
+                        status=ExecuteStatus.RUNNING,
+                        message=intent_data.get("suggested_response"),
+                    )
                 logger.info(
                     f"do_next:{intent_data.get('do_next')},suggested_response:{intent_data.get('suggested_response')}"
                 )
@@ -237,6 +263,30 @@ class IntentRecognitionAgent(Base):
                 message=error_msg,
             )
 
+    def prefetch_data(
+        self, intent_data: Dict[str, Any], crm_user_id: Any = None, prefetched: Optional[List[str]] = None
+    ) -> None:
+        """
+        数据源参数确定后立即预取MCP数据，与任务规划等后续步骤并行
+
+        只预取与获取用户数据任务请求一致的查询：助理服务在包含 user_data 时会按助理配置改写请求，不做预取
+        prefetched 收集预取的请求哈希，由调用方在流结束或中断时取消未被取用的预取
+        """
+        data_sources = intent_data.get("data_sources")
+        selected_service = intent_data.get("selected_service")
+        if not settings.INTENT_PREFETCH_ENABLED or not data_sources or not isinstance(data_sources, dict):
+            return
+        if selected_service not in ["mcp", "report", "agent"]:
+            return
+        if selected_service == "agent" and "user_data" in data_sources:
+            return
+        try:
+            request_hash = mcp_client.prefetch(GetUsersAgent.build_request(copy.deepcopy(data_sources), crm_user_id))
+            if prefetched is not None:
+                prefetched.append(request_hash)
+        except Exception as e:
+            logger.warning(f"预取MCP数据失败: {e}")
+
     def check_action(self, action: str, intent_data: Dict[str, Any]):
         """检查动作"""
         selected_service = intent_data.get("selected_service")
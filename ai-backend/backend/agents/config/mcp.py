@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 INTENT_PATTERNS = {
     "user_data": {
         "name": "用户基本信息",
@@ -1925,6 +1927,18 @@ def get_intent_patterns_prompt():
 
 
 def get_data_sources_prompt(data_sources: list = None):
+    # 数据源说明只取决于选中的数据源集合，按集合缓存，避免每次请求重新拼接
+    try:
+        if isinstance(data_sources, (list, tuple, set, dict)):
+            data_sources = frozenset(data_sources)
+        return _build_data_sources_prompt(data_sources or None)
+    except TypeError:
+        # 模型返回的数据源中含不可哈希元素时不缓存
+        return _build_data_sources_prompt.__wrapped__(data_sources)
+
+
+@lru_cache(maxsize=256)
+def _build_data_sources_prompt(data_sources=None):
     prompt = ""
     for intent_type, config in INTENT_PATTERNS.items():
         if data_sources:
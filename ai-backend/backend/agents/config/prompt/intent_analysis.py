@@ -68,3 +68,19 @@ INTENT_PROMPT = Template("""
   $examples
   当前时间: $current_time
 """)
+
+# 合并模式：意图识别与参数提取在一次调用中完成
+INTENT_COMBINED_PROMPT = Template(
+    INTENT_PROMPT.template
+    + """
+  7、参数提取（与意图识别一次完成）：
+    selected_service 不是 chat 时，还需要按照下列参数说明，提取每个选中数据源需要的参数。
+    此时输出中的 data_sources 不再是列表，而是字典：键为选中的数据源，值为该数据源提取出的参数，参数不能瞎编，不存在就为空字典。
+    selected_service 为 chat 时 data_sources 为空字典。
+    各数据源的参数说明：
+    $parameters
+
+  **参数提取示例**（只展示 data_sources 字段）：
+  $parameter_examples
+"""
+)
@@ -50,6 +50,11 @@ class Settings(BaseSettings):
     # .env MCP 服务
     MCP_SERVICE_URL: str = os.getenv("MCP_SERVICE_URL")  # MCP 服务的 URL
     MCP_API_KEY: str = os.getenv("MCP_API_KEY")  # MCP 服务的 API 密钥
+    # MCP HTTP 连接池（长连接复用，避免每次请求重新建立 TCP/TLS 连接）
+    MCP_HTTP_MAX_CONNECTIONS: int = int(os.getenv("MCP_HTTP_MAX_CONNECTIONS", "100"))
+    MCP_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("MCP_HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    MCP_HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("MCP_HTTP_KEEPALIVE_EXPIRY", "30"))
+    MCP_HTTP2: bool = os.getenv("MCP_HTTP2", "false").lower() == "true"  # 需安装 h2
 
     # 通用对话模型配置
     GENERAL_CHAT_LLM_API_KEY: str = os.getenv("GENERAL_CHAT_LLM_API_KEY", "")
@@ -74,7 +79,67 @@ class Settings(BaseSettings):
     SPLIT_CHUNK_OVERLAP: int = 200  # 增加重叠，保证上下文连续性
     SPLIT_MAX_ITEMS_PER_CHUNK: int = 100  # 减少每块处理的项目数
     SPLIT_USE_PARALLEL: bool = True  # 是否使用并行处理
-    SPLIT_PARALLEL_MAX_WORKERS: int = 5  # 并行处理的最大worker数量
+    SPLIT_PARALLEL_MAX_WORKERS: int = int(os.getenv("SPLIT_PARALLEL_MAX_WORKERS", "5"))  # 并行处理的最大并发LLM调用数
+    SPLIT_REDUCE_MAX_LEVELS: int = 3  # 分层合并（tree reduce）的最大层数
+    SPLIT_INTERRUPT_CHECK_INTERVAL: float = 0.5  # 等待分块结果时检查用户中断的间隔（秒）
+    SPLIT_RESERVED_TOKENS: int = 28000  # 分块预算需为系统提示词和模型输出预留的token数
+    SPLIT_RESPONSE_RESERVED_TOKENS: int = 4096  # Map阶段单个分块为模型输出预留的token数
+
+    # LLM调用限流（按模型的令牌桶）与429重试
+    LLM_RATE_LIMIT_RPM: int = int(os.getenv("LLM_RATE_LIMIT_RPM", "60"))  # 每分钟请求数，0表示不限流
+    LLM_RATE_LIMIT_BURST: int = int(os.getenv("LLM_RATE_LIMIT_BURST", "5"))  # 允许的突发请求数
+    LLM_RETRY_MAX_ATTEMPTS: int = 3  # 429最大重试次数
+    LLM_RETRY_BASE_DELAY: float = 2.0  # 退避基础时间（秒）
+    LLM_RETRY_MAX_DELAY: float = 30.0  # 退避最大时间（秒）
+
+    # LLM客户端池（按模型配置复用客户端与HTTP长连接）
+    LLM_CLIENT_POOL_MAX_SIZE: int = 32  # 池中最多保留的客户端数
+    LLM_CLIENT_POOL_IDLE_SECONDS: int = 600  # 空闲超过该时长的客户端重新创建
+    LLM_MODEL_MAX_CONCURRENCY: int = int(
+        os.getenv("LLM_MODEL_MAX_CONCURRENCY", "16")
+    )  # 单模型并发请求上限，0表示不限制
+    LLM_HTTP_MAX_CONNECTIONS: int = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100"))
+    LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "30"))
+
+    # 意图识别
+    INTENT_COMBINED_MODE: bool = (
+        os.getenv("INTENT_COMBINED_MODE", "false").lower() == "true"
+    )  # 一次调用同时完成意图识别与参数提取（提示词包含全部数据源参数说明）
+    INTENT_PREFETCH_ENABLED: bool = (
+        os.getenv("INTENT_PREFETCH_ENABLED", "true").lower() == "true"
+    )  # 数据源参数确定后立即预取MCP数据，与后续步骤并行
+    INTENT_PREFETCH_TTL_SECONDS: int = 60  # 预取结果未被使用时的保留时长
+
+    # Token计数（基于tiktoken分词器，未安装时回退为字符规则估算）
+    TOKENIZER_ENABLED: bool = os.getenv("TOKENIZER_ENABLED", "true").lower() == "true"
+    TOKENIZER_DEFAULT_ENCODING: str = os.getenv("TOKENIZER_DEFAULT_ENCODING", "cl100k_base")  # 非OpenAI模型使用的编码
+    TOKEN_COUNT_CACHE_SIZE: int = 4096  # 计数结果LRU缓存条数
+    TOKEN_COUNT_CACHE_MAX_TEXT_LENGTH: int = 8192  # 超过该长度的文本不缓存
+    # 模型上下文长度（按模型标识前缀匹配，模型配置中的 context_window 优先）
+    DEFAULT_MODEL_CONTEXT_WINDOW: int = 128000
+    MODEL_CONTEXT_WINDOWS: Dict[str, int] = {
+        "deepseek": 128000,
+        "gpt-4o": 128000,
+        "gpt-4-turbo": 128000,
+        "gpt-4.1": 1000000,
+        "gpt-4": 8192,
+        "gpt-3.5-turbo": 16385,
+        "qwen-long": 1000000,
+        "qwen": 128000,
+        "moonshot-v1-8k": 8192,
+        "moonshot-v1-32k": 32768,
+        "moonshot-v1-128k": 128000,
+        "glm-4": 128000,
+    }
+
+    # 调试产物（分块内容等），默认关闭；开启后在后台线程写入 <目录>/<日期>/<task_id>/
+    DEBUG_ARTIFACTS_ENABLED: bool = os.getenv("DEBUG_ARTIFACTS_ENABLED", "false").lower() == "true"
+    DEBUG_ARTIFACTS_DIR: str = os.getenv("DEBUG_ARTIFACTS_DIR", "")  # 为空时使用 agents/static/debug
+    DEBUG_ARTIFACTS_MAX_FILE_BYTES: int = 1024 * 1024  # 单个文件上限，超出部分截断
+    DEBUG_ARTIFACTS_MAX_TASK_BYTES: int = 20 * 1024 * 1024  # 单个任务上限，超出后不再写入
+    DEBUG_ARTIFACTS_MAX_PENDING: int = 100  # 待写入队列上限，超出时丢弃
+    DEBUG_ARTIFACTS_RETENTION_DAYS: int = int(os.getenv("DEBUG_ARTIFACTS_RETENTION_DAYS", "3"))
 
     # 缓存
     is_cache_request: bool = os.getenv("IS_CACHE_REQUEST", "true").lower() == "true"
@@ -8,7 +8,7 @@ import time
 
 from abc import ABC, abstractmethod
 from enum import Enum
-from typing import Any, AsyncGenerator, Callable, Dict, Generator, List, Optional
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, Generator, List, Optional
 
 from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
 from pydantic import BaseModel
@@ -16,10 +16,9 @@ from pydantic import BaseModel
 from backend.agents.config.prompt.agent import (
     CHAT_SYSTEM_PROMPT,
 )
-from backend.agents.config.setting import settings
 from backend.agents.tools.data_export_tool import DataExportTool
 from backend.agents.utils.format_output import convert_to_dict
-from backend.common.logging_chatopenai import LoggingChatOpenAI
+from backend.agents.utils.llm_client_pool import llm_client_pool
 
 
 class AgentState(Enum):
@@ -139,24 +138,8 @@ class Base(ABC):
     def _init_instance(self):
         """Initialize the LLM and state graph"""
         try:
-            llm_config = self.config.get("llm", {})
-            api_key = llm_config.get("api_key", settings.GENERAL_CHAT_LLM_API_KEY)
-            base_url = llm_config.get("base_url", settings.GENERAL_CHAT_LLM_BASE_URL)
-            model_name = llm_config.get("model_name", settings.GENERAL_CHAT_LLM_MODEL_NAME)
-            temperature = llm_config.get("temperature", settings.GENERAL_CHAT_LLM_TEMPERATURE)
-            model_id = llm_config.get("id")  # 获取模型ID
-            # Initialize LLM with logging
-            self.llm = LoggingChatOpenAI(
-                intent_name=self.name,
-                model_alias_name=llm_config.get("name", "unknown"),
-                api_key=api_key,
-                base_url=base_url,
-                model=model_name,
-                temperature=temperature,
-                timeout=llm_config.get("timeout", 60),
-                max_retries=llm_config.get("max_retries", 2),
-                model_id=model_id,  # 传递模型ID
-            )
+            # 从进程内客户端池借用，相同模型配置的智能体共享客户端与长连接
+            self.llm = llm_client_pool.get(self.config.get("llm", {}), intent_name=self.name)
         except Exception as e:
             raise e
 
@@ -264,33 +247,36 @@ class Base(ABC):
         except Exception as e:
             raise Exception(f"对话失败: {str(e)}")
 
-    async def _invoke_with_interruption_check(self, messages: List[BaseMessage]) -> AIMessage:
+    async def _await_with_interruption_check(self, awaitable: Awaitable) -> Any:
         """
-        带中断检查的异步 invoke
-        使用 asyncio.Task 包装，支持中断取消
+        带中断检查的等待
+        使用 asyncio.Task 包装，中断、外部取消或其他异常退出时都会取消正在等待的调用
         """
-        # 创建异步调用任务
-        task = asyncio.create_task(self.llm.ainvoke(messages))
+        task = asyncio.ensure_future(awaitable)
 
         # 定期检查中断状态，同时等待任务完成
         check_interval = 0.1  # 每0.1秒检查一次
-        while not task.done():
-            try:
+        try:
+            while not task.done():
                 # 检查中断
                 self.check_interruption()
                 # 等待一小段时间或任务完成
                 await asyncio.wait({task}, timeout=check_interval)
-            except InterruptedException:
-                # 取消任务
+
+            # 返回结果
+            return task.result()
+        finally:
+            if not task.done():
+                # 取消任务并等待其结束，避免模型调用在后台继续运行
                 task.cancel()
                 try:
                     await task
-                except asyncio.CancelledError:
+                except (asyncio.CancelledError, Exception):
                     pass
-                raise
 
-        # 返回结果
-        return await task
+    async def _invoke_with_interruption_check(self, messages: List[BaseMessage]) -> AIMessage:
+        """带中断检查的异步 invoke"""
+        return await self._await_with_interruption_check(self.llm.ainvoke(messages))
 
     def invoke(self, messages: List[BaseMessage], log: str = "") -> AIMessage:
         """
@@ -374,10 +360,22 @@ class Base(ABC):
             start_time = time.time()
 
             # 使用异步流 - astream() 现在是真正的异步生成器
-            async for chunk in self.llm.astream(messages):
-                # 每次输出前检查中断
-                self.check_interruption()
-                yield chunk
+            # 有中断检查器时等待每个分片期间也检查中断，模型迟迟不出分片时同样可以取消
+            iterator = self.llm.astream(messages).__aiter__()
+            try:
+                while True:
+                    try:
+                        if self.interruption_checker:
+                            chunk = await self._await_with_interruption_check(iterator.__anext__())
+                        else:
+                            chunk = await iterator.__anext__()
+                    except StopAsyncIteration:
+                        break
+                    # 每次输出前检查中断
+                    self.check_interruption()
+                    yield chunk
+            finally:
+                await iterator.aclose()
 
             duration = time.time() - start_time
             self.bebug.append(f"耗时: {duration} 秒")
@@ -10,13 +10,13 @@ JSON数据转Markdown格式显示工具
 """
 
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
 
 # backend_dir = Path(__file__).parent.parent.parent.parent
 # sys.path.insert(0, str(backend_dir))
 from backend.agents.config.mcp import INTENT_PATTERNS
 from backend.agents.config.setting import settings
-from backend.agents.utils.token_utils import estimate_tokens
+from backend.agents.utils.token_utils import get_token_counter
 from backend.utils.format_output import extract_json
 
 
@@ -29,40 +29,77 @@ def format_timestamp(timestamp_str: str) -> str:
         return timestamp_str
 
 
-def format_table_data(columns: List[str], rows: List[List[Any]], is_split: bool = False):
-    """格式化表格数据为Markdown表格"""
-    if not columns or not rows:
-        return "无数据"
+def format_table_cell(cell: Any) -> str:
+    """格式化表格单元格"""
+    if cell is None:
+        return "`null`"
+    elif isinstance(cell, str):
+        return f"`{cell}`"
+    elif isinstance(cell, (int, float)):
+        return str(cell)
+    else:
+        return f"`{str(cell)}`"
+
+
+def iter_table_chunks(
+    columns: List[str],
+    rows: Iterable[List[Any]],
+    max_tokens: Optional[float] = None,
+    count_tokens: Optional[Callable[[str], float]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """逐块生成Markdown表格
+
+    每行的token数只计算一次并累加，超过 max_tokens 时输出当前块（每块都带表头），
+    整体耗时与行数成线性关系。max_tokens 为 None 时不拆分。
+
+    参数:
+        count_tokens: token计数函数，默认使用默认模型的分词器
+
+    返回:
+        生成 {"content": 表格字符串, "count": 行数} 的迭代器
+    """
+    if count_tokens is None:
+        count_tokens = get_token_counter().count
 
     # 创建表头
     header = "| " + " | ".join(columns) + " |"
     separator = "| " + " | ".join(["---"] * len(columns)) + " |"
+    # 表头、分隔行及其间换行符的token数
+    base_tokens = count_tokens(header) + count_tokens(separator) + 1 if max_tokens is not None else 0
 
-    # 创建数据行
-    data_rows = []
-    current_row = []
-    current_rows_count = 0
+    current_rows = []
+    current_tokens = base_tokens
     for row in rows:
-        formatted_row = []
-        for cell in row:
-            if cell is None:
-                formatted_row.append("`null`")
-            elif isinstance(cell, str):
-                formatted_row.append(f"`{cell}`")
-            elif isinstance(cell, (int, float)):
-                formatted_row.append(str(cell))
-            else:
-                formatted_row.append(f"`{str(cell)}`")
-        current_row.append("| " + " | ".join(formatted_row) + " |")
-        current_rows_count += 1
-        current_row_str = "\n".join([header, separator] + current_row)
-        # print("current_row_str",estimate_tokens(current_row_str),settings.SPLIT_MAX_TOKEN)
-        if is_split and estimate_tokens(current_row_str) > settings.SPLIT_MAX_TOKEN * 0.95:
-            data_rows.append({"content": current_row_str, "count": current_rows_count})
-            current_row = []
-            current_rows_count = 0
-    if current_row:
-        data_rows.append({"content": "\n".join([header, separator] + current_row), "count": current_rows_count})
+        row_str = "| " + " | ".join([format_table_cell(cell) for cell in row]) + " |"
+        current_rows.append(row_str)
+        if max_tokens is None:
+            continue
+        # 每行额外计入一个换行符
+        current_tokens += count_tokens(row_str) + 1
+        if int(current_tokens) > max_tokens:
+            yield {"content": "\n".join([header, separator] + current_rows), "count": len(current_rows)}
+            current_rows = []
+            current_tokens = base_tokens
+    if current_rows:
+        yield {"content": "\n".join([header, separator] + current_rows), "count": len(current_rows)}
+
+
+def format_table_data(
+    columns: List[str],
+    rows: List[List[Any]],
+    is_split: bool = False,
+    max_tokens: Optional[int] = None,
+    model_name: Optional[str] = None,
+):
+    """格式化表格数据为Markdown表格
+
+    is_split 为 True 时按 max_tokens（默认 SPLIT_MAX_TOKEN）的95%拆分为多块，token 数使用 model_name 对应的分词器计算
+    """
+    if not columns or not rows:
+        return "无数据"
+
+    split_tokens = (max_tokens or settings.SPLIT_MAX_TOKEN) * 0.95 if is_split else None
+    data_rows = list(iter_table_chunks(columns, rows, split_tokens, get_token_counter(model_name).count))
     if len(data_rows) == 1:
         return data_rows[0]["content"]
     else:
@@ -147,7 +184,13 @@ def format_user_timestamp(timestamp: int) -> str:
         return str(timestamp)
 
 
-def format_user_data_table(table_name: str, table_data: Dict[str, Any], is_split: bool = False):
+def format_user_data_table(
+    table_name: str,
+    table_data: Dict[str, Any],
+    is_split: bool = False,
+    max_tokens: Optional[int] = None,
+    model_name: Optional[str] = None,
+):
     """格式化用户数据表格"""
     mcp_table_name = INTENT_PATTERNS.get(table_name, {}).get("name", table_name)
     if not table_data or "rows" not in table_data or "columns" not in table_data:
@@ -170,7 +213,7 @@ def format_user_data_table(table_name: str, table_data: Dict[str, Any], is_split
     markdown_parts = []
     markdown_parts_str = ""
     if columns and rows:
-        table_data = format_table_data(columns, rows, is_split)
+        table_data = format_table_data(columns, rows, is_split, max_tokens, model_name)
         if isinstance(table_data, list):
             for item in table_data:
                 markdown_parts.append(f"**{mcp_table_name}** (共 {item['count']} 条记录):\n{item['content']}\n")
@@ -194,11 +237,35 @@ def get_table_display_order() -> List[str]:
     return list(INTENT_PATTERNS.keys())
 
 
-def users_to_markdown(users_data: Dict[str, Any]) -> str:
-    """将表转换为Markdown格式"""
+def users_to_markdown(
+    users_data: Dict[str, Any], max_tokens: Optional[int] = None, model_name: Optional[str] = None
+) -> List[str]:
+    """将表转换为Markdown格式
+
+    按 max_tokens（默认 SPLIT_MAX_TOKEN，可通过 get_chunk_token_budget 按模型上下文计算）拆分为多段，
+    token 数使用 model_name 对应的分词器计算，每段只累加新增部分的token数。
+    """
+    max_tokens = max_tokens or settings.SPLIT_MAX_TOKEN
+    counter = get_token_counter(model_name)
+
     result_markdown = []
 
     markdown_parts = []
+    markdown_parts_tokens = 0
+
+    def append_part(part: str) -> None:
+        """添加一段内容，超过token限制时先保存之前的段落"""
+        nonlocal markdown_parts, markdown_parts_tokens
+        part_tokens = counter.count(part)
+        # 段落之间以换行符连接，计入1个token
+        if markdown_parts and markdown_parts_tokens + part_tokens + 1 > max_tokens:
+            result_markdown.append("\n".join(markdown_parts))
+            markdown_parts = []
+            markdown_parts_tokens = 0
+        if markdown_parts:
+            markdown_parts_tokens += 1
+        markdown_parts.append(part)
+        markdown_parts_tokens += part_tokens
 
     # 获取所有查询的表名（包括成功和失败的查询）
     all_queried_tables = set()
@@ -238,94 +305,54 @@ def users_to_markdown(users_data: Dict[str, Any]) -> str:
         table_data = data_dict.get(table_name)
         if table_data and isinstance(table_data, dict) and "columns" in table_data:
             # 有数据的表
-            user_data_table = format_user_data_table(table_name, table_data, is_split=True)
+            user_data_table = format_user_data_table(
+                table_name, table_data, is_split=True, max_tokens=max_tokens, model_name=model_name
+            )
             if isinstance(user_data_table, list):
                 # 列表类型的数据需要分段处理
                 for item in user_data_table:
-                    # 检查添加当前item后是否会超过token限制
-                    is_split, combined_str = split_markdown_parts(markdown_parts, [item])
-                    if is_split:
-                        # 需要分割，先保存之前的 markdown_parts
-                        if markdown_parts:
-                            markdown_parts_str = "\n".join(markdown_parts)
-                            result_markdown.append(markdown_parts_str)
-                            markdown_parts = []
-                        # 将当前item添加到新的段落
-                        markdown_parts.append(item)
-                    else:
-                        # 不需要分割，直接添加到当前段落
-                        markdown_parts.append(item)
+                    append_part(item)
             else:
-                # 非列表类型，直接处理
-                is_split, combined_str = split_markdown_parts(markdown_parts, [user_data_table])
-                if is_split:
-                    # 需要分割，先保存之前的 markdown_parts
-                    if markdown_parts:
-                        markdown_parts_str = "\n".join(markdown_parts)
-                        result_markdown.append(markdown_parts_str)
-                        markdown_parts = []
-                    # 将当前表添加到新的段落
-                    markdown_parts.append(user_data_table)
-                else:
-                    markdown_parts.append(user_data_table)
+                append_part(user_data_table)
         elif table_name in users_data.get("failed_queries", {}):
             # 查询失败的表
             failed_data = users_data.get("failed_queries", {}).get(table_name)
             failed_msg = f"**{INTENT_PATTERNS.get(table_name, {}).get('name', table_name)}**: {failed_data.get('message', '查询失败')}\n"
-
-            is_split, combined_str = split_markdown_parts(markdown_parts, [failed_msg])
-            if is_split:
-                # 需要分割，先保存之前的 markdown_parts
-                if markdown_parts:
-                    markdown_parts_str = "\n".join(markdown_parts)
-                    result_markdown.append(markdown_parts_str)
-                    markdown_parts = []
-                # 将当前失败信息添加到新的段落
-                markdown_parts.append(failed_msg)
-            else:
-                markdown_parts.append(failed_msg)
+            append_part(failed_msg)
         else:
             # 查询成功但无数据的表（0条记录）或者数据格式不正确（如空列表）
             # 处理数据格式为列表的情况
             if isinstance(table_data, list) or (table_data is None):
                 empty_table_data = {"columns": [], "rows": [], "count": 0}
-                formatted = format_user_data_table(table_name, empty_table_data)
-
-                is_split, combined_str = split_markdown_parts(markdown_parts, [formatted])
-                if is_split:
-                    # 需要分割，先保存之前的 markdown_parts
-                    if markdown_parts:
-                        markdown_parts_str = "\n".join(markdown_parts)
-                        result_markdown.append(markdown_parts_str)
-                        markdown_parts = []
-                    # 将当前空表信息添加到新的段落
-                    markdown_parts.append(formatted)
-                else:
-                    markdown_parts.append(formatted)
+                append_part(format_user_data_table(table_name, empty_table_data))
     if markdown_parts:
-        markdown_parts_str = "\n".join(markdown_parts)
-        result_markdown.append(markdown_parts_str)
+        result_markdown.append("\n".join(markdown_parts))
     return result_markdown
 
 
-def split_markdown_parts(old_markdown_parts: [list, str], new_markdown_parts: [list, str]):
+def split_markdown_parts(
+    old_markdown_parts: [list, str],
+    new_markdown_parts: [list, str],
+    max_tokens: Optional[int] = None,
+    model_name: Optional[str] = None,
+):
+    counter = get_token_counter(model_name)
     all_tokens = 0
     all_str = ""
     if old_markdown_parts:
         old_markdown_parts_str = (
             "\n".join(old_markdown_parts) if isinstance(old_markdown_parts, list) else old_markdown_parts
         )
-        all_tokens += estimate_tokens(old_markdown_parts_str)
+        all_tokens += counter.count(old_markdown_parts_str)
         all_str += f"\n{old_markdown_parts_str}" if all_str else old_markdown_parts_str
     if new_markdown_parts:
         new_markdown_parts_str = (
             "\n".join(new_markdown_parts) if isinstance(new_markdown_parts, list) else new_markdown_parts
         )
-        all_tokens += estimate_tokens(new_markdown_parts_str)
+        all_tokens += counter.count(new_markdown_parts_str)
         all_str += f"\n{new_markdown_parts_str}" if all_str else new_markdown_parts_str
 
-    # print("all_tokens,SPLIT_MAX_TOKEN",all_tokens,settings.SPLIT_MAX_TOKEN)
-    if all_tokens > settings.SPLIT_MAX_TOKEN:
+    if all_tokens > (max_tokens or settings.SPLIT_MAX_TOKEN):
         return True, all_str
     else:
         return False, all_str
@@ -1,11 +1,13 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import asyncio
 import hashlib
+import importlib.util
 import json
 import time
 
-from typing import Any, Dict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
 import httpx
 
@@ -29,6 +31,71 @@ class MCPClient:
         self.base_url = base_url or settings.MCP_SERVICE_URL
         self.api_key = api_key or settings.MCP_API_KEY
         self.timeout = timeout
+        # 长连接池客户端，按事件循环懒加载（Celery 任务中每次 asyncio.run 都是新的事件循环）
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        # 进行中的相同请求，key 为请求哈希，并发调用方共享同一个上游请求
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # 进行中请求的等待方数量，全部等待方取消后取消上游请求
+        self._inflight_waiters: Dict[str, int] = {}
+        # 预取的查询，key 为请求哈希，被相同请求的 query_data 取用一次或超时后丢弃
+        self._prefetched: Dict[str, asyncio.Task] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """获取当前事件循环下复用的 HTTP 客户端"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._client_loop is not loop:
+            # 旧事件循环已结束时其连接无法复用，直接丢弃
+            http2 = settings.MCP_HTTP2 and importlib.util.find_spec("h2") is not None
+            if settings.MCP_HTTP2 and not http2:
+                logger.warning("MCP_HTTP2 已开启但未安装 h2，回退为 HTTP/1.1 长连接")
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                http2=http2,
+                limits=httpx.Limits(
+                    max_connections=settings.MCP_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.MCP_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.MCP_HTTP_KEEPALIVE_EXPIRY,
+                ),
+            )
+            self._client_loop = loop
+            self._inflight = {}
+            self._inflight_waiters = {}
+            self._prefetched = {}
+        return self._client
+
+    async def aclose(self) -> None:
+        """关闭复用的 HTTP 客户端"""
+        client, self._client, self._client_loop = self._client, None, None
+        if client is not None and not client.is_closed:
+            await client.aclose()
+
+    async def _single_flight(self, key: str, factory: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """合并进行中的相同请求：同一 key 并发调用时只发起一次上游请求
+
+        上游请求在独立任务中执行，单个调用方取消不会影响其他等待者，全部等待者取消后才取消上游请求。
+        """
+        self._get_client()
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._inflight.pop(key, None) if self._inflight.get(key) is t else None)
+        else:
+            logger.debug(f"合并进行中的MCP请求: {key}")
+        self._inflight_waiters[key] = self._inflight_waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._inflight_waiters.get(key) == 1 and self._inflight.get(key) is task:
+                task.cancel()
+            raise
+        finally:
+            waiters = self._inflight_waiters.get(key, 0) - 1
+            if waiters > 0:
+                self._inflight_waiters[key] = waiters
+            else:
+                self._inflight_waiters.pop(key, None)
 
     def _generate_request_hash(self, request: Dict[str, Any]) -> str:
         """生成请求的唯一哈希值用于去重"""
@@ -63,29 +130,76 @@ class MCPClient:
         except Exception as e:
             logger.warning(f"Failed to log cached request: {e}")
 
+    def prefetch(self, request: Dict[str, Any]) -> str:
+        """预取查询结果
+
+        在调用方正式查询之前提前发起请求（请求需为之后不再修改的副本），
+        INTENT_PREFETCH_TTL_SECONDS 内相同请求的 query_data 直接取用该结果。
+        返回请求哈希，调用方结束时通过 cancel_prefetch 取消未被取用的预取。
+        """
+        self._get_client()
+        request_hash = self._generate_request_hash(request)
+        if request_hash in self._prefetched:
+            return request_hash
+
+        task = asyncio.ensure_future(self._query_data(request, request_hash))
+        # 预取失败时由正式查询重新请求，这里只取出异常避免告警
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._prefetched[request_hash] = task
+        asyncio.get_running_loop().call_later(
+            settings.INTENT_PREFETCH_TTL_SECONDS,
+            lambda: self._prefetched.pop(request_hash, None) if self._prefetched.get(request_hash) is task else None,
+        )
+        logger.debug(f"预取MCP请求: {request_hash}")
+        return request_hash
+
+    def cancel_prefetch(self, request_hashes: List[str]) -> None:
+        """取消未被取用的预取查询（已被 query_data 取用的不受影响）"""
+        for request_hash in request_hashes:
+            task = self._prefetched.pop(request_hash, None)
+            if task is not None and not task.done():
+                task.cancel()
+                logger.debug(f"取消预取MCP请求: {request_hash}")
+
     async def query_data(self, request: Dict[str, Any] | list[Dict[str, Any]]) -> Dict[str, Any]:
         """从MCP服务查询数据（带请求去重）"""
         try:
             # 生成请求哈希值用于去重
             request_hash = self._generate_request_hash(request)
 
-            # 检查是否存在重复请求
-            cached_result = await check_cache(f"mcp_request_{request_hash}")
-            if cached_result:
-                # 对于缓存的结果，我们需要记录一个特殊的日志
-                self._log_cached_request(request, f"mcp_request_{request_hash}")
-                return cached_result
+            self._get_client()
+            prefetched = self._prefetched.pop(request_hash, None)
+            if prefetched is not None:
+                try:
+                    return await asyncio.shield(prefetched)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"预取的MCP请求失败，重新查询: {e}")
+
+            return await self._query_data(request, request_hash)
+        except Exception as e:
+            logger.error(f"mcp client getdata_data error: {e}")
+            raise e
+
+    async def _query_data(self, request: Dict[str, Any] | list[Dict[str, Any]], request_hash: str) -> Dict[str, Any]:
+        """查询数据：Redis 缓存命中时直接返回，否则合并进行中的相同请求"""
+        # 检查是否存在重复请求
+        cached_result = await check_cache(f"mcp_request_{request_hash}")
+        if cached_result:
+            # 对于缓存的结果，我们需要记录一个特殊的日志
+            self._log_cached_request(request, f"mcp_request_{request_hash}")
+            return cached_result
 
+        async def fetch() -> Dict[str, Any]:
             # 执行实际请求
             result = await self._http_client("getdata/data", request)
 
             # 缓存请求结果
             await set_cache(f"mcp_request_{request_hash}", result)
-
             return result
-        except Exception as e:
-            logger.error(f"mcp client getdata_data error: {e}")
-            raise e
+
+        return await self._single_flight(f"getdata/data:{request_hash}", fetch)
 
     async def get_data(self, request: Dict[str, Any] | list[Dict[str, Any]]) -> Dict[str, Any]:
         """从MCP服务查询数据"""
@@ -96,16 +210,16 @@ class MCPClient:
                 for item in request:
                     if "query_type" not in item or not item["query_type"]:
                         continue
-                    item_result = await self._http_client("getdata/query", item)
+                    item_result = await self._coalesced_http_client("getdata/query", item)
                     if item_result["success"]:
                         result[item["query_type"]] = item_result["data"]
                     else:
                         result[item["query_type"]] = {}
             elif isinstance(request, dict):
                 if "query_type" in request and request["query_type"]:
-                    result = await self._http_client("getdata/query", request)
+                    result = await self._coalesced_http_client("getdata/query", request)
                 if "query_types" in request and request["query_types"]:
-                    result = await self._http_client("getdata/querys", request)
+                    result = await self._coalesced_http_client("getdata/querys", request)
 
             if not result:
                 return {
@@ -118,6 +232,11 @@ class MCPClient:
         except Exception as e:
             raise e
 
+    async def _coalesced_http_client(self, route: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        """合并进行中的相同请求后调用MCP服务"""
+        request_hash = self._generate_request_hash(request)
+        return await self._single_flight(f"{route}:{request_hash}", lambda: self._http_client(route, request))
+
     async def _http_client(self, route: str, request: Dict[str, Any] = None) -> Dict[str, Any]:
         """从MCP服务查询数据
 
@@ -149,21 +268,20 @@ class MCPClient:
                 url=url, headers=headers, payload=request, timeout=self.timeout, agent_id="AgentsMCPClient_ACTIVE"
             )
 
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.post(url, headers=headers, json=request)
-                response.raise_for_status()
-                result = response.json()
-
-                # 记录MCP响应
-                response_time_ms = (time.time() - start_time) * 1000
-                mcp_logger.log_mcp_response(
-                    request_id=request_id,
-                    response=result,
-                    response_time_ms=response_time_ms,
-                    status_code=response.status_code,
-                )
-
-                return result
+            response = await self._get_client().post(url, headers=headers, json=request)
+            response.raise_for_status()
+            result = response.json()
+
+            # 记录MCP响应
+            response_time_ms = (time.time() - start_time) * 1000
+            mcp_logger.log_mcp_response(
+                request_id=request_id,
+                response=result,
+                response_time_ms=response_time_ms,
+                status_code=response.status_code,
+            )
+
+            return result
 
         except httpx.HTTPStatusError as e:
             response_time_ms = (time.time() - start_time) * 1000
@@ -277,21 +277,14 @@ class StreamTaskManager:
             task_coro = self._collect_task_messages(task_id, **kwargs)
             tasks.append(asyncio.create_task(task_coro))
 
-        # 等待所有任务完成并收集消息
-        completed_tasks = 0
-        while completed_tasks < len(tasks):
-            for i, task in enumerate(tasks):
-                if task.done() and not hasattr(task, "_processed"):
-                    task._processed = True
-                    completed_tasks += 1
-                    try:
-                        messages = await task
-                        for message in messages:
-                            yield message
-                    except Exception as e:
-                        yield {"type": "error", "message": f"❌ 任务执行失败: {str(e)}"}
-
-            await asyncio.sleep(0.1)  # 避免忙等待
+        # 按完成顺序收集消息
+        for task in asyncio.as_completed(tasks):
+            try:
+                messages = await task
+                for message in messages:
+                    yield message
+            except Exception as e:
+                yield {"type": "error", "message": f"❌ 任务执行失败: {str(e)}"}
 
     async def _execute_pipeline_workflow(
         self, workflow: WorkflowInfo, **kwargs
@@ -580,7 +573,6 @@ class StreamTaskManager:
                 if hasattr(result, "__iter__") and not isinstance(result, (str, bytes)):
                     for item in result:
                         yield {"type": "info", "message": f"📝 任务 {task_id[:8]}: {str(item)}"}
-                        await asyncio.sleep(0.1)  # 避免阻塞
                 else:
                     yield {"type": "info", "message": f"📝 任务 {task_id[:8]}: {str(result)}"}
             except Exception as e:
@@ -152,8 +152,6 @@ class TaskManager:
     ) -> AsyncGenerator[Dict[str, Any], None]:
         """执行单个任务，以异步生成器方式返回结果"""
         logger.info(f"Starting task execution: {task.name} (ID: {task.task_id})")
-        # 添加一个微小的延迟，确保上面的消息被处理
-        await asyncio.sleep(0)
 
         try:
             if task.status == "failed":
@@ -172,9 +170,6 @@ class TaskManager:
             }
             yield start_message
 
-            # 增加延迟确保消息被处理
-            await asyncio.sleep(0.1)
-
             # 合并参数
             parameters = {**task.parameters, **kwargs}
             log = []
@@ -240,8 +235,6 @@ class TaskManager:
             logger.info("Generating task plan")
             async for plan_chunk in self.get_task_plan(user_query):
                 yield plan_chunk
-            # 确保计划消息被处理
-            await asyncio.sleep(0.1)
 
         previous_task: Task = None
         for i, task in enumerate(self.tasks):
@@ -266,9 +259,6 @@ class TaskManager:
                 }
                 yield title_message
 
-                # 确保标题消息被处理后再执行任务
-                await asyncio.sleep(0.1)
-
             # 执行当前任务
             async for result_chunk in self.execute_task(task, user_query, conversation_history, **kwargs):
                 yield result_chunk
@@ -311,8 +301,6 @@ class TaskManager:
                 result_chunk["type"] = "plan"
                 all_chunk += result_chunk["message"]
                 yield result_chunk
-                # 确保计划消息被立即处理
-                await asyncio.sleep(0.1)
             # 提取步骤
             self.plan_steps = self.extract_steps_from_plan(all_chunk)
             logger.info("Task plan generated successfully")
@@ -339,8 +327,6 @@ class TaskManager:
                 result_chunk["type"] = "summarize"
                 result_chunk["status"] = "running"
                 yield result_chunk
-                # 确保总结消息被立即处理
-                await asyncio.sleep(0.1)
             yield {"type": "summarize", "status": "completed", "message": ""}
             logger.info("Task result summarization completed")
         except Exception as e:
@@ -3,14 +3,22 @@
 
 import asyncio
 import json
+import uuid
 
-from typing import Any, AsyncGenerator, Dict, List, Optional
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional
 
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from backend.agents.config.setting import settings
-from backend.agents.tools.data_export_tool import DataExportTool
-from backend.agents.utils.token_utils import estimate_tokens
+from backend.agents.schema.agent import InterruptedException
+from backend.agents.utils.debug_artifacts import debug_artifacts
+from backend.agents.utils.rate_limiter import call_with_rate_limit, get_llm_rate_limiter
+from backend.agents.utils.token_utils import (
+    get_chunk_token_budget,
+    get_model_context_window,
+    get_token_counter,
+    split_data_by_tokens,
+)
 from backend.common.log import logger
 
 
@@ -24,25 +32,93 @@ class DataReduceStrategy:
         初始化数据缩减策略
 
         Args:
-            llm: LLM实例
-            kwargs: 配置参数，包含max_tokens, chunk_size, chunk_overlap, max_items_per_chunk
+            llm: LLM实例（应设置 max_retries=0，429 重试由 call_with_rate_limit 负责）
+            kwargs: 配置参数，包含max_tokens, chunk_size, chunk_overlap, max_items_per_chunk,
+                model_name（默认取llm的模型名）, context_window（默认按模型名匹配）,
+                max_concurrency（并发LLM调用上限，默认SPLIT_PARALLEL_MAX_WORKERS）,
+                task_id（调试产物所属任务ID）
         """
-        self.max_tokens = kwargs.get("max_tokens", settings.SPLIT_MAX_TOKEN)
+        # 按模型的真实上下文长度与分词器计算分块预算
+        self.model_name = kwargs.get("model_name") or getattr(llm, "model_name", None)
+        self.context_window = get_model_context_window(self.model_name, kwargs.get("context_window"))
+        self.token_counter = get_token_counter(self.model_name)
+        self.max_tokens = kwargs.get("max_tokens", get_chunk_token_budget(self.model_name, self.context_window))
         # 增加chunk_size以减少chunks数量，提高处理速度
-        self.chunk_size = kwargs.get("chunk_size", settings.SPLIT_CHUNK_SIZE)
+        self.chunk_size = kwargs.get("chunk_size", min(settings.SPLIT_CHUNK_SIZE, self.max_tokens))
         self.chunk_overlap = kwargs.get("chunk_overlap", settings.SPLIT_CHUNK_OVERLAP)
         self.max_items_per_chunk = kwargs.get("max_items_per_chunk", settings.SPLIT_MAX_ITEMS_PER_CHUNK)
+        # 并发上限（每次运行一个信号量）与按模型共享的令牌桶
+        self.max_concurrency = max(1, kwargs.get("max_concurrency", settings.SPLIT_PARALLEL_MAX_WORKERS))
+        self.rate_limiter = get_llm_rate_limiter(self.model_name)
 
         self.llm = llm
-        # 初始化文本分割器
+        # 初始化文本分割器（按token计数）
         self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap
+            chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap, length_function=self.token_counter.count
         )
 
-        self.data_export_tool = DataExportTool("data_reduce_strategy")
+        self.task_id = kwargs.get("task_id") or str(uuid.uuid4())
+
+    async def _ainvoke(self, prompt: str, semaphore: Optional[asyncio.Semaphore] = None):
+        """
+        调用LLM：信号量限制并发，令牌桶限制速率，429时退避重试
+
+        Args:
+            prompt: 提示词
+            semaphore: 本次运行的并发信号量，None表示不限制并发
+        """
+        if semaphore is None:
+            return await call_with_rate_limit(lambda: self.llm.ainvoke(prompt), self.rate_limiter)
+        async with semaphore:
+            return await call_with_rate_limit(lambda: self.llm.ainvoke(prompt), self.rate_limiter)
+
+    @staticmethod
+    def _check_interruption(interruption_checker: Optional[Callable[[], bool]]) -> None:
+        """检查是否需要中断执行"""
+        if interruption_checker and interruption_checker():
+            raise InterruptedException("任务已被用户中断")
+
+    @staticmethod
+    async def _cancel_tasks(tasks) -> None:
+        """取消未完成的任务并等待其退出"""
+        unfinished = [task for task in tasks if not task.done()]
+        if not unfinished:
+            return
+        for task in unfinished:
+            task.cancel()
+        await asyncio.gather(*unfinished, return_exceptions=True)
+        logger.info(f"Cancelled {len(unfinished)} outstanding LLM tasks")
+
+    async def _gather_cancellable(self, coros, interruption_checker: Optional[Callable[[], bool]] = None) -> List[Any]:
+        """
+        并发执行协程并按输入顺序返回结果；中断或任一任务失败时取消其余任务
+
+        Args:
+            coros: 协程列表
+            interruption_checker: 中断检查函数
+        """
+        tasks = [asyncio.create_task(coro) for coro in coros]
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=settings.SPLIT_INTERRUPT_CHECK_INTERVAL, return_when=asyncio.FIRST_EXCEPTION
+                )
+                self._check_interruption(interruption_checker)
+                for task in done:
+                    if task.exception() is not None:
+                        raise task.exception()
+            return [task.result() for task in tasks]
+        finally:
+            await self._cancel_tasks(tasks)
 
     async def _process_single_chunk_async(
-        self, chunk_text: str, map_prompt_template: str, chunk_index: int, total_chunks: int
+        self,
+        chunk_text: str,
+        map_prompt_template: str,
+        chunk_index: int,
+        total_chunks: int,
+        semaphore: Optional[asyncio.Semaphore] = None,
     ) -> str:
         """
         处理单个chunk（用于异步并发处理）
@@ -52,6 +128,7 @@ class DataReduceStrategy:
             map_prompt_template: 分析提示词模板
             chunk_index: chunk索引
             total_chunks: 总chunk数
+            semaphore: 本次运行的并发信号量
 
         Returns:
             处理后的结果
@@ -74,8 +151,8 @@ class DataReduceStrategy:
                 # 格式化prompt
                 prompt = map_prompt_template.format(text=chunk_text)
 
-            # 调用LLM（异步版本，性能更好）
-            response = await self.llm.ainvoke(prompt)
+            # 调用LLM（异步版本，受并发与速率限制）
+            response = await self._ainvoke(prompt, semaphore)
 
             logger.info(f"✅ Chunk {chunk_index + 1}/{total_chunks} completed")
             return response.content
@@ -130,19 +207,24 @@ class DataReduceStrategy:
             if not data_content.strip():
                 return {"header": header, "footer": footer, "data_chunks": [], "total_chunks": 0}
 
-            # 计算可用的chunk_size
-            available_chunk_size = self.chunk_size
-            if map_prompt_template:
-                # 估算map_prompt_template的token数
-                prompt_tokens = estimate_tokens(map_prompt_template)
-                # 预留一些空间给响应
-                reserved_tokens = prompt_tokens + 500  # 预留500个token给响应
-                available_chunk_size = max(100, self.chunk_size - reserved_tokens)
-                logger.info(f"Map prompt tokens: {prompt_tokens}, Available chunk size: {available_chunk_size}")
+            # 计算可用的chunk_size（token）：每个chunk都会带上头部、尾部，并与提示词一起发送给模型
+            header_footer_tokens = self.token_counter.count(header) + self.token_counter.count(footer) + 4
+            prompt_tokens = self.token_counter.count(map_prompt_template) if map_prompt_template else 0
+            # 不超过模型上下文长度：扣除提示词、头尾与响应预留
+            context_available = (
+                self.context_window - prompt_tokens - header_footer_tokens - settings.SPLIT_RESPONSE_RESERVED_TOKENS
+            )
+            available_chunk_size = max(100, min(self.chunk_size - header_footer_tokens, context_available))
+            logger.info(
+                f"Map prompt tokens: {prompt_tokens}, Header/footer tokens: {header_footer_tokens}, "
+                f"Context window: {self.context_window}, Available chunk size: {available_chunk_size}"
+            )
 
             # 使用调整后的chunk_size创建文本分割器
             data_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=available_chunk_size, chunk_overlap=self.chunk_overlap
+                chunk_size=available_chunk_size,
+                chunk_overlap=self.chunk_overlap,
+                length_function=self.token_counter.count,
             )
 
             # 分割数据部分
@@ -161,16 +243,11 @@ class DataReduceStrategy:
                 # 组合头部 + 数据chunk + 尾部
                 full_chunk = f"{header}\n\n{chunk_content}\n\n{footer}".strip()
                 data_chunks.append(full_chunk)
-                self.data_export_tool.export_to_markdown(full_chunk, task_id=f"chunk_{i}")
+                # 导出拆分结果用于调试（默认关闭，后台线程写入）
+                debug_artifacts.write(self.task_id, f"chunk_{i}", full_chunk)
 
             logger.info(f"Split data section into {len(data_chunks)} chunks (each with header and footer)")
 
-            # 导出拆分结果用于调试
-            # self.data_export_tool.export_to_markdown(header, task_id="split_header")
-            # self.data_export_tool.export_to_markdown(footer, task_id="split_footer")
-            # self.data_export_tool.export_to_markdown(data_content, task_id="split_data_content")
-            # self.data_export_tool.export_to_markdown(map_prompt_template, task_id="map_prompt_template")
-
             return {
                 "header": header,
                 "footer": footer,
@@ -192,12 +269,14 @@ class DataReduceStrategy:
         data: [list, str],
         map_prompt_template: str,
         combine_prompt_template: str,
+        interruption_checker: Optional[Callable[[], bool]] = None,
         **kwargs,
     ) -> AsyncGenerator[Dict[str, Any], None]:
         """
         异步生成器版本的数据缩减方法，直接yield进度事件
         避免了回调模式和队列轮询，代码更简洁优雅
-        
+        interruption_checker 返回True时取消未完成的LLM调用并抛出InterruptedException
+
         Yields:
             Dict[str, Any]: 包含进度信息的事件字典
                 - type: "chunk_completed" 或 "__final__"
@@ -211,6 +290,7 @@ class DataReduceStrategy:
                 data,
                 map_prompt_template,
                 combine_prompt_template,
+                interruption_checker=interruption_checker,
             ):
                 yield event
         else:
@@ -218,6 +298,7 @@ class DataReduceStrategy:
                 data,
                 map_prompt_template,
                 combine_prompt_template,
+                interruption_checker=interruption_checker,
                 **kwargs,
             ):
                 yield event
@@ -229,6 +310,8 @@ class DataReduceStrategy:
         combine_prompt_template: str = None,
         header_lines: int = 6,
         footer_lines: int = 1,
+        interruption_checker: Optional[Callable[[], bool]] = None,
+        **kwargs,
     ) -> AsyncGenerator[Dict[str, Any], None]:
         """
         使用结构化拆分策略缩减文本数据（异步生成器版本）
@@ -287,6 +370,7 @@ class DataReduceStrategy:
                 data_chunks,
                 map_prompt_template,
                 combine_prompt_template,
+                interruption_checker=interruption_checker,
             ):
                 yield event
 
@@ -302,6 +386,7 @@ class DataReduceStrategy:
         data_chunks: List[str],
         map_prompt_template: str,
         combine_prompt_template: str = None,
+        interruption_checker: Optional[Callable[[], bool]] = None,
     ) -> AsyncGenerator[Dict[str, Any], None]:
         """
         异步生成器版本的处理数据chunks方法
@@ -311,6 +396,7 @@ class DataReduceStrategy:
             data_chunks: 数据chunks列表
             map_prompt_template: Map阶段的提示词模板
             combine_prompt_template: Reduce阶段的提示词模板
+            interruption_checker: 中断检查函数，返回True时取消未完成的chunk并抛出InterruptedException
 
         Yields:
             Dict[str, Any]: 包含进度信息的事件字典
@@ -322,37 +408,54 @@ class DataReduceStrategy:
         """
         total_chunks = len(data_chunks)
         map_results = [""] * total_chunks
+        # 每次运行独立的信号量，限制同时在途的LLM调用数
+        semaphore = asyncio.Semaphore(self.max_concurrency)
 
         if settings.SPLIT_USE_PARALLEL and total_chunks > 1:
-            logger.info(f"🚀 Starting ASYNC PARALLEL processing of {total_chunks} data chunks (stream)")
+            logger.info(
+                f"🚀 Starting ASYNC PARALLEL processing of {total_chunks} data chunks (stream), "
+                f"max concurrency: {self.max_concurrency}"
+            )
 
             # 创建任务并建立 task -> chunk_index 的映射
             task_to_index = {}
             for i, chunk_text in enumerate(data_chunks):
-                task = asyncio.create_task(self._process_single_chunk_async(chunk_text, map_prompt_template, i, total_chunks))
+                task = asyncio.create_task(
+                    self._process_single_chunk_async(chunk_text, map_prompt_template, i, total_chunks, semaphore)
+                )
                 task_to_index[task] = i
 
-            # 使用 asyncio.as_completed 按完成顺序处理任务
-            async for task in asyncio.as_completed(task_to_index.keys()):
-                idx = task_to_index[task]
-                try:
-                    result = await task
-                except Exception as e:
-                    logger.error(f"❌ Data chunk {idx + 1}/{total_chunks} failed: {str(e)}")
-                    result = f"Data chunk {idx + 1} processing failed: {str(e)}"
-                map_results[idx] = result
-                # 直接yield进度事件，而不是通过回调
-                yield {
-                    "type": "chunk_completed",
-                    "chunk_index": idx + 1,
-                    "total_chunks": total_chunks,
-                    "result": result,
-                }
+            # 按完成顺序处理任务，等待期间定期检查中断；中断、异常或调用方关闭生成器时取消剩余任务
+            pending = set(task_to_index)
+            try:
+                while pending:
+                    done, pending = await asyncio.wait(
+                        pending, timeout=settings.SPLIT_INTERRUPT_CHECK_INTERVAL, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    self._check_interruption(interruption_checker)
+                    for task in sorted(done, key=task_to_index.get):
+                        idx = task_to_index[task]
+                        try:
+                            result = task.result()
+                        except Exception as e:
+                            logger.error(f"❌ Data chunk {idx + 1}/{total_chunks} failed: {str(e)}")
+                            result = f"Data chunk {idx + 1} processing failed: {str(e)}"
+                        map_results[idx] = result
+                        # 直接yield进度事件，而不是通过回调
+                        yield {
+                            "type": "chunk_completed",
+                            "chunk_index": idx + 1,
+                            "total_chunks": total_chunks,
+                            "result": result,
+                        }
+            finally:
+                await self._cancel_tasks(task_to_index)
 
         else:
             logger.info(f"📊 Starting ASYNC SEQUENTIAL processing of {total_chunks} data chunks (stream)")
 
             for i, chunk_text in enumerate(data_chunks):
+                self._check_interruption(interruption_checker)
                 try:
                     result = await self._process_single_chunk_async(chunk_text, map_prompt_template, i, total_chunks)
                 except Exception as e:
@@ -367,20 +470,103 @@ class DataReduceStrategy:
                     "result": result,
                 }
 
+        self._check_interruption(interruption_checker)
+
         # Reduce阶段：合并所有结果
         logger.info(f"🔄 Starting REDUCE phase to combine {len(map_results)} results...")
         logger.info("📋 All Map phase tasks completed, proceeding to Reduce phase")
 
-        combined_text = "\n\n".join([f"数据片段 {i + 1} 分析结果:\n{result}" for i, result in enumerate(map_results)])
-
         # 使用combine prompt合并结果
         if not combine_prompt_template:
             combine_prompt_template = map_prompt_template
+
+        # 合并文本超出上下文时先分层合并
+        combined_text = await self._tree_reduce(map_results, combine_prompt_template, semaphore, interruption_checker)
         final_prompt = combine_prompt_template.format(text=combined_text)
 
-        logger.info(f"🎯 Executing final LLM call for Reduce phase")
-        final_response = await self.llm.ainvoke(final_prompt)
+        self._check_interruption(interruption_checker)
+        logger.info("🎯 Executing final LLM call for Reduce phase")
+        final_response = await self._ainvoke(final_prompt)
         logger.info("✅ REDUCE phase completed successfully")
 
         # yield最终结果
         yield {"type": "__final__", "content": final_response.content}
+
+    def _group_by_tokens(self, sections: List[str], budget: int) -> List[List[str]]:
+        """
+        按token预算将分析结果贪心分组，单个超出预算的结果截断后独占一组
+
+        Args:
+            sections: 分析结果列表
+            budget: 每组的token预算
+        """
+        groups = []
+        current = []
+        current_tokens = 0
+        for section in sections:
+            # 分隔符"\n\n"按2个token计
+            tokens = self.token_counter.count(section) + 2
+            if tokens > budget:
+                logger.warning(f"Reduce section exceeds token budget ({tokens} > {budget}), truncating")
+                section = split_data_by_tokens(section, budget, self.model_name)[0]
+                tokens = budget
+            if current and current_tokens + tokens > budget:
+                groups.append(current)
+                current = []
+                current_tokens = 0
+            current.append(section)
+            current_tokens += tokens
+        if current:
+            groups.append(current)
+        return groups
+
+    async def _tree_reduce(
+        self,
+        map_results: List[str],
+        combine_prompt_template: str,
+        semaphore: asyncio.Semaphore,
+        interruption_checker: Optional[Callable[[], bool]] = None,
+    ) -> str:
+        """
+        分层合并Map结果：合并文本超出模型上下文预算时，按预算分组并发执行combine，
+        将各组汇总作为下一层输入，直到能一次放入最终的combine调用
+
+        Args:
+            map_results: Map阶段结果列表
+            combine_prompt_template: Reduce阶段的提示词模板
+            semaphore: 本次运行的并发信号量
+            interruption_checker: 中断检查函数
+
+        Returns:
+            用于最终combine调用的合并文本
+        """
+        template_tokens = self.token_counter.count(combine_prompt_template.replace("{text}", ""))
+        budget = max(1000, self.context_window - template_tokens - settings.SPLIT_RESPONSE_RESERVED_TOKENS)
+
+        sections = [f"数据片段 {i + 1} 分析结果:\n{result}" for i, result in enumerate(map_results)]
+        level = 0
+        while True:
+            combined_text = "\n\n".join(sections)
+            combined_tokens = self.token_counter.count(combined_text)
+            if combined_tokens <= budget:
+                return combined_text
+            if len(sections) == 1 or level >= settings.SPLIT_REDUCE_MAX_LEVELS:
+                logger.warning(
+                    f"Combined results still exceed token budget after {level} reduce levels "
+                    f"({combined_tokens} > {budget}), truncating"
+                )
+                return split_data_by_tokens(combined_text, budget, self.model_name)[0]
+
+            groups = self._group_by_tokens(sections, budget)
+            level += 1
+            logger.info(
+                f"🌲 Tree reduce level {level}: {len(sections)} results ({combined_tokens} tokens) "
+                f"-> {len(groups)} groups, budget {budget} tokens"
+            )
+            responses = await self._gather_cancellable(
+                [self._ainvoke(combine_prompt_template.format(text="\n\n".join(group)), semaphore) for group in groups],
+                interruption_checker,
+            )
+            sections = [
+                f"第{level}层汇总 {i + 1} 分析结果:\n{response.content}" for i, response in enumerate(responses)
+            ]
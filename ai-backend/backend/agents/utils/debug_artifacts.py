@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+# 调试产物写入模块 - 默认关闭，开启后在后台线程写盘，不阻塞请求链路
+
+import re
+import shutil
+import threading
+import time
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+from backend.agents.config.setting import settings
+from backend.common.log import logger
+
+_UNSAFE_CHARS = re.compile(r"[^\w.-]+")
+
+
+def _safe_name(name: str) -> str:
+    """文件/目录名只保留字母数字、下划线、点和横线"""
+    return _UNSAFE_CHARS.sub("_", str(name)).strip("._") or "unnamed"
+
+
+class DebugArtifactWriter:
+    """
+    调试产物写入器
+
+    目录结构为 <base_dir>/<YYYY-MM-DD>/<task_id>/<name>.md，不同任务互不覆盖。
+    write() 只做入队，写盘、单文件/单任务大小限制与过期清理都在单个后台线程中完成；
+    积压超过上限时直接丢弃，保证调用方不被磁盘拖慢。
+    """
+
+    def __init__(self):
+        self.enabled = settings.DEBUG_ARTIFACTS_ENABLED
+        self.base_dir = (
+            Path(settings.DEBUG_ARTIFACTS_DIR)
+            if settings.DEBUG_ARTIFACTS_DIR
+            else Path(__file__).parent.parent / "static" / "debug"
+        )
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        # 以下状态只在写入线程中访问
+        self._task_bytes: OrderedDict = OrderedDict()
+        self._last_cleanup = 0.0
+
+    def write(self, task_id: str, name: str, content: str) -> None:
+        """
+        提交一个调试产物（非阻塞）
+
+        Args:
+            task_id: 任务ID，用于隔离不同请求的产物
+            name: 文件名（不含扩展名）
+            content: 文本内容
+        """
+        if not self.enabled or content is None:
+            return
+        with self._lock:
+            if self._pending >= settings.DEBUG_ARTIFACTS_MAX_PENDING:
+                logger.debug(f"Debug artifact queue full, dropping {task_id}/{name}")
+                return
+            self._pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="debug-artifacts")
+            executor = self._executor
+        executor.submit(self._write_file, str(task_id), str(name), str(content))
+
+    def _write_file(self, task_id: str, name: str, content: str) -> None:
+        try:
+            self._cleanup_expired()
+            date_str = datetime.now().strftime("%Y-%m-%d")
+            task_dir = self.base_dir / date_str / _safe_name(task_id)
+
+            data = content.encode("utf-8")
+            if len(data) > settings.DEBUG_ARTIFACTS_MAX_FILE_BYTES:
+                data = data[: settings.DEBUG_ARTIFACTS_MAX_FILE_BYTES] + "\n\n...(truncated)".encode("utf-8")
+
+            task_key = str(task_dir)
+            used = self._task_bytes.get(task_key, 0)
+            if used + len(data) > settings.DEBUG_ARTIFACTS_MAX_TASK_BYTES:
+                logger.debug(f"Debug artifacts for task {task_id} exceed size limit, skipping {name}")
+                return
+            self._task_bytes[task_key] = used + len(data)
+            self._task_bytes.move_to_end(task_key)
+            while len(self._task_bytes) > 1024:
+                self._task_bytes.popitem(last=False)
+
+            task_dir.mkdir(parents=True, exist_ok=True)
+            (task_dir / f"{_safe_name(name)}.md").write_bytes(data)
+        except Exception as e:
+            logger.warning(f"Debug artifact write failed: {task_id}/{name}: {e}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _cleanup_expired(self) -> None:
+        """删除超过保留天数的日期目录（每小时最多执行一次）"""
+        now = time.monotonic()
+        if self._last_cleanup and now - self._last_cleanup < 3600:
+            return
+        self._last_cleanup = now
+        if not self.base_dir.exists():
+            return
+        cutoff = datetime.now() - timedelta(days=settings.DEBUG_ARTIFACTS_RETENTION_DAYS)
+        for date_dir in self.base_dir.iterdir():
+            try:
+                if date_dir.is_dir() and datetime.strptime(date_dir.name, "%Y-%m-%d") < cutoff:
+                    shutil.rmtree(date_dir, ignore_errors=True)
+                    logger.info(f"Removed expired debug artifacts: {date_dir}")
+            except ValueError:
+                continue
+
+    def shutdown(self, wait: bool = True) -> None:
+        """等待已提交的产物写完并关闭后台线程"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+debug_artifacts = DebugArtifactWriter()
@@ -3,24 +3,11 @@ import json
 import logging
 import re
 
-from typing import Any, AsyncGenerator, Dict, List, Optional
+from typing import Any, Dict, List, Optional
 
 logger = logging.getLogger("agent")
 
 
-async def simulate_stream(text: str) -> AsyncGenerator[str, None]:
-    """模拟流式输出一句话"""
-    import asyncio
-
-    # For Chinese text, split by character instead of by word
-    chars = list(text)
-
-    # Output one character at a time
-    for char in chars:
-        await asyncio.sleep(0.05)  # 控制输出速度
-        yield char
-
-
 def format_ai_output(
     content: str,
 ) -> Dict:
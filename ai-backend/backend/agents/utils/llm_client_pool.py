@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# LLM客户端池 - 按模型配置复用客户端与HTTP长连接
+
+import asyncio
+import time
+
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from openai import DefaultAsyncHttpxClient
+
+from backend.agents.config.setting import settings
+from backend.common.log import logger
+from backend.common.logging_chatopenai import LoggingChatOpenAI
+
+
+class LLMClientPool:
+    """
+    进程内LLM客户端池
+
+    客户端按 (base_url, api_key, model, temperature, timeout, max_retries, model_id) 复用，
+    同一 base_url 共享一个 HTTP 长连接池，同一模型共享一个并发信号量。
+    模型配置变更后会生成新的键，旧客户端按 LRU 与空闲时间淘汰；本进程内修改 ai_model 时可按模型ID立即淘汰。
+    客户端、连接和信号量都绑定事件循环（Celery 任务中每次 asyncio.run 都是新的事件循环），事件循环变化时整体重建。
+    """
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # key -> (最近使用时间, 客户端)
+        self._clients: OrderedDict[Tuple, Tuple[float, LoggingChatOpenAI]] = OrderedDict()
+        self._http_clients: Dict[str, httpx.AsyncClient] = {}
+        self._semaphores: Dict[Tuple[str, str], asyncio.Semaphore] = {}
+
+    def _bind_loop(self) -> Optional[asyncio.AbstractEventLoop]:
+        """绑定当前事件循环，变化时丢弃旧循环下的客户端"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        if loop is not self._loop:
+            # 旧事件循环已结束时其连接无法复用，直接丢弃
+            self._clients.clear()
+            self._http_clients = {}
+            self._semaphores = {}
+            self._loop = loop
+        return loop
+
+    def _get_http_client(self, base_url: str) -> httpx.AsyncClient:
+        """获取 base_url 对应的长连接 HTTP 客户端"""
+        client = self._http_clients.get(base_url)
+        if client is None or client.is_closed:
+            client = DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY,
+                ),
+            )
+            self._http_clients[base_url] = client
+        return client
+
+    def _get_semaphore(self, base_url: str, model_name: str) -> Optional[asyncio.Semaphore]:
+        """获取模型的并发信号量，LLM_MODEL_MAX_CONCURRENCY 为0时不限制"""
+        if settings.LLM_MODEL_MAX_CONCURRENCY <= 0:
+            return None
+        key = (base_url, model_name)
+        semaphore = self._semaphores.get(key)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(settings.LLM_MODEL_MAX_CONCURRENCY)
+            self._semaphores[key] = semaphore
+        return semaphore
+
+    def get(self, llm_config: Dict[str, Any], intent_name: Optional[str] = None) -> LoggingChatOpenAI:
+        """
+        借用模型配置对应的客户端，不存在时创建
+
+        Args:
+            llm_config: 模型配置（api_key、base_url、model_name、temperature、timeout、max_retries、id），缺省项使用通用对话模型配置
+            intent_name: 调用方名称，仅用于日志
+
+        Returns:
+            LoggingChatOpenAI: 可在多个智能体间共享的客户端
+        """
+        api_key = llm_config.get("api_key", settings.GENERAL_CHAT_LLM_API_KEY)
+        base_url = llm_config.get("base_url", settings.GENERAL_CHAT_LLM_BASE_URL)
+        model_name = llm_config.get("model_name", settings.GENERAL_CHAT_LLM_MODEL_NAME)
+        temperature = llm_config.get("temperature", settings.GENERAL_CHAT_LLM_TEMPERATURE)
+        timeout = llm_config.get("timeout", 60)
+        max_retries = llm_config.get("max_retries", 2)
+        model_id = llm_config.get("id")
+        params = dict(
+            model_alias_name=llm_config.get("name", "unknown"),
+            api_key=api_key,
+            base_url=base_url,
+            model=model_name,
+            temperature=temperature,
+            timeout=timeout,
+            max_retries=max_retries,
+            model_id=model_id,
+        )
+
+        # 不在事件循环中时无法绑定连接池，退回独立客户端
+        if self._bind_loop() is None:
+            return LoggingChatOpenAI(intent_name=intent_name, **params)
+
+        key = (base_url, api_key, model_name, temperature, timeout, max_retries, model_id)
+        now = time.monotonic()
+        entry = self._clients.get(key)
+        if entry is not None and now - entry[0] < settings.LLM_CLIENT_POOL_IDLE_SECONDS:
+            self._clients[key] = (now, entry[1])
+            self._clients.move_to_end(key)
+            return entry[1]
+
+        llm = LoggingChatOpenAI(
+            intent_name=intent_name,
+            http_async_client=self._get_http_client(base_url),
+            concurrency_limiter=self._get_semaphore(base_url, model_name),
+            **params,
+        )
+        self._clients[key] = (now, llm)
+        self._clients.move_to_end(key)
+        while len(self._clients) > settings.LLM_CLIENT_POOL_MAX_SIZE:
+            self._clients.popitem(last=False)
+        return llm
+
+    def evict(self, model_id: str) -> None:
+        """淘汰指定模型的客户端（ai_model 修改、删除或停用后调用），借出中的客户端不受影响"""
+        for key in [key for key in self._clients if key[-1] == model_id]:
+            del self._clients[key]
+        logger.debug(f"Evicted LLM clients for model {model_id}")
+
+    async def aclose(self) -> None:
+        """关闭所有HTTP长连接"""
+        http_clients, self._http_clients = self._http_clients, {}
+        self._clients.clear()
+        self._semaphores = {}
+        self._loop = None
+        for client in http_clients.values():
+            if not client.is_closed:
+                await client.aclose()
+
+
+llm_client_pool = LLMClientPool()
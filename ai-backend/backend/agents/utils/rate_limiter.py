@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# LLM调用限流与重试工具
+
+import asyncio
+import random
+import time
+
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from backend.agents.config.setting import settings
+from backend.common.log import logger
+
+
+class TokenBucket:
+    """
+    令牌桶限流器
+
+    按 rate（次/秒）匀速补充令牌，最多累积 capacity 个，允许短时突发。
+    检查与扣减之间没有 await，在单个事件循环内无需加锁。
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        """获取一个令牌，不足时等待"""
+        if self.rate <= 0:
+            return
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+_rate_limiters: Dict[str, TokenBucket] = {}
+
+
+def get_llm_rate_limiter(model_name: Optional[str] = None) -> TokenBucket:
+    """获取模型对应的令牌桶（同一进程内按模型名称共享）"""
+    model_name = model_name or settings.GENERAL_CHAT_LLM_MODEL_NAME
+    limiter = _rate_limiters.get(model_name)
+    if limiter is None:
+        limiter = TokenBucket(settings.LLM_RATE_LIMIT_RPM / 60, settings.LLM_RATE_LIMIT_BURST)
+        _rate_limiters[model_name] = limiter
+    return limiter
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """判断是否为限流错误（HTTP 429）"""
+    if getattr(error, "status_code", None) == 429:
+        return True
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return True
+    return type(error).__name__ == "RateLimitError"
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    """读取响应头中的 Retry-After（秒）"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+async def call_with_rate_limit(
+    func: Callable[[], Awaitable[Any]],
+    limiter: Optional[TokenBucket] = None,
+    max_retries: Optional[int] = None,
+) -> Any:
+    """
+    限流调用LLM，遇到429时按指数退避（带抖动，优先使用 Retry-After）重试
+
+    Args:
+        func: 发起调用的协程函数
+        limiter: 令牌桶，None 表示不限流
+        max_retries: 最大重试次数，默认 LLM_RETRY_MAX_ATTEMPTS
+
+    Returns:
+        func 的返回值
+    """
+    if max_retries is None:
+        max_retries = settings.LLM_RETRY_MAX_ATTEMPTS
+    attempt = 0
+    while True:
+        if limiter is not None:
+            await limiter.acquire()
+        try:
+            return await func()
+        except Exception as e:
+            if attempt >= max_retries or not is_rate_limit_error(e):
+                raise
+            delay = _retry_after_seconds(e)
+            if delay is None:
+                delay = min(settings.LLM_RETRY_MAX_DELAY, settings.LLM_RETRY_BASE_DELAY * 2**attempt)
+                delay *= 0.5 + random.random() / 2
+            attempt += 1
+            logger.warning(f"LLM rate limited, retry {attempt}/{max_retries} in {delay:.1f}s: {e}")
+            await asyncio.sleep(delay)
@@ -1,42 +1,172 @@
 # -*- coding: utf-8 -*-
 # Token计数和数据拆分工具
 
-from typing import Any, List, Tuple
+import re
+import threading
 
+from functools import lru_cache
+from typing import Any, Callable, Iterable, List, Optional, Tuple
 
-def estimate_tokens(text: str) -> int:
+from backend.agents.config.setting import settings
+from backend.common.log import logger
+
+_CHINESE_CHAR_PATTERN = re.compile("[\u4e00-\u9fff]")
+
+
+def token_weight(text: str) -> float:
     """
-    估算文本的token数量
-    使用更准确的规则：平均每个字符约0.75个token
+    计算文本未取整的token估算值，可按行累加（换行符计1）
 
     Args:
         text: 要估算的文本
 
     Returns:
-        估算的token数量
+        未取整的token估算值
     """
     if not text:
-        return 0
+        return 0.0
 
     # 统计中文字符和英文字符
-    chinese_chars = sum(1 for char in text if "\u4e00" <= char <= "\u9fff")
+    chinese_chars = len(_CHINESE_CHAR_PATTERN.findall(text))
     english_chars = len(text) - chinese_chars
 
     # 更准确的token估算：
     # 中文字符：约1.5个token/字符
     # 英文字符：约1个token/字符（包括空格、标点等）
-    estimated_tokens = int(chinese_chars * 1.5 + english_chars * 1)
+    return chinese_chars * 1.5 + english_chars * 1
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的token数量
+    使用更准确的规则：平均每个字符约0.75个token
+
+    Args:
+        text: 要估算的文本
+
+    Returns:
+        估算的token数量
+    """
+    if not text:
+        return 0
+    return int(token_weight(text))
+
+
+class TokenCounter:
+    """
+    基于BPE分词器的token计数器
+
+    每个模型只加载一次分词器（tiktoken），未安装或加载失败时回退为字符规则估算；
+    短文本的计数结果使用LRU缓存，重复的表头、提示词等无需重复分词。
+    """
+
+    def __init__(self, model_name: Optional[str] = None):
+        self.model_name = model_name or ""
+        self.encoding = self._load_encoding(self.model_name)
+        self.backend = self.encoding.name if self.encoding is not None else "estimate"
+        self._count_cached: Callable[[str], int] = lru_cache(maxsize=settings.TOKEN_COUNT_CACHE_SIZE)(self._count)
+
+    @staticmethod
+    def _load_encoding(model_name: str):
+        if not settings.TOKENIZER_ENABLED:
+            return None
+        try:
+            import tiktoken
+        except ImportError:
+            logger.warning("未安装 tiktoken，token 计数回退为字符规则估算")
+            return None
+        try:
+            try:
+                return tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                # 非 OpenAI 模型（如 deepseek、qwen）使用通用编码近似
+                return tiktoken.get_encoding(settings.TOKENIZER_DEFAULT_ENCODING)
+        except Exception as e:
+            # 编码文件首次加载需要下载，离线环境可通过 TIKTOKEN_CACHE_DIR 预置
+            logger.warning(f"加载分词器失败，token 计数回退为字符规则估算: {e}")
+            return None
+
+    def _count(self, text: str) -> int:
+        if self.encoding is None:
+            return int(token_weight(text))
+        return len(self.encoding.encode_ordinary(text))
+
+    def count(self, text: str) -> int:
+        """计算文本的token数量"""
+        if not text:
+            return 0
+        if len(text) > settings.TOKEN_COUNT_CACHE_MAX_TEXT_LENGTH:
+            return self._count(text)
+        return self._count_cached(text)
+
+    def count_many(self, texts: Iterable[str]) -> List[int]:
+        """批量计算token数量（分词器可用时使用批量编码）"""
+        texts = list(texts)
+        if self.encoding is None:
+            return [self.count(text) for text in texts]
+        return [len(tokens) for tokens in self.encoding.encode_ordinary_batch(texts)]
+
+
+_token_counters: dict = {}
+_token_counters_lock = threading.Lock()
+
+
+def get_token_counter(model_name: Optional[str] = None) -> TokenCounter:
+    """获取模型对应的token计数器（按模型名称缓存，分词器只加载一次）"""
+    model_name = model_name or settings.GENERAL_CHAT_LLM_MODEL_NAME
+    counter = _token_counters.get(model_name)
+    if counter is None:
+        with _token_counters_lock:
+            counter = _token_counters.get(model_name)
+            if counter is None:
+                counter = TokenCounter(model_name)
+                _token_counters[model_name] = counter
+                logger.info(f"Token counter for model {model_name}: {counter.backend}")
+    return counter
+
+
+def count_tokens(text: str, model_name: Optional[str] = None) -> int:
+    """使用模型分词器计算文本的token数量"""
+    return get_token_counter(model_name).count(text)
+
+
+def get_model_context_window(model_name: Optional[str] = None, context_window: Optional[int] = None) -> int:
+    """
+    获取模型的上下文长度
+
+    Args:
+        model_name: 模型名称/标识符
+        context_window: 显式指定的上下文长度（来自模型配置），优先使用
+
+    Returns:
+        上下文长度（token）
+    """
+    if context_window:
+        return int(context_window)
+    model_name = (model_name or settings.GENERAL_CHAT_LLM_MODEL_NAME or "").lower()
+    # 按前缀最长匹配，避免 gpt-4 命中 gpt-4o 的配置
+    for prefix in sorted(settings.MODEL_CONTEXT_WINDOWS, key=len, reverse=True):
+        if model_name.startswith(prefix):
+            return settings.MODEL_CONTEXT_WINDOWS[prefix]
+    return settings.DEFAULT_MODEL_CONTEXT_WINDOW
 
-    return estimated_tokens
+
+def get_chunk_token_budget(model_name: Optional[str] = None, context_window: Optional[int] = None) -> int:
+    """
+    获取单个数据分块可用的token预算：模型上下文长度扣除提示词与输出预留，且不超过 SPLIT_MAX_TOKEN
+    """
+    available = get_model_context_window(model_name, context_window) - settings.SPLIT_RESERVED_TOKENS
+    return max(1000, min(settings.SPLIT_MAX_TOKEN, available))
 
 
-def split_data_by_tokens(data: str, max_tokens: int = 3000) -> List[str]:
+def split_data_by_tokens(data: str, max_tokens: int = 3000, model_name: Optional[str] = None) -> List[str]:
     """
     按token数量拆分数据
 
     Args:
         data: 要拆分的数据（markdown格式）
         max_tokens: 每个块的最大token数
+        model_name: 模型名称，用于选择分词器
 
     Returns:
         拆分后的数据列表
@@ -44,8 +174,10 @@ def split_data_by_tokens(data: str, max_tokens: int = 3000) -> List[str]:
     if not data:
         return []
 
-    # 估算总token数
-    total_tokens = estimate_tokens(data)
+    counter = get_token_counter(model_name)
+
+    # 计算总token数
+    total_tokens = counter.count(data)
 
     # 如果数据不大，直接返回
     if total_tokens <= max_tokens:
@@ -58,9 +190,7 @@ def split_data_by_tokens(data: str, max_tokens: int = 3000) -> List[str]:
     current_chunk = []
     current_tokens = 0
 
-    for line in lines:
-        line_tokens = estimate_tokens(line)
-
+    for line_tokens, line in zip(counter.count_many(lines), lines):
         # 如果单行就超过最大token，需要进一步拆分
         if line_tokens > max_tokens:
             if current_chunk:
@@ -69,7 +199,7 @@ def split_data_by_tokens(data: str, max_tokens: int = 3000) -> List[str]:
                 current_tokens = 0
 
             # 对超长行进行字符级拆分
-            line_chunks = split_long_line(line, max_tokens)
+            line_chunks = split_long_line(line, max_tokens, model_name)
             chunks.extend(line_chunks)
         else:
             # 如果加上这行会超过限制，先保存当前块
@@ -88,22 +218,23 @@ def split_data_by_tokens(data: str, max_tokens: int = 3000) -> List[str]:
     return chunks
 
 
-def split_long_line(line: str, max_tokens: int) -> List[str]:
+def split_long_line(line: str, max_tokens: int, model_name: Optional[str] = None) -> List[str]:
     """
     拆分超长行
 
     Args:
         line: 超长的行
         max_tokens: 最大token数
+        model_name: 模型名称，用于选择分词器
 
     Returns:
         拆分后的行列表
     """
     chunks = []
     # 估算每个字符的平均token数
-    avg_tokens_per_char = estimate_tokens(line) / len(line) if line else 1
+    avg_tokens_per_char = count_tokens(line, model_name) / len(line) if line else 1
     # 计算每个块的最大字符数
-    max_chars = int(max_tokens / avg_tokens_per_char)
+    max_chars = max(1, int(max_tokens / avg_tokens_per_char)) if avg_tokens_per_char else max(1, len(line))
 
     for i in range(0, len(line), max_chars):
         chunks.append(line[i : i + max_chars])
@@ -141,16 +272,17 @@ def split_json_data(data: Any, max_items_per_chunk: int = 100) -> List[Any]:
         return [data]
 
 
-def check_token_limit(text: str, max_tokens: int = 4000) -> Tuple[bool, int]:
+def check_token_limit(text: str, max_tokens: int = 4000, model_name: Optional[str] = None) -> Tuple[bool, int]:
     """
     检查文本是否超过token限制
 
     Args:
         text: 要检查的文本
         max_tokens: token限制
+        model_name: 模型名称，用于选择分词器
 
     Returns:
         (是否超限, 实际token数)
     """
-    tokens = estimate_tokens(text)
+    tokens = count_tokens(text, model_name)
     return tokens > max_tokens, tokens
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from fastapi import APIRouter
+
+from backend.common.response.response_schema import ResponseModel, response_base
+from backend.common.security.jwt import DependsJwtAuth
+from backend.database.warehouse import warehouse_engines, warehouse_metadata_engines
+
+router = APIRouter()
+
+
+@router.get("", summary="数据仓库连接池监控", dependencies=[DependsJwtAuth])
+async def get_warehouse_pool_info() -> ResponseModel:
+    data = {
+        "pools": warehouse_engines.get_pool_stats(),
+        "metadata_pools": warehouse_metadata_engines.get_pool_stats(),
+    }
+    return response_base.success(data=data)
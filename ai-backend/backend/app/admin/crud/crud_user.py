@@ -34,6 +34,16 @@ class CRUDUser(CRUDPlus[User]):
         """
         return await self.select_model_by_column(db, id=user_id, deleted_at=None)
 
+    async def get_by_ids(self, db: AsyncSession, user_ids: list[int]) -> Sequence[User]:
+        """
+        批量获取用户
+
+        :param db: 数据库会话
+        :param user_ids: 用户 ID 列表
+        :return:
+        """
+        return await self.select_models(db, id__in=user_ids, deleted_at=None)
+
     async def get_by_crm_user_id(self, db: AsyncSession, crm_user_id: str) -> User | None:
         """
         通过CRM用户ID获取用户
@@ -12,6 +12,7 @@ from typing import List, Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend.agents.utils.llm_client_pool import llm_client_pool
 from backend.app.admin.crud.crud_ai_model import crud_ai_model
 from backend.app.admin.schema.ai_model import (
     CreateAIModelParams,
@@ -20,6 +21,7 @@ from backend.app.admin.schema.ai_model import (
     TestResponse,
     UpdateAIModelParams,
 )
+from backend.app.admin.service.analysis_context_cache import analysis_context_cache
 from backend.common.pagination import PageData
 
 
@@ -137,6 +139,8 @@ class AIModelService:
 
         # 更新模型
         updated_model = await crud_ai_model.update(db, db_obj=model, obj_in=request)
+        await analysis_context_cache.invalidate()
+        llm_client_pool.evict(model_id)
         return self._model_to_dict(updated_model)
 
     async def delete_batch(self, db: AsyncSession, *, ids: List[str]) -> DeleteResponse:
@@ -149,6 +153,9 @@ class AIModelService:
 
         # 批量删除
         deleted_count = await crud_ai_model.delete_batch(db, ids=ids)
+        await analysis_context_cache.invalidate()
+        for model_id in ids:
+            llm_client_pool.evict(model_id)
         return DeleteResponse(deleted_count=deleted_count)
 
     async def toggle_status(self, db: AsyncSession, *, model_id: str, status: bool) -> Optional[dict]:
@@ -156,6 +163,8 @@ class AIModelService:
         model = await crud_ai_model.update_status(db, id=model_id, status=status)
         if not model:
             return None
+        await analysis_context_cache.invalidate()
+        llm_client_pool.evict(model_id)
         return self._model_to_dict(model)
 
     async def test_connection(self, db: AsyncSession, *, model_id: str) -> TestResponse:
@@ -332,6 +341,7 @@ class AIModelService:
             )
 
             await db.commit()
+            await analysis_context_cache.invalidate()
 
             return {
                 "success": True,
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分析上下文缓存
+
+缓存模型配置、系统默认模型、风险标签模板和风控助手的分析基础信息。
+Redis 在 Web 进程与 Celery worker 间共享，进程内再保留一层短期缓存；
+缓存键带全局版本号，助手、模型或风险标签经后台修改时递增版本号，使所有进程的缓存失效。
+模型 API Key 等敏感数据不写入 Redis，只保存在进程内缓存中。
+"""
+
+import copy
+import json
+import logging
+import time
+
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+from backend.core.conf import settings
+from backend.database.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisContextCache:
+    """带版本号的两级分析上下文缓存"""
+
+    def __init__(self):
+        self._local: OrderedDict[str, Tuple[float, Any]] = OrderedDict()
+        self._version: Optional[int] = None
+        self._version_checked_at = 0.0
+
+    @staticmethod
+    def _version_key() -> str:
+        return f"{settings.ANALYSIS_CONTEXT_CACHE_REDIS_PREFIX}:version"
+
+    async def _get_version(self) -> int:
+        """获取当前版本号，进程内最多每 ANALYSIS_CONTEXT_VERSION_CHECK_SECONDS 秒读取一次 Redis"""
+        now = time.monotonic()
+        if (
+            self._version is not None
+            and now - self._version_checked_at < settings.ANALYSIS_CONTEXT_VERSION_CHECK_SECONDS
+        ):
+            return self._version
+
+        value = await redis_client.get(self._version_key())
+        version = int(value) if value else 0
+        if version != self._version:
+            self._local.clear()
+        self._version = version
+        self._version_checked_at = now
+        return version
+
+    def _set_local(self, key: str, value: Any) -> None:
+        self._local[key] = (time.monotonic() + settings.ANALYSIS_CONTEXT_L1_TTL_SECONDS, value)
+        self._local.move_to_end(key)
+        while len(self._local) > settings.ANALYSIS_CONTEXT_L1_MAX_ENTRIES:
+            self._local.popitem(last=False)
+
+    async def get_or_load(self, kind: str, key: Any, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        获取缓存内容，未命中时调用 loader 加载并写入缓存
+
+        内容按 JSON 序列化存储（枚举、时间等会转为字符串），每次返回独立副本，调用方可自由修改；
+        loader 抛出的异常不会被缓存
+
+        :param kind: 缓存类别
+        :param key: 类别内的键
+        :param loader: 加载函数
+        :return:
+        """
+        try:
+            version = await self._get_version()
+        except Exception as e:
+            logger.warning(f"Failed to read analysis context cache version, loading directly: {e}")
+            return await loader()
+
+        cache_key = f"{settings.ANALYSIS_CONTEXT_CACHE_REDIS_PREFIX}:{version}:{kind}:{key}"
+        local = self._local.get(cache_key)
+        if local is not None and local[0] > time.monotonic():
+            return copy.deepcopy(local[1])
+
+        cached = None
+        try:
+            cached = await redis_client.get(cache_key)
+        except Exception as e:
+            logger.warning(f"Failed to read analysis context cache {cache_key}: {e}")
+
+        if cached is not None:
+            value = json.loads(cached)
+        else:
+            payload = json.dumps(await loader(), ensure_ascii=False, default=str)
+            value = json.loads(payload)
+            try:
+                await redis_client.set(cache_key, payload, ex=settings.ANALYSIS_CONTEXT_CACHE_EXPIRE_SECONDS)
+            except Exception as e:
+                logger.warning(f"Failed to write analysis context cache {cache_key}: {e}")
+
+        self._set_local(cache_key, value)
+        return copy.deepcopy(value)
+
+    async def get_or_load_local(self, kind: str, key: Any, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        只使用进程内缓存获取内容，用于不能写入 Redis 的敏感数据（如模型 API Key）
+
+        同样受全局版本号控制，版本号变化时失效；返回值不复制，应为不可变值
+
+        :param kind: 缓存类别
+        :param key: 类别内的键
+        :param loader: 加载函数
+        :return:
+        """
+        try:
+            version = await self._get_version()
+        except Exception as e:
+            logger.warning(f"Failed to read analysis context cache version, loading directly: {e}")
+            return await loader()
+
+        cache_key = f"{settings.ANALYSIS_CONTEXT_CACHE_REDIS_PREFIX}:{version}:{kind}:{key}"
+        local = self._local.get(cache_key)
+        if local is not None and local[0] > time.monotonic():
+            return local[1]
+
+        value = await loader()
+        self._set_local(cache_key, value)
+        return value
+
+    async def invalidate(self) -> None:
+        """递增版本号，使所有进程的缓存失效（其他进程在版本检查间隔内感知）"""
+        self._local.clear()
+        try:
+            self._version = int(await redis_client.incr(self._version_key()))
+            self._version_checked_at = time.monotonic()
+        except Exception as e:
+            self._version = None
+            logger.warning(f"Failed to invalidate analysis context cache: {e}")
+
+
+analysis_context_cache: AnalysisContextCache = AnalysisContextCache()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+已分析用户索引
+
+按风险类型在 Redis 中维护已分析用户ID的位图和扫描高水位，
+用于在数据仓库中按 id 分页筛选未分析用户，避免把全部已分析ID拼进 SQL。
+
+位图按 id 区间分片（每片 RISK_ANALYZED_INDEX_SHARD_BITS 位），个别很大的用户ID只会分配所在的一片，
+不会让 Redis 分配 id/8 字节的字符串。位图按版本重建：重建期间写入新版本的分片，完成后切换当前版本。
+"""
+
+import logging
+import uuid
+
+from collections import defaultdict
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.app.admin.model.risk_member_analysis import RiskMemberAnalysis
+from backend.core.conf import settings
+from backend.database.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+def _to_member_id(member_id) -> Optional[int]:
+    """仓库用户ID为整数，无法转换的记录不进入位图"""
+    try:
+        member_id = int(member_id)
+    except (TypeError, ValueError):
+        return None
+    return member_id if member_id >= 0 else None
+
+
+def _shard_offset(member_id: int) -> Tuple[int, int]:
+    """用户ID对应的 (分片号, 片内偏移)"""
+    return divmod(member_id, settings.RISK_ANALYZED_INDEX_SHARD_BITS)
+
+
+class AnalyzedMemberIndex:
+    """已分析用户位图与扫描高水位"""
+
+    @staticmethod
+    def _prefix(risk_type: str) -> str:
+        return f"{settings.RISK_ANALYZED_INDEX_REDIS_PREFIX}:{getattr(risk_type, 'value', risk_type)}"
+
+    def _version_key(self, risk_type: str) -> str:
+        """当前生效的位图版本，不存在时需要重建"""
+        return f"{self._prefix(risk_type)}:version"
+
+    def _building_key(self, risk_type: str) -> str:
+        """正在重建的位图版本集合，重建期间新增的已分析用户同时写入这些版本"""
+        return f"{self._prefix(risk_type)}:building"
+
+    def _shard_key(self, risk_type: str, version: str, shard: int) -> str:
+        return f"{self._prefix(risk_type)}:bitmap:{version}:{shard}"
+
+    def _cursor_key(self, risk_type: str) -> str:
+        return f"{self._prefix(risk_type)}:cursor"
+
+    @staticmethod
+    def _shard_expire_seconds() -> int:
+        # 分片比版本号多保留一段时间，版本号有效期内分片不会先过期
+        return settings.RISK_ANALYZED_INDEX_EXPIRE_SECONDS + settings.RISK_ANALYZED_INDEX_BUILD_TIMEOUT_SECONDS
+
+    def _set_bits(self, pipe, risk_type: str, version: str, member_ids: Iterable[int]) -> None:
+        """在管道中写入一批用户ID，并刷新涉及分片的有效期"""
+        shards = set()
+        for member_id in member_ids:
+            shard, offset = _shard_offset(member_id)
+            shards.add(shard)
+            pipe.setbit(self._shard_key(risk_type, version, shard), offset, 1)
+        for shard in shards:
+            pipe.expire(self._shard_key(risk_type, version, shard), self._shard_expire_seconds())
+
+    async def ensure_loaded(self, db: AsyncSession, *, risk_type: str) -> None:
+        """
+        位图不存在（首次使用或已过期）时从分析记录表重建，并重置高水位
+
+        :param db: 数据库会话
+        :param risk_type: 风险类型
+        :return:
+        """
+        version_key = self._version_key(risk_type)
+        if await redis_client.exists(version_key):
+            return
+
+        # 先登记新版本再读取数据库：登记之后保存的报告由 add 直接写入新版本，之前保存的报告能从数据库读到
+        version = uuid.uuid4().hex
+        building_key = self._building_key(risk_type)
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.sadd(building_key, version)
+            pipe.expire(building_key, settings.RISK_ANALYZED_INDEX_BUILD_TIMEOUT_SECONDS)
+            await pipe.execute()
+
+        batch_size = settings.RISK_ANALYZED_INDEX_LOAD_BATCH_SIZE
+        last_member_id = ""
+        total = 0
+        try:
+            while True:
+                stmt = (
+                    select(RiskMemberAnalysis.member_id)
+                    .where(RiskMemberAnalysis.risk_type == risk_type, RiskMemberAnalysis.member_id > last_member_id)
+                    .distinct()
+                    .order_by(RiskMemberAnalysis.member_id)
+                    .limit(batch_size)
+                )
+                member_ids = (await db.execute(stmt)).scalars().all()
+                if not member_ids:
+                    break
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    self._set_bits(
+                        pipe,
+                        risk_type,
+                        version,
+                        (offset for offset in map(_to_member_id, member_ids) if offset is not None),
+                    )
+                    await pipe.execute()
+                total += len(member_ids)
+                last_member_id = member_ids[-1]
+                if len(member_ids) < batch_size:
+                    break
+
+            async with redis_client.pipeline(transaction=True) as pipe:
+                pipe.set(version_key, version, ex=settings.RISK_ANALYZED_INDEX_EXPIRE_SECONDS)
+                pipe.srem(building_key, version)
+                # 分析记录可能被删除过，高水位需要从头重新计算
+                pipe.delete(self._cursor_key(risk_type))
+                await pipe.execute()
+            logger.info(f"Rebuilt analyzed member index for {risk_type}: {total} members")
+        except Exception:
+            # 未完成的版本不再接收写入，已写入的分片随有效期释放
+            await redis_client.srem(building_key, version)
+            raise
+
+    async def add(self, *, risk_type: str, member_id) -> None:
+        """
+        标记用户已分析，同时写入当前版本与正在重建的版本；两者都不存在时跳过，下次使用时会从数据库完整重建
+
+        :param risk_type: 风险类型
+        :param member_id: 用户ID
+        :return:
+        """
+        member_id = _to_member_id(member_id)
+        if member_id is None:
+            return
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.get(self._version_key(risk_type))
+            pipe.smembers(self._building_key(risk_type))
+            version, building = await pipe.execute()
+        versions = {v for v in [version, *building] if v}
+        if not versions:
+            return
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for v in versions:
+                self._set_bits(pipe, risk_type, v, [member_id])
+            await pipe.execute()
+
+    async def contains_many(self, *, risk_type: str, member_ids: Iterable[int]) -> List[bool]:
+        """
+        批量判断用户是否已分析
+
+        :param risk_type: 风险类型
+        :param member_ids: 用户ID列表
+        :return: 与 member_ids 顺序一致的布尔列表
+        """
+        member_ids = [_to_member_id(member_id) for member_id in member_ids]
+        version = await redis_client.get(self._version_key(risk_type))
+        if not version:
+            return [False] * len(member_ids)
+
+        positions = defaultdict(list)
+        for index, member_id in enumerate(member_ids):
+            if member_id is not None:
+                positions[_shard_offset(member_id)].append(index)
+        result = [False] * len(member_ids)
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for shard, offset in positions:
+                pipe.getbit(self._shard_key(risk_type, version, shard), offset)
+            bits = await pipe.execute()
+        for indexes, bit in zip(positions.values(), bits):
+            for index in indexes:
+                result[index] = bool(bit)
+        return result
+
+    async def get_cursor(self, *, risk_type: str) -> int:
+        """获取扫描高水位：该ID及以下的用户均已分析"""
+        value = await redis_client.get(self._cursor_key(risk_type))
+        return int(value) if value else 0
+
+    async def set_cursor(self, *, risk_type: str, member_id: int) -> None:
+        """推进扫描高水位，有效期与位图一致"""
+        await redis_client.set(self._cursor_key(risk_type), member_id, ex=settings.RISK_ANALYZED_INDEX_EXPIRE_SECONDS)
+
+
+analyzed_member_index: AnalyzedMemberIndex = AnalyzedMemberIndex()
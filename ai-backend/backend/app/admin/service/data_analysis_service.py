@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import dataclasses
 import json
 
 from datetime import datetime
@@ -12,8 +13,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from backend.agents.agents.data_analyze_agent import DataAnalyzeAgent
 from backend.agents.agents.get_users_agent import GetUsersAgent
 from backend.agents.tools.data_to_markdown import users_to_markdown
+from backend.agents.utils.token_utils import get_chunk_token_budget
 from backend.app.admin.model.ai_model import AIModel
 from backend.app.admin.model.ai_training_log import AITrainingLog
+from backend.app.admin.service.analysis_context_cache import analysis_context_cache
 from backend.app.admin.service.report_log_service import report_log_service
 from backend.app.admin.service.risk_tag_service import risk_tag_service
 from backend.app.admin.types import (
@@ -36,12 +39,38 @@ from backend.database.db import get_db
 from backend.utils.time_utils import generate_time_range
 
 
+@dataclasses.dataclass
+class AnalysisRunContext:
+    """
+    单次分析的运行上下文
+
+    基础信息（含模型配置）、数据请求和提示配置随上下文传递，服务实例不保存运行状态，
+    同一进程内的多个分析可以安全并发
+    """
+
+    basic_info: BasicInfo = dataclasses.field(default_factory=dict)
+    data_request: Dict[str, DataSourceConfig] = dataclasses.field(default_factory=dict)
+    analysis_prompt: Optional[AnalysisPrompt] = None
+
+    @property
+    def model(self) -> ModelConfig:
+        return self.basic_info.get("model") or {}
+
+
 class DataAnalysisService:
-    """数据分析服务类，协调各种智能体进行数据分析"""
+    """数据分析服务类，协调各种智能体进行数据分析（无状态，可在多个协程间共享）"""
 
-    def __init__(self) -> None:
-        self.basicInfo: BasicInfo = {}
-        self.data_sources: Dict[str, DataSourceConfig] = {}
+    async def create_context(self, db: AsyncSession, basicInfo: Optional[BasicInfo] = None) -> AnalysisRunContext:
+        """
+        创建分析运行上下文，并按 ai_model_id 补全模型配置
+
+        :param db: 数据库会话
+        :param basicInfo: 分析基础信息，模型配置写入其 model 字段
+        :return:
+        """
+        basic_info = basicInfo if basicInfo is not None else {}
+        basic_info["model"] = await self._get_model(db, basic_info.get("ai_model_id"))
+        return AnalysisRunContext(basic_info=basic_info)
 
     async def get_user_data(
         self,
@@ -51,52 +80,99 @@ class DataAnalysisService:
         condition: Optional[QueryCondition] = None,
         basicInfo: Optional[BasicInfo] = None,
         crm_user_id: Optional[int] = None,
+        context: Optional[AnalysisRunContext] = None,
         **kwargs: Any,
     ) -> UserDataResult:
-        if basicInfo is None:
-            basicInfo = {}
         if condition is None:
             condition = {}
+        if context is None:
+            context = await self.create_context(db, basicInfo)
 
-        self.basicInfo = basicInfo
-        config = await self._get_model(db, basicInfo.get("ai_model_id"))
-        self.basicInfo["model"] = config
-        condition_result = await self._query_mcp_data_by_condition(condition)
-        self.data_sources = {}
+        context.data_request = await self.build_data_sources(query_types, data_permission_values, condition)
 
-        for query_type in query_types:
-            self.data_sources[query_type] = DataSourceConfig(
-                user_id=data_permission_values,
-                range_time=TimeRange(
-                    data_start_date=condition_result.get("start_date"),
-                    data_end_date=condition_result.get("end_date"),
-                ),
-            )
-
-        get_users_agent = GetUsersAgent()
         logger.info(f"DataAnalysisService.get_user_data 传递crm_user_id: {crm_user_id}")
-        result = await get_users_agent.get_users(data_sources=self.data_sources, crm_user_id=crm_user_id)
+        result = await self._fetch_data_sources(context.data_request, crm_user_id)
 
         if result.get("success"):
             return UserDataResult(
                 success=True,
                 message=result.get("message", "用户数据获取成功"),
                 data=result.get("data"),
+                data_request=context.data_request,
             )
         else:
             raise Exception(result.get("message", "用户数据获取失败"))
 
+    async def build_data_sources(
+        self,
+        query_types: List[str],
+        user_ids: List[str],
+        condition: Optional[QueryCondition] = None,
+        limit: Optional[int] = None,
+    ) -> Dict[str, DataSourceConfig]:
+        """
+        按查询条件构建各数据源的 MCP 查询参数
+
+        :param query_types: 数据源列表
+        :param user_ids: 用户ID列表
+        :param condition: 查询条件
+        :param limit: 每个数据源返回的最大行数，为空时使用 MCP 默认限制
+        :return:
+        """
+        condition_result = await self._query_mcp_data_by_condition(condition)
+        data_sources: Dict[str, DataSourceConfig] = {}
+        for query_type in query_types:
+            data_sources[query_type] = DataSourceConfig(
+                user_id=user_ids,
+                range_time=TimeRange(
+                    data_start_date=condition_result.get("start_date"),
+                    data_end_date=condition_result.get("end_date"),
+                ),
+            )
+            if limit:
+                data_sources[query_type]["limit"] = limit
+        return data_sources
+
+    async def get_batch_user_data(
+        self, data_sources: Dict[str, DataSourceConfig], crm_user_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        按已构建的查询参数获取数据
+
+        :param data_sources: 数据源查询参数
+        :param crm_user_id: MCP 权限校验使用的 CRM 用户ID
+        :return: MCP 返回的按数据源组织的数据
+        """
+        result = await self._fetch_data_sources(data_sources, crm_user_id)
+        if not result.get("success"):
+            raise Exception(result.get("message", "用户数据获取失败"))
+        return result.get("data") or {}
+
+    @staticmethod
+    async def _fetch_data_sources(
+        data_sources: Dict[str, DataSourceConfig], crm_user_id: Optional[int] = None
+    ) -> Dict[str, Any]:
+        # GetUsersAgent 会向请求中写入 crm_user_id，传入副本避免污染调用方的查询参数
+        get_users_agent = GetUsersAgent()
+        return await get_users_agent.get_users(data_sources=dict(data_sources), crm_user_id=crm_user_id)
+
     async def analyze_data(
         self,
         db: AsyncSession,
         users_info: UsersInfo,
         basicInfo: Optional[BasicInfo],
         llm_config: Optional[ModelConfig] = None,
+        data_request: Optional[Dict[str, DataSourceConfig]] = None,
+        analysis_prompt: Optional[AnalysisPrompt] = None,
     ) -> AnalysisResult:
         if llm_config is None:
             llm_config = {}
+        if data_request is None:
+            data_request = {}
 
-        analysis_prompt = await self._get_analysis_prompt(db, basicInfo)
+        # 批量分析时由调用方预先构建提示配置，避免每个用户重复查询风险标签
+        if analysis_prompt is None:
+            analysis_prompt = await self._get_analysis_prompt(db, basicInfo)
 
         result: AnalysisResult = {
             "status": "rejected",
@@ -105,7 +181,12 @@ class DataAnalysisService:
         }
 
         if users_info and users_info.get("data"):
-            users_markdown_data = users_to_markdown(users_info)
+            model_name = llm_config.get("model_name")
+            users_markdown_data = users_to_markdown(
+                users_info,
+                max_tokens=get_chunk_token_budget(model_name, llm_config.get("context_window")),
+                model_name=model_name,
+            )
             # 将模型配置包装在llm字段下，以符合Base类的期望格式
             agent_config = {"llm": llm_config} if llm_config else {}
             data_analyze_agent = DataAnalyzeAgent(config=agent_config)
@@ -114,7 +195,7 @@ class DataAnalysisService:
                 conversation_history=None,
                 analyze_data=users_markdown_data,
                 analysis_prompt=analysis_prompt,
-                data_request=self.data_sources,
+                data_request=data_request,
                 is_property_analysis=True,
             )
             agent_result = data_analyze_agent.result
@@ -141,11 +222,14 @@ class DataAnalysisService:
         **kwargs: Any,
     ) -> AnalysisResult:
         try:
+            context = await self.create_context(db, basicInfo)
             user_result = await self.get_user_data(
-                db, query_types, data_permission_values, condition, basicInfo, crm_user_id=crm_user_id, **kwargs
+                db, query_types, data_permission_values, condition, crm_user_id=crm_user_id, context=context, **kwargs
             )
             users_info = {"data": user_result.get("data")}
-            result = await self.analyze_data(db, users_info, basicInfo, llm_config=basicInfo.get("model", {}))
+            result = await self.analyze_data(
+                db, users_info, context.basic_info, llm_config=context.model, data_request=context.data_request
+            )
             return result
         except Exception as e:
             return AnalysisResult(
@@ -176,18 +260,22 @@ class DataAnalysisService:
         if not risk_type:
             return []
 
-        risk_tags = await risk_tag_service.get_by_risk_type(db, risk_type=risk_type)
-        if not risk_tags:
-            return []
+        async def load() -> List[RiskTagTemplate]:
+            risk_tags = await risk_tag_service.get_by_risk_type(db, risk_type=risk_type)
+            return [
+                RiskTagTemplate(
+                    id=tag["id"],
+                    name=tag["name"],
+                    description=tag["description"],
+                )
+                for tag in risk_tags or []
+            ]
 
-        return [
-            RiskTagTemplate(
-                id=tag["id"],
-                name=tag["name"],
-                description=tag["description"],
-            )
-            for tag in risk_tags
-        ]
+        return await analysis_context_cache.get_or_load("risk_tags", getattr(risk_type, "value", risk_type), load)
+
+    async def get_analysis_prompt(self, db: AsyncSession, basicInfo: Optional[BasicInfo] = None) -> AnalysisPrompt:
+        """构建分析提示配置（角色、输出格式与风险标签模板）"""
+        return await self._get_analysis_prompt(db, basicInfo)
 
     async def _get_analysis_prompt(self, db: AsyncSession, basicInfo: Optional[BasicInfo] = None) -> AnalysisPrompt:
         if basicInfo is None:
@@ -240,24 +328,64 @@ class DataAnalysisService:
                 analytical_report_format=basicInfo.get("model_definition", "请分析提供的数据"),
             )
 
-    async def _get_model(self, db: AsyncSession, model_id: Optional[str] = None) -> ModelConfig:
-        # 查询AI模型配置
-        model_result: ModelConfig = {}
+    async def _get_default_model_id(self, db: AsyncSession) -> Optional[str]:
+        """获取系统默认模型ID"""
+
+        async def load() -> Optional[str]:
+            from backend.plugin.config.crud.crud_config import config_dao
 
+            config = await config_dao.get_by_key(db, "ai_default_model_id")
+            return config.value if config and config.value else None
+
+        try:
+            return await analysis_context_cache.get_or_load("default_model", "id", load)
+        except Exception as e:
+            logger.debug(f"获取系统默认模型失败: {str(e)}")
+            return None
+
+    async def _get_model(self, db: AsyncSession, model_id: Optional[str] = None) -> ModelConfig:
         # 如果model_id为空，尝试获取系统默认模型
         if not model_id:
-            try:
-                from backend.plugin.config.crud.crud_config import config_dao
-
-                config = await config_dao.get_by_key(db, "ai_default_model_id")
-                if config and config.value:
-                    model_id = config.value
-            except Exception as e:
-                logger.debug(f"获取系统默认模型失败: {str(e)}")
+            model_id = await self._get_default_model_id(db)
 
         # 如果还是没有model_id，返回空配置
         if not model_id:
-            return model_result
+            return {}
+
+        model = await analysis_context_cache.get_or_load("model", model_id, lambda: self._load_model(db, model_id))
+        return await self.with_model_api_key(db, model)
+
+    async def with_model_api_key(self, db: AsyncSession, model: Optional[ModelConfig]) -> ModelConfig:
+        """
+        为缓存读取的模型配置补全 API Key
+
+        API Key 不随模型配置写入 Redis，从进程内缓存读取，未命中时查询模型表
+
+        :param db: 数据库会话
+        :param model: 不含 API Key 的模型配置
+        :return:
+        """
+        if not model or not model.get("id"):
+            return model or {}
+
+        async def load() -> Optional[str]:
+            result = await db.execute(select(AIModel.api_key).where(AIModel.id == model["id"]))
+            return result.scalar_one_or_none()
+
+        model["api_key"] = await analysis_context_cache.get_or_load_local("model_api_key", model["id"], load)
+        return model
+
+    @staticmethod
+    def without_model_api_key(basic_info: BasicInfo) -> BasicInfo:
+        """移除基础信息中模型配置的 API Key，用于写入共享缓存前"""
+        model = basic_info.get("model")
+        if model:
+            basic_info["model"] = {key: value for key, value in model.items() if key != "api_key"}
+        return basic_info
+
+    async def _load_model(self, db: AsyncSession, model_id: str) -> ModelConfig:
+        # 查询AI模型配置
+        model_result: ModelConfig = {}
 
         stmt = select(AIModel).where(AIModel.id == model_id)
         result = await db.execute(stmt)
@@ -269,11 +397,10 @@ class DataAnalysisService:
         if not model.status:
             return model_result
 
-        # 准备LangGraph代理的配置
+        # 准备LangGraph代理的配置（结果会写入 Redis，不包含 API Key，由 with_model_api_key 补全）
         model_result = ModelConfig(
             id=model.id,
             name=model.name,
-            api_key=model.api_key,
             base_url=model.base_url,
             model_name=model.model,
             temperature=model.temperature,
@@ -290,13 +417,15 @@ class DataAnalysisService:
         else:
             return obj
 
-    async def _add_training_log(self, result: Dict[str, Any], success: bool = True) -> TrainingLogResult:
+    async def _add_training_log(
+        self, result: Dict[str, Any], basic_info: BasicInfo, success: bool = True
+    ) -> TrainingLogResult:
         try:
-            model = self.basicInfo.get("model")
+            model = basic_info.get("model")
             if not model:
                 return TrainingLogResult(success=False, message="模型信息不存在")
 
-            clean_basic_info = self._serialize_datetime_objects(self.basicInfo)
+            clean_basic_info = self._serialize_datetime_objects(basic_info)
             if not result:
                 result = {}
             data = result.get("data", {})
@@ -424,16 +553,7 @@ class DataAnalysisService:
         **kwargs: Any,
     ) -> BasicInfo:
         # 如果ai_model_id为空，尝试获取系统默认模型
-        actual_model_id = ai_model_id
-        if not actual_model_id:
-            try:
-                from backend.plugin.config.crud.crud_config import config_dao
-
-                config = await config_dao.get_by_key(db, "ai_default_model_id")
-                if config and config.value:
-                    actual_model_id = config.value
-            except Exception as e:
-                logger.debug(f"获取系统默认模型失败: {str(e)}")
+        actual_model_id = ai_model_id or await self._get_default_model_id(db)
 
         model_info = await self._get_model(db, actual_model_id)
         basic_info: BasicInfo = {
@@ -9,8 +9,8 @@ import re
 
 from typing import Dict, List, Optional
 
-from sqlalchemy import URL, text
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.app.admin.crud.crud_database_metadata import crud_database_metadata
 from backend.app.admin.schema.database_metadata import (
@@ -28,7 +28,7 @@ from backend.app.admin.schema.sql_generator import (
     DataSourceLinkRequest,
     DataSourceLinkResponse,
 )
-from backend.core.conf import settings
+from backend.database.warehouse import warehouse_metadata_engines
 
 
 class DatabaseMetadataService:
@@ -83,18 +83,6 @@ class DatabaseMetadataService:
 
         return cleaned if cleaned.strip() else None
 
-    def _create_mysql_url(self, database_name: Optional[str] = None) -> URL:
-        """创建MySQL连接URL"""
-        return URL.create(
-            drivername="mysql+asyncmy",
-            username=settings.DATABASE_WAREHOUSE_USER,
-            password=settings.DATABASE_WAREHOUSE_PASSWORD,
-            host=settings.DATABASE_WAREHOUSE_HOST,
-            port=settings.DATABASE_WAREHOUSE_PORT,
-            database=database_name,
-            query={"charset": settings.DATABASE_WAREHOUSE_CHARSET},
-        )
-
     async def get_database_tree(
         self,
         db: AsyncSession,
@@ -194,10 +182,7 @@ class DatabaseMetadataService:
         """获取MySQL服务器上的所有数据库"""
         try:
             # 连接到MySQL服务器（不指定数据库）
-            url = self._create_mysql_url()
-            engine = create_async_engine(url)
-
-            async with engine.connect() as conn:
+            async with warehouse_metadata_engines.connect() as conn:
                 result = await conn.execute(text("SHOW DATABASES"))
                 databases = [row[0] for row in result.fetchall()]
 
@@ -205,7 +190,6 @@ class DatabaseMetadataService:
                 system_databases = {"information_schema", "performance_schema", "mysql", "sys"}
                 user_databases = [db for db in databases if db not in system_databases]
 
-            await engine.dispose()
             return user_databases
 
         except Exception as e:
@@ -214,11 +198,8 @@ class DatabaseMetadataService:
     async def _scan_database_structure(self, database_name: str) -> Dict:
         """扫描单个数据库的结构"""
         try:
-            # 创建指定数据库的连接
-            url = self._create_mysql_url(database_name)
-            engine = create_async_engine(url)
-
-            async with engine.connect() as conn:
+            # information_schema 查询已按库名过滤，复用服务器级连接，不为每个库单独建连接池
+            async with warehouse_metadata_engines.connect() as conn:
                 # SelectDB不支持SCHEMA_COMMENT，跳过数据库注释查询
                 db_comment = None
 
@@ -273,7 +254,6 @@ class DatabaseMetadataService:
 
                     database_info["tables"].append(table_info)
 
-            await engine.dispose()
             return database_info
 
         except Exception as e:
@@ -599,11 +579,8 @@ class DatabaseMetadataService:
                 # 添加LIMIT子句
                 sql = f"{sql} LIMIT {limit}"
 
-            # 创建数据库连接
-            url = self._create_mysql_url(database_name)
-            engine = create_async_engine(url)
-
-            async with engine.connect() as conn:
+            # 从元数据小连接池获取连接（按库建池，不允许溢出）
+            async with warehouse_metadata_engines.connect(database_name) as conn:
                 result = await conn.execute(text(sql))
                 rows = result.fetchall()
 
@@ -653,8 +630,6 @@ class DatabaseMetadataService:
                         }
                     )
 
-            await engine.dispose()
-
             return {"success": True, "rows": data, "columns": columns, "message": f"查询成功，返回 {len(data)} 行数据"}
 
         except Exception as e:
@@ -3,9 +3,12 @@
 """
 增量风控用户服务
 基于原始风控用户识别脚本优化实现
+
+每个数据源按风险类型在 Redis 中持久化高水位（上次检测的截止时间），定时检测只扫描高水位之后的新数据，
+检测到的用户全部提交分析后才推进高水位；
+时间条件均为直接作用在列上的范围条件，可以使用索引。
 """
 
-import asyncio
 import logging
 import time
 
@@ -13,14 +16,73 @@ from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
-from sqlalchemy import URL, text
-from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.common.enums import RiskType
 from backend.core.conf import settings
+from backend.database.redis import redis_client
+from backend.database.warehouse import warehouse_engines
 
 logger = logging.getLogger(__name__)
 
+# MT5 交易时间为 GMT+5 的 Unix 时间戳
+MT5_TIME_OFFSET_SECONDS = 5 * 3600
+
+# 触发数据源：trigger_type -> 查询（:since_<trigger_type> 为该数据源的起始时间（不含），:end_time 为截止时间（含））
+TRIGGER_SOURCES: Dict[str, str] = {
+    # 1. 新注册用户 (t_member)
+    "new_register": """
+            SELECT DISTINCT id AS user_id, 'new_register' AS trigger_type
+            FROM {db}.t_member
+            WHERE create_time > :since_new_register AND create_time <= :end_time""",
+    # 2. 新登录记录 (t_member_login_log)
+    "new_login": """
+            SELECT DISTINCT member_id AS user_id, 'new_login' AS trigger_type
+            FROM {db}.t_member_login_log
+            WHERE create_time > :since_new_login AND create_time <= :end_time
+            AND member_id IS NOT NULL""",
+    # 3. 新转账记录 (t_member_forword_log)
+    "new_transfer": """
+            SELECT DISTINCT member_id AS user_id, 'new_transfer' AS trigger_type
+            FROM {db}.t_member_forword_log
+            WHERE create_time > :since_new_transfer AND create_time <= :end_time
+            AND member_id IS NOT NULL""",
+    # 4. 新操作记录 (t_operation_log)
+    "new_operation": """
+            SELECT DISTINCT member_id AS user_id, 'new_operation' AS trigger_type
+            FROM {db}.t_operation_log
+            WHERE created_at > :since_new_operation AND created_at <= :end_time
+            AND member_id IS NOT NULL""",
+    # 5. MT4新交易记录 (mt4_trades_194) - OPEN_TIME是UTC时区的datetime格式，边界转换为datetime后比较
+    "new_mt4_trade": """
+            SELECT DISTINCT tml.member_id AS user_id, 'new_mt4_trade' AS trigger_type
+            FROM mt4_report_194.mt4_trades mt4
+            INNER JOIN {db}.t_member_mtlogin tml ON mt4.LOGIN = tml.loginid
+            INNER JOIN {db}.t_mt_server tms ON tml.mtserver = tms.id
+            WHERE mt4.OPEN_TIME > FROM_UNIXTIME(:since_new_mt4_trade)
+              AND mt4.OPEN_TIME <= FROM_UNIXTIME(:end_time)
+              AND tms.db_name = 'mt4_report_194'
+              AND tml.member_id IS NOT NULL""",
+    # 6. MT5新交易记录 (mt5_trades_1110) - Time是GMT+5时区的Unix时间戳，边界换算到GMT+5后比较
+    "new_mt5_trade": """
+            SELECT DISTINCT tml.member_id AS user_id, 'new_mt5_trade' AS trigger_type
+            FROM mt5_report_1110.mt4_trades mt5
+            INNER JOIN {db}.t_member_mtlogin tml ON mt5.LOGIN = tml.loginid
+            INNER JOIN {db}.t_mt_server tms ON tml.mtserver = tms.id
+            WHERE mt5.Time > :since_new_mt5_trade + :mt5_offset
+              AND mt5.Time <= :end_time + :mt5_offset
+              AND tms.db_name = 'mt5_report_1110'
+              AND tml.member_id IS NOT NULL""",
+}
+
+# 风控类型对应的用户类型，未列出的类型不按用户类型过滤
+RISK_TYPE_USER_TYPES = {
+    RiskType.ALL_EMPLOYEE: "direct",  # 客户风控
+    RiskType.CRM_USER: "staff",  # 员工风控
+    RiskType.AGENT_USER: "agent",  # 代理商风控
+}
+
 
 class IncrementalRiskUserService:
     """增量风控用户服务"""
@@ -31,142 +93,102 @@ class IncrementalRiskUserService:
             if hasattr(settings, "DATABASE_WAREHOUSE_NAME") and settings.DATABASE_WAREHOUSE_NAME
             else "devapi1_mtarde_c"
         )
-        self._engine: Optional[AsyncEngine] = None
-        self._engine_lock = asyncio.Lock()
-
-    def _create_warehouse_url(self, database_name: Optional[str] = None) -> URL:
-        """创建数据仓库连接URL"""
-        return URL.create(
-            drivername="mysql+asyncmy",
-            username=settings.DATABASE_WAREHOUSE_USER,
-            password=settings.DATABASE_WAREHOUSE_PASSWORD,
-            host=settings.DATABASE_WAREHOUSE_HOST,
-            port=settings.DATABASE_WAREHOUSE_PORT,
-            database=database_name or self.database_name,
-            query={"charset": settings.DATABASE_WAREHOUSE_CHARSET},
-        )
-
-    async def _get_engine(self) -> AsyncEngine:
-        """获取或创建数据库引擎（单例模式）"""
-        if self._engine is None:
-            async with self._engine_lock:
-                if self._engine is None:
-                    url = self._create_warehouse_url()
-                    self._engine = create_async_engine(
-                        url,
-                        pool_size=15,  # 适中的基本连接池大小
-                        max_overflow=25,  # 适中的溢出连接数
-                        pool_timeout=30,  # 获取连接超时时间
-                        pool_recycle=3600,  # 1小时回收连接
-                        pool_pre_ping=True,  # 连接前检测
-                        echo=False,
-                    )
-                    logger.info("Created new database engine for warehouse")
-        return self._engine
 
     @asynccontextmanager
     async def _get_connection(self):
-        """获取数据库连接的上下文管理器"""
-        engine = await self._get_engine()
-        conn = None
+        """从共享的数据仓库连接池获取连接的上下文管理器"""
         try:
-            conn = await engine.connect()
-            yield conn
+            async with warehouse_engines.connect(self.database_name) as conn:
+                yield conn
         except Exception as e:
             logger.exception(f"Database connection error: {e}")
             raise
-        finally:
-            if conn:
-                await conn.close()
 
-    # SQLAlchemy 会在进程结束时自动清理连接池，不需要手动管理
+    @staticmethod
+    def _watermark_key(risk_type: RiskType) -> str:
+        return f"{settings.RISK_INCREMENTAL_WATERMARK_REDIS_PREFIX}:{getattr(risk_type, 'value', risk_type)}"
+
+    async def get_watermarks(self, risk_type: RiskType) -> Dict[str, int]:
+        """获取各数据源的高水位（Unix时间戳），读取失败时返回空字典"""
+        try:
+            values = await redis_client.hgetall(self._watermark_key(risk_type))
+        except Exception as e:
+            logger.warning(f"读取增量检测高水位失败，按完整时间窗口检测: {e}")
+            return {}
+        return {source: int(value) for source, value in values.items() if source in TRIGGER_SOURCES}
+
+    async def set_watermarks(self, risk_type: RiskType, watermarks: Dict[str, int]) -> None:
+        """记录各数据源的高水位"""
+        if watermarks:
+            await redis_client.hset(self._watermark_key(risk_type), mapping=watermarks)
+
+    async def reset_watermarks(self, risk_type: RiskType) -> None:
+        """清除高水位，下次检测扫描完整时间窗口"""
+        await redis_client.delete(self._watermark_key(risk_type))
+
+    def _build_query(self, user_type: Optional[str] = None) -> str:
+        """组装汇总查询，按用户类型过滤时直接关联 t_member，无需再次查询"""
+        union_sql = "\n\n            UNION ALL\n".join(
+            sql.format(db=self.database_name) for sql in TRIGGER_SOURCES.values()
+        )
+        # 不按用户类型过滤时（如支付风控）无需关联 t_member
+        member_join = (
+            f"INNER JOIN {self.database_name}.t_member m ON m.id = risk_users.user_id AND m.userType = :user_type"
+            if user_type
+            else ""
+        )
+        return f"""
+        -- 汇总各数据源高水位之后有变动的用户ID，去重后形成风控用户集
+        SELECT
+            risk_users.user_id,
+            GROUP_CONCAT(DISTINCT risk_users.trigger_type ORDER BY risk_users.trigger_type) AS trigger_reasons,
+            COUNT(DISTINCT risk_users.trigger_type) AS trigger_count
+        FROM ({union_sql}
+        ) risk_users
+        {member_join}
+        GROUP BY risk_users.user_id
+        ORDER BY trigger_count DESC, risk_users.user_id
+        """
 
-    async def get_incremental_risk_users(self, hours: int = 6) -> Dict[str, Any]:
+    async def get_incremental_risk_users(
+        self,
+        hours: int = 6,
+        risk_type: Optional[RiskType] = None,
+        watermarks: Optional[Dict[str, int]] = None,
+    ) -> Dict[str, Any]:
         """
         获取指定时间段内需要风控检查的用户集合（基于原始脚本优化）
 
         Args:
-            hours: 时间范围（小时）
+            hours: 时间范围（小时），同时是高水位之前最多回溯的范围
+            risk_type: 风控类型，指定时只返回对应用户类型的用户
+            watermarks: 各数据源的起始时间（Unix时间戳，不含），缺省的数据源从时间范围起点开始
 
         Returns:
-            包含用户ID集合和详细信息的字典
+            包含用户ID集合和详细信息的字典，sources 为各数据源本次的起始时间
         """
         # 计算时间范围（Unix时间戳）
         end_time = int(time.time())
+        if watermarks is not None:
+            # 增量检测时截止时间留出延迟，避免遗漏尚未提交的数据
+            end_time -= settings.RISK_INCREMENTAL_WATERMARK_LAG_SECONDS
         start_time = end_time - (hours * 3600)
+        sources = {
+            source: min(max((watermarks or {}).get(source, start_time), start_time), end_time)
+            for source in TRIGGER_SOURCES
+        }
 
         logger.info(f"检测时间范围: {datetime.fromtimestamp(start_time)} 到 {datetime.fromtimestamp(end_time)}")
-        logger.info(f"时间戳范围: {start_time} 到 {end_time}")
-
-        # 构建查询SQL（基于原始脚本的UNION ALL方式）
-
-        sql = f"""
-        -- 汇总所有{hours}小时内有变动的用户ID，去重后形成风控用户集
-        SELECT
-            user_id,
-            GROUP_CONCAT(DISTINCT trigger_type ORDER BY trigger_type) AS trigger_reasons,
-            COUNT(DISTINCT trigger_type) AS trigger_count
-        FROM (
-            -- 1. 新注册用户 (t_member)
-            SELECT DISTINCT id AS user_id, 'new_register' AS trigger_type
-            FROM {self.database_name}.t_member
-            WHERE create_time >= :start_time AND create_time <= :end_time
-
-            UNION ALL
-
-            -- 2. 新登录记录 (t_member_login_log)
-            SELECT DISTINCT member_id AS user_id, 'new_login' AS trigger_type
-            FROM {self.database_name}.t_member_login_log
-            WHERE create_time >= :start_time AND create_time <= :end_time
-            AND member_id IS NOT NULL
-
-            UNION ALL
-
-            -- 3. 新转账记录 (t_member_forword_log)
-            SELECT DISTINCT member_id AS user_id, 'new_transfer' AS trigger_type
-            FROM {self.database_name}.t_member_forword_log
-            WHERE create_time >= :start_time AND create_time <= :end_time
-            AND member_id IS NOT NULL
+        logger.info(f"时间戳范围: {start_time} 到 {end_time}，数据源起始时间: {sources}")
 
-            UNION ALL
-
-            -- 4. 新操作记录 (t_operation_log)
-            SELECT DISTINCT member_id AS user_id, 'new_operation' AS trigger_type
-            FROM {self.database_name}.t_operation_log
-            WHERE created_at >= :start_time AND created_at <= :end_time
-            AND member_id IS NOT NULL
-
-            UNION ALL
-
-            -- 5. MT4新交易记录 (mt4_trades_194) - OPEN_TIME是UTC时区的datetime格式
-            SELECT DISTINCT tml.member_id AS user_id, 'new_mt4_trade' AS trigger_type
-            FROM mt4_report_194.mt4_trades mt4
-            INNER JOIN {self.database_name}.t_member_mtlogin tml ON mt4.LOGIN = tml.loginid
-            INNER JOIN {self.database_name}.t_mt_server tms ON tml.mtserver = tms.id
-            WHERE UNIX_TIMESTAMP(mt4.OPEN_TIME) >= :start_time
-              AND UNIX_TIMESTAMP(mt4.OPEN_TIME) <= :end_time
-              AND tms.db_name = 'mt4_report_194'
-              AND tml.member_id IS NOT NULL
-
-            UNION ALL
-
-            -- 6. MT5新交易记录 (mt5_trades_1110) - Time是GMT+5时区的Unix时间戳，需要转换为UTC
-            SELECT DISTINCT tml.member_id AS user_id, 'new_mt5_trade' AS trigger_type
-            FROM mt5_report_1110.mt4_trades mt5
-            INNER JOIN {self.database_name}.t_member_mtlogin tml ON mt5.LOGIN = tml.loginid
-            INNER JOIN {self.database_name}.t_mt_server tms ON tml.mtserver = tms.id
-            WHERE (mt5.Time - 5*3600) >= :start_time
-              AND (mt5.Time - 5*3600) <= :end_time
-              AND tms.db_name = 'mt5_report_1110'
-              AND tml.member_id IS NOT NULL
-        ) risk_users
-        WHERE user_id IS NOT NULL
-        GROUP BY user_id
-        ORDER BY trigger_count DESC, user_id
-        """
+        user_type = RISK_TYPE_USER_TYPES.get(risk_type) if risk_type is not None else None
+        sql = self._build_query(user_type)
 
         # 参数字典
-        params = {"start_time": start_time, "end_time": end_time}
+        params = {f"since_{source}": since for source, since in sources.items()}
+        params.update(end_time=end_time, mt5_offset=MT5_TIME_OFFSET_SECONDS)
+        if user_type:
+            params["user_type"] = user_type
 
         try:
             # 使用单例引擎和连接池（避免资源泄漏）
@@ -186,6 +208,7 @@ class IncrementalRiskUserService:
                     "start_datetime": datetime.fromtimestamp(start_time).strftime("%Y-%m-%d %H:%M:%S"),
                     "end_datetime": datetime.fromtimestamp(end_time).strftime("%Y-%m-%d %H:%M:%S"),
                     "hours": hours,
+                    "sources": sources,
                 },
                 "risk_users": {"count": len(user_ids), "user_ids": user_ids, "details": details},
             }
@@ -214,11 +237,29 @@ class IncrementalRiskUserService:
         else:
             return []
 
+    async def advance_watermarks(self, risk_type: RiskType, end_time: int) -> None:
+        """
+        将各数据源的高水位推进到本次检测的截止时间
+
+        应在本次检测到的用户全部提交分析后调用，推进失败时下次会重复检测这段时间
+
+        Args:
+            risk_type: 风控类型
+            end_time: 本次检测的截止时间（Unix时间戳）
+        """
+        try:
+            await self.set_watermarks(risk_type, {source: end_time for source in TRIGGER_SOURCES})
+        except Exception as e:
+            logger.warning(f"记录增量检测高水位失败: {e}")
+
     async def get_incremental_users_by_risk_type(
         self, db: AsyncSession, risk_type: RiskType, hours: int = 6, limit: Optional[int] = None
-    ) -> List[Dict[str, Any]]:
+    ) -> Dict[str, Any]:
         """
-        根据风控类型过滤增量用户
+        根据风控类型获取上次检测之后的增量用户
+
+        只扫描各数据源高水位之后的数据（最多回溯 hours 小时）。本方法不推进高水位，
+        调用方处理完返回的用户后使用 time_range.end_time 调用 advance_watermarks
 
         Args:
             db: 数据库会话
@@ -227,72 +268,39 @@ class IncrementalRiskUserService:
             limit: 结果限制数量
 
         Returns:
-            过滤后的用户列表，包含user_id和trigger_reasons
+            success: 查询是否成功；users: 用户列表，包含user_id和trigger_reasons；
+            time_range: 本次检测的时间范围，sources 为各数据源的起始时间，end_time 为截止时间
         """
         try:
-            # 获取风控用户ID列表
-            risk_users_result = await self.get_incremental_risk_users(hours=hours)
+            watermarks = await self.get_watermarks(risk_type)
+            risk_users_result = await self.get_incremental_risk_users(
+                hours=hours, risk_type=risk_type, watermarks=watermarks
+            )
 
             if not risk_users_result["success"]:
                 logger.error(f"获取增量用户失败: {risk_users_result.get('error', 'Unknown error')}")
-                return []
-
-            user_ids = risk_users_result["risk_users"]["user_ids"]
-            if not user_ids:
+                return {"success": False, "users": [], "time_range": risk_users_result["time_range"]}
+
+            details = risk_users_result["risk_users"]["details"]
+            filtered_users = [
+                {
+                    "user_id": detail["user_id"],
+                    "trigger_reasons": detail["trigger_reasons"],
+                    "trigger_count": detail["trigger_count"],
+                    "risk_type": risk_type,
+                }
+                for detail in details
+            ]
+
+            if filtered_users:
+                logger.info(f"风控类型 {risk_type} 获取到 {len(filtered_users)} 个增量用户")
+            else:
                 logger.info("未发现需要风控检查的用户")
-                return []
-
-            # 根据风控类型构建用户类型过滤条件
-            user_type_condition = ""
-            if risk_type == RiskType.ALL_EMPLOYEE:
-                # 客户风控：userType='direct'
-                user_type_condition = "AND userType = 'direct'"
-            elif risk_type == RiskType.CRM_USER:
-                # 员工风控：userType='staff'
-                user_type_condition = "AND userType = 'staff'"
-            elif risk_type == RiskType.AGENT_USER:
-                # 代理商风控：userType='agent'
-                user_type_condition = "AND userType = 'agent'"
-            elif risk_type == RiskType.PAYMENT:
-                # 出金风控：包含所有用户类型
-                user_type_condition = ""
-
-            # 只查询用户ID和userType进行过滤
-            user_ids_str = ",".join(map(str, user_ids))
-            query_sql = f"""
-            SELECT id
-            FROM {self.database_name}.t_member
-            WHERE id IN ({user_ids_str})
-            {user_type_condition}
-            ORDER BY id
-            """
-
-            # 使用单例引擎和连接池（避免资源泄漏）
-            async with self._get_connection() as conn:
-                result = await conn.execute(text(query_sql))
-                rows = result.fetchall()
-
-            # 构建过滤后的用户列表
-            filtered_users = []
-            filtered_user_ids = [row[0] for row in rows]
-
-            for detail in risk_users_result["risk_users"]["details"]:
-                if detail["user_id"] in filtered_user_ids:
-                    filtered_users.append(
-                        {
-                            "user_id": detail["user_id"],
-                            "trigger_reasons": detail["trigger_reasons"],
-                            "trigger_count": detail["trigger_count"],
-                            "risk_type": risk_type,
-                        }
-                    )
-
-            logger.info(f"风控类型 {risk_type} 获取到 {len(filtered_users)} 个增量用户")
-            return filtered_users
+            return {"success": True, "users": filtered_users, "time_range": risk_users_result["time_range"]}
 
         except Exception as e:
             logger.exception(f"根据风控类型过滤增量用户失败: {str(e)}")
-            return []
+            return {"success": False, "users": [], "time_range": None}
 
     async def demo_risk_detection(self, hours: int = 6) -> Dict[str, Any]:
         """
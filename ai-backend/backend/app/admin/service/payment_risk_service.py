@@ -111,7 +111,11 @@ class PaymentRiskService:
                 # 直接分析数据
                 users_info = {"data": user_result.get("data")}
                 analysis_result = await data_analysis_service.analyze_data(
-                    db, users_info, basic_info, basic_info.get("model", {})
+                    db,
+                    users_info,
+                    basic_info,
+                    basic_info.get("model", {}),
+                    data_request=user_result.get("data_request"),
                 )
 
             except Exception as e:
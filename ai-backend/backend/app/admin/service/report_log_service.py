@@ -12,6 +12,8 @@ from backend.app.admin.crud.crud_risk_assistant import crud_risk_assistant
 from backend.app.admin.model.ai_assistant_report_log import AiAssistantReportLog
 from backend.app.admin.model.risk_member_analysis import RiskMemberAnalysis
 from backend.app.admin.model.risk_report_log import RiskReportLog
+from backend.app.admin.service.analyzed_member_index import analyzed_member_index
+from backend.common.log import log
 
 
 # 自定义JSON编码器，处理datetime和其他特殊类型
@@ -83,6 +85,13 @@ class ReportLogService:
 
         await db.commit()
         await db.refresh(report_log)
+
+        # 同步更新已分析用户位图，失败时不影响报告保存（位图过期后会从数据库重建）
+        if member_id and risk_type:
+            try:
+                await analyzed_member_index.add(risk_type=risk_type, member_id=member_id)
+            except Exception as e:
+                log.warning(f"Failed to update analyzed member index: {e}")
         return report_log
 
     @staticmethod
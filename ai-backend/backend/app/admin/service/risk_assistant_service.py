@@ -11,6 +11,7 @@ from backend.app.admin.schema.risk_assistant import (
     DeleteResponse,
     UpdateRiskAssistantParams,
 )
+from backend.app.admin.service.analysis_context_cache import analysis_context_cache
 from backend.common.pagination import PageData
 
 
@@ -110,6 +111,7 @@ class RiskAssistantService:
 
         # 更新风控助手
         updated_assistant = await crud_risk_assistant.update(db, db_obj=risk_assistant, obj_in=request)
+        await analysis_context_cache.invalidate()
         return self._assistant_to_dict(updated_assistant)
 
     async def delete_batch(self, db: AsyncSession, *, ids: List[str]) -> DeleteResponse:
@@ -122,6 +124,7 @@ class RiskAssistantService:
 
         # 批量删除
         deleted_count = await crud_risk_assistant.delete_batch(db, ids=ids)
+        await analysis_context_cache.invalidate()
         return DeleteResponse(deleted_count=deleted_count)
 
     async def update_status(self, db: AsyncSession, *, assistant_id: str, status: bool) -> Optional[dict]:
@@ -129,6 +132,7 @@ class RiskAssistantService:
         risk_assistant = await crud_risk_assistant.update_status(db, id=assistant_id, status=status)
         if not risk_assistant:
             return None
+        await analysis_context_cache.invalidate()
         return self._assistant_to_dict(risk_assistant)
 
     async def get_by_ai_model(self, db: AsyncSession, *, ai_model_id: str) -> List[dict]:
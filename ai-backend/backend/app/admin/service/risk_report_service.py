@@ -7,15 +7,15 @@
 import json
 
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Sequence
 
 from sqlalchemy import and_, func, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from backend.app.admin.crud.crud_risk_level import crud_risk_level
 from backend.app.admin.crud.crud_user import user_dao
 from backend.app.admin.model.risk_level import RiskLevel
 from backend.app.admin.model.risk_report_log import RiskReportLog
-from backend.app.admin.service.risk_level_service import risk_level_service
 from backend.common.enums import RiskType
 from backend.common.pagination import PageData
 
@@ -23,8 +23,74 @@ from backend.common.pagination import PageData
 class RiskReportService:
     """风控报告服务"""
 
-    async def _report_to_dict(self, db: AsyncSession, report: RiskReportLog) -> dict:
-        """将报告转换为字典"""
+    @staticmethod
+    def _load_json(value) -> dict:
+        """解析JSON字段，数据库驱动已解码的值直接返回，解析失败时返回空字典"""
+        if not value:
+            return {}
+        if not isinstance(value, str):
+            return value
+        try:
+            return json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            return {}
+
+    @staticmethod
+    def _handle_user_id(report: RiskReportLog) -> Optional[int]:
+        """需要从用户表补全处理人名称时返回处理人ID"""
+        if report.handle_user_name or not report.handle_user:
+            return None
+        try:
+            return int(str(report.handle_user))
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _match_risk_level(risk_levels: Sequence[RiskLevel], score: Optional[float]) -> Optional[RiskLevel]:
+        """在内存中的风控等级表中匹配分数，规则与 crud_risk_level.get_by_score 一致"""
+        if score is None:
+            return None
+        for level in risk_levels:
+            if level.start_score <= score < level.end_score:
+                return level
+        return None
+
+    async def _load_relations(
+        self, db: AsyncSession, reports: Sequence[RiskReportLog]
+    ) -> tuple[dict[int, str], Sequence[RiskLevel]]:
+        """
+        批量加载报告关联数据，避免逐行查询
+
+        :param db: 数据库会话
+        :param reports: 风控报告列表
+        :return: (处理人ID -> 名称, 风控等级表)
+        """
+        user_ids = {user_id for user_id in map(self._handle_user_id, reports) if user_id is not None}
+        user_names = {}
+        if user_ids:
+            try:
+                users = await user_dao.get_by_ids(db, list(user_ids))
+                user_names = {user.id: user.nickname or user.username for user in users}
+            except Exception:
+                # 忽略查询异常，保持名称为空
+                user_names = {}
+
+        risk_levels = []
+        if any(report.score is not None for report in reports):
+            risk_levels = await crud_risk_level.get_all(db)
+        return user_names, risk_levels
+
+    def _report_to_dict(
+        self, report: RiskReportLog, user_names: dict[int, str], risk_levels: Sequence[RiskLevel]
+    ) -> dict:
+        """
+        将报告转换为字典
+
+        :param report: 风控报告
+        :param user_names: 预加载的处理人名称，见 _load_relations
+        :param risk_levels: 预加载的风控等级表，见 _load_relations
+        :return:
+        """
         result = {
             "id": report.id,
             "assistant_id": report.assistant_id,
@@ -32,19 +98,20 @@ class RiskReportService:
             "risk_type": report.risk_type,
             "member_id": report.member_id,
             "report_score": report.report_score,
-            "sql_data": report.sql_data,
-            "prompt_data": report.prompt_data,
+            "sql_data": self._load_json(report.sql_data),
+            "prompt_data": self._load_json(report.prompt_data),
             "input_prompt": report.input_prompt,
             "score": report.score,
             "report_tags": report.report_tags,
             "report_result": report.report_result,
-            "report_table": report.report_table,
+            # 报告表格仅解析字符串，其他类型沿用原有行为返回空字典
+            "report_table": self._load_json(report.report_table) if isinstance(report.report_table, str) else {},
             "report_document": report.report_document,
             "report_pdf_url": report.report_pdf_url,
             "description": report.description,
             "report_status": report.report_status,
             "is_processed": report.is_processed,
-            "ai_response": report.ai_response,
+            "ai_response": self._load_json(report.ai_response),
             "created_time": report.created_time,
             "updated_time": report.updated_time,
             "handle_suggestion": report.handle_suggestion,
@@ -55,87 +122,28 @@ class RiskReportService:
             # 新增增量分析字段
             "analysis_type": report.analysis_type,
             "trigger_sources": report.trigger_sources,
-            "detection_window_info": report.detection_window_info,
+            "detection_window_info": self._load_json(report.detection_window_info),
         }
 
-        # 优先使用数据库中存储的 handle_user_name，如果没有则从用户表查询
-        handle_user_name: str | None = report.handle_user_name
-        if not handle_user_name and report.handle_user:
-            try:
-                user_id_int = int(str(report.handle_user))
-                user = await user_dao.get(db, user_id_int)
-                if user:
-                    handle_user_name = user.nickname or user.username
-            except Exception:
-                # 忽略转换或查询异常，保持名称为空
-                handle_user_name = None
-        result["handle_user_name"] = handle_user_name
-
-        # 根据report_score获取风险等级信息
-        risk_level_info = None
-        if report.score is not None:
-            risk_level_info = await risk_level_service.get_by_score(db, score=report.score)
+        # 优先使用数据库中存储的 handle_user_name，如果没有则使用从用户表预加载的名称
+        handle_user_id = self._handle_user_id(report)
+        result["handle_user_name"] = (
+            user_names.get(handle_user_id) if handle_user_id is not None else report.handle_user_name
+        )
 
-        # 添加风险等级信息到结果中
+        # 根据score匹配风险等级信息
+        risk_level = self._match_risk_level(risk_levels, report.score)
         result["risk_level"] = {
-            "name": risk_level_info["name"] if risk_level_info else None,
-            "description": risk_level_info["description"] if risk_level_info else None,
+            "name": risk_level.name if risk_level else None,
+            "description": risk_level.description if risk_level else None,
         }
-
-        # 安全解析JSON字段
-        try:
-            if result["sql_data"]:
-                if isinstance(result["sql_data"], str):
-                    result["sql_data"] = json.loads(result["sql_data"])
-                # 如果已经是字典类型，保持不变
-            else:
-                result["sql_data"] = {}
-        except (json.JSONDecodeError, TypeError):
-            result["sql_data"] = {}
-
-        try:
-            if result["prompt_data"]:
-                if isinstance(result["prompt_data"], str):
-                    result["prompt_data"] = json.loads(result["prompt_data"])
-                # 如果已经是字典类型，保持不变
-            else:
-                result["prompt_data"] = {}
-        except (json.JSONDecodeError, TypeError):
-            result["prompt_data"] = {}
-
-        try:
-            if result["report_table"]:
-                result["report_table"] = json.loads(result["report_table"])
-            else:
-                result["report_table"] = {}
-        except (json.JSONDecodeError, TypeError):
-            result["report_table"] = {}
-
-        try:
-            if result["ai_response"]:
-                if isinstance(result["ai_response"], str):
-                    result["ai_response"] = json.loads(result["ai_response"])
-                # 如果已经是字典类型，保持不变
-            else:
-                result["ai_response"] = {}
-        except (json.JSONDecodeError, TypeError):
-            result["ai_response"] = {}
-
-        # 处理检测窗口信息JSON字段
-        try:
-            if result["detection_window_info"]:
-                result["detection_window_info"] = (
-                    json.loads(result["detection_window_info"])
-                    if isinstance(result["detection_window_info"], str)
-                    else result["detection_window_info"]
-                )
-            else:
-                result["detection_window_info"] = {}
-        except (json.JSONDecodeError, TypeError):
-            result["detection_window_info"] = {}
-
         return result
 
+    async def _reports_to_dicts(self, db: AsyncSession, reports: Sequence[RiskReportLog]) -> list[dict]:
+        """批量将报告转换为字典，关联数据每批只查询一次"""
+        user_names, risk_levels = await self._load_relations(db, reports)
+        return [self._report_to_dict(report, user_names, risk_levels) for report in reports]
+
     async def get_paginated_list(
         self,
         db: AsyncSession,
@@ -233,13 +241,10 @@ class RiskReportService:
 
         # 转换为字典
         reports = result.scalars().all()
-        items = []
-        for report in reports:
-            item = await self._report_to_dict(db, report)
+        items = await self._reports_to_dicts(db, reports)
+        for item in items:
             # 移除不必要的大字段，降低响应体大小
-            if "report_result" in item:
-                del item["report_result"]
-            items.append(item)
+            item.pop("report_result", None)
 
         from math import ceil
 
@@ -266,7 +271,7 @@ class RiskReportService:
         report = result.scalars().first()
         if not report:
             return None
-        return await self._report_to_dict(db, report)
+        return (await self._reports_to_dicts(db, [report]))[0]
 
     async def process_report(
         self,
@@ -293,7 +298,7 @@ class RiskReportService:
         await db.commit()
         await db.refresh(report)
 
-        return await self._report_to_dict(db, report)
+        return (await self._reports_to_dicts(db, [report]))[0]
 
 
 risk_report_service = RiskReportService()
@@ -6,6 +6,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.app.admin.crud.crud_risk_tag import crud_risk_tag
 from backend.app.admin.schema.risk_tag import CreateRiskTagParams, DeleteResponse, UpdateRiskTagParams
+from backend.app.admin.service.analysis_context_cache import analysis_context_cache
 from backend.common.enums import RiskType
 from backend.common.pagination import PageData
 
@@ -95,6 +96,7 @@ class RiskTagService:
 
         # 创建风控标签
         tag = await crud_risk_tag.create(db, obj_in=request)
+        await analysis_context_cache.invalidate()
         return self._tag_to_dict(tag)
 
     async def update(self, db: AsyncSession, *, tag_id: int, request: UpdateRiskTagParams) -> Optional[dict]:
@@ -119,6 +121,7 @@ class RiskTagService:
 
         # 更新风控标签
         updated_tag = await crud_risk_tag.update(db, db_obj=tag, obj_in=request)
+        await analysis_context_cache.invalidate()
         return self._tag_to_dict(updated_tag)
 
     async def delete_batch(self, db: AsyncSession, *, ids: List[str]) -> DeleteResponse:
@@ -131,6 +134,7 @@ class RiskTagService:
 
         # 批量软删除
         deleted_count = await crud_risk_tag.delete_batch(db, ids=ids)
+        await analysis_context_cache.invalidate()
         return DeleteResponse(deleted_count=deleted_count)
 
     async def get_by_ids_include_deleted(self, db: AsyncSession, *, ids: List[str]) -> List[dict]:
@@ -11,8 +11,8 @@ from enum import Enum
 # sys.path.append('/home/user/www/ai-backend')
 from typing import Any, Dict, List, Optional, Union
 
-from sqlalchemy import URL, select, text
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.sql.schema import Table
 
 from backend.app.admin.model.risk_member_analysis import RiskMemberAnalysis
@@ -24,9 +24,11 @@ from backend.app.admin.schema.warehouse_user import (
     WarehouseUserQueryParams,
     WarehouseUserResponse,
 )
+from backend.app.admin.service.analyzed_member_index import analyzed_member_index
 from backend.common.enums import RiskType
 from backend.common.pagination import PageData
 from backend.core.conf import settings
+from backend.database.warehouse import warehouse_engines
 
 
 class UserType(str, Enum):
@@ -47,56 +49,16 @@ class WarehouseUserService:
             if hasattr(settings, "DATABASE_WAREHOUSE_NAME") and settings.DATABASE_WAREHOUSE_NAME
             else "devapi1_mtarde_c"
         )
-        self._engine = None
-        self._engine_lock = None
-
-    async def _get_engine(self):
-        """获取或创建数据库引擎（单例模式）"""
-        if self._engine is None:
-            if self._engine_lock is None:
-                import asyncio
-
-                self._engine_lock = asyncio.Lock()
-
-            async with self._engine_lock:
-                if self._engine is None:
-                    url = self._create_warehouse_url()
-                    self._engine = create_async_engine(
-                        url,
-                        pool_size=20,  # 增加基本连接池大小
-                        max_overflow=30,  # 增加溢出连接数
-                        pool_timeout=30,  # 获取连接超时时间
-                        pool_recycle=3600,  # 1小时回收连接
-                        pool_pre_ping=True,  # 连接前检测
-                        echo=False,
-                    )
-                    logger.info("Created warehouse database engine")
-        return self._engine
-
-    # SQLAlchemy 会在进程结束时自动清理连接池，不需要手动管理
 
     """数据仓用户服务"""
 
-    def _create_warehouse_url(self, database_name: Optional[str] = None) -> URL:
-        """创建数据仓库连接URL"""
-        return URL.create(
-            drivername="mysql+asyncmy",
-            username=settings.DATABASE_WAREHOUSE_USER,
-            password=settings.DATABASE_WAREHOUSE_PASSWORD,
-            host=settings.DATABASE_WAREHOUSE_HOST,
-            port=settings.DATABASE_WAREHOUSE_PORT,
-            database=database_name or self.database_name,
-            query={"charset": settings.DATABASE_WAREHOUSE_CHARSET},
-        )
-
     async def get_t_member_table(self, db: AsyncSession) -> Optional[Table]:
         """获取 t_member 表结构"""
         try:
             # 使用连接池管理的数据库连接
-            engine = await self._get_engine()
 
             # 使用反射获取表结构
-            async with engine.connect() as conn:
+            async with warehouse_engines.connect(self.database_name) as conn:
                 # 检查表是否存在
                 result = await conn.execute(
                     text(
@@ -121,8 +83,6 @@ class WarehouseUserService:
                 columns = result.fetchall()
                 [col[0] for col in columns]
 
-            # 不再手动 dispose 引擎，由连接池管理
-
             # 使用MetaData创建Table对象
             from sqlalchemy import Boolean, Column, DateTime, Integer, MetaData, String, Table
 
@@ -178,12 +138,8 @@ class WarehouseUserService:
     async def check_t_member_root_path_exists(self) -> bool:
         """检查 t_member_root_path 表是否存在"""
         try:
-            # 创建数据仓库连接
-            url = self._create_warehouse_url()
-            engine = create_async_engine(url)
-
             # 检查表是否存在
-            async with engine.connect() as conn:
+            async with warehouse_engines.connect(self.database_name) as conn:
                 result = await conn.execute(
                     text(
                         "SELECT COUNT(*) FROM information_schema.tables "
@@ -194,7 +150,6 @@ class WarehouseUserService:
 
                 exists = result.scalar() > 0
 
-            await engine.dispose()
             return exists
 
         except Exception as e:
@@ -206,11 +161,7 @@ class WarehouseUserService:
     ) -> Dict[str, Any]:
         """执行查询并返回分页结果"""
         try:
-            # 创建数据仓库连接
-            url = self._create_warehouse_url()
-            engine = create_async_engine(url)
-
-            async with engine.connect() as conn:
+            async with warehouse_engines.connect(self.database_name) as conn:
                 # 执行计数查询
                 count_sql = f"SELECT COUNT(*) FROM ({query_sql}) as total_count"
                 count_result = await conn.execute(text(count_sql), params or {})
@@ -224,8 +175,6 @@ class WarehouseUserService:
                 rows = result.fetchall()
                 items = [dict(row._mapping) for row in rows]
 
-            await engine.dispose()
-
             return {"items": items, "total": total, "page": page, "size": size}
 
         except Exception as e:
@@ -235,17 +184,12 @@ class WarehouseUserService:
     async def _execute_query_all(self, query_sql: str, params: Dict = None) -> List[Dict[str, Any]]:
         """执行查询并返回所有结果（不分页）"""
         try:
-            # 创建数据仓库连接
-            url = self._create_warehouse_url()
-            engine = create_async_engine(url)
-
-            async with engine.connect() as conn:
+            async with warehouse_engines.connect(self.database_name) as conn:
                 result = await conn.execute(text(query_sql), params or {})
                 # 获取所有结果
                 rows = result.fetchall()
                 items = [dict(row._mapping) for row in rows]
 
-            await engine.dispose()
             return items
 
         except Exception as e:
@@ -477,8 +421,7 @@ class WarehouseUserService:
 
         try:
             # 使用连接池管理的数据库连接
-            engine = await self._get_engine()
-            async with engine.connect() as conn:
+            async with warehouse_engines.connect(self.database_name) as conn:
                 result = await conn.execute(text(query_sql))
                 user = result.fetchone()
 
@@ -623,11 +566,7 @@ class WarehouseUserService:
         has_root_path_table = await self.check_t_member_root_path_exists()
 
         try:
-            # 创建数据仓库连接
-            url = self._create_warehouse_url()
-            engine = create_async_engine(url)
-
-            async with engine.connect() as conn:
+            async with warehouse_engines.connect(self.database_name) as conn:
                 if has_root_path_table:
                     # 如果t_member_root_path表存在，使用该表查询层级关系
                     agent_ids_str = ",".join(map(str, valid_agent_ids))
@@ -654,7 +593,6 @@ class WarehouseUserService:
                 result = await conn.execute(text(query_sql))
                 user_ids = [row[0] for row in result.fetchall()]
 
-            await engine.dispose()
             return user_ids
 
         except Exception as e:
@@ -698,7 +636,8 @@ class WarehouseUserService:
     ) -> List[UserDetailResponse]:
         """获取未分析的用户
 
-        根据风险类型获取未分析的用户
+        根据风险类型获取未分析的用户：按 id 升序分页扫描数据仓库，用 Redis 中的已分析用户位图过滤，
+        并记录扫描高水位（该ID及以下均已分析），下次从高水位之后继续，SQL 大小与已分析人数无关
 
         参数:
         - risk_type: 风险类型，不同的风险类型将使用不同的SQL查询
@@ -707,95 +646,95 @@ class WarehouseUserService:
         返回:
         - 未分析用户信息列表
         """
-        # 获取已分析的用户ID
-        analyzed_ids = await self.get_analyzed_member_ids(db, risk_type=risk_type)
-
-        # 构建查询条件
-        conditions = []
-        query_params = {}
-
-        # 排除已分析的用户
-        if analyzed_ids:
-            analyzed_ids_str = ",".join(analyzed_ids)
-            conditions.append(f"id NOT IN ({analyzed_ids_str})")
-
-        # 根据用户类型构建不同的查询
+        # 根据用户类型构建不同的查询条件
         if risk_type == RiskType.ALL_EMPLOYEE:
             # 客户条件：userType='direct'
-            conditions.append("userType = 'direct'")
-
-            # 构建SQL
-            where_clause = self._build_where_clause(conditions)
-            limit_clause = f"LIMIT {limit}" if limit is not None else ""
-            query_sql = f"""
-                SELECT id, nickname, email, username, sex, status,
-                       create_time, last_login_time, avatar, phone, level
-                FROM t_member
-                {where_clause}
-                ORDER BY id ASC
-                {limit_clause}
-            """
-
+            type_condition = "userType = 'direct'"
         elif risk_type == RiskType.CRM_USER:
             # 员工条件：userType='staff'
-            conditions.append("userType = 'staff'")
-
-            # 构建SQL
-            where_clause = self._build_where_clause(conditions)
-            limit_clause = f"LIMIT {limit}" if limit is not None else ""
-            query_sql = f"""
-                SELECT id, nickname, email, username, sex, status,
-                       create_time, last_login_time, avatar, phone, level
-                FROM t_member
-                {where_clause}
-                ORDER BY id ASC
-                {limit_clause}
-            """
-
+            type_condition = "userType = 'staff'"
         elif risk_type == RiskType.AGENT_USER:
             # 代理用户条件：userType='agent'
-            conditions.append("userType = 'agent'")
-
-            # 构建SQL
-            where_clause = self._build_where_clause(conditions)
-            limit_clause = f"LIMIT {limit}" if limit is not None else ""
-            query_sql = f"""
-                SELECT id, nickname, email, username, sex, status,
-                       create_time, last_login_time, avatar, phone, level
-                FROM t_member
-                {where_clause}
-                ORDER BY id ASC
-                {limit_clause}
-            """
-
+            type_condition = "userType = 'agent'"
         elif risk_type == RiskType.PAYMENT:
             # 财务风控：查询所有用户（可根据业务需求调整条件）
-            # 构建SQL
-            where_clause = self._build_where_clause(conditions)
-            limit_clause = f"LIMIT {limit}" if limit is not None else ""
-            query_sql = f"""
-                SELECT id, nickname, email, username, sex, status,
-                       create_time, last_login_time, avatar, phone, level
-                FROM t_member
-                {where_clause}
-                ORDER BY id ASC
-                {limit_clause}
-            """
+            type_condition = None
         else:
             # 不支持的用户类型
             logger.error(f"Unsupported user_type: {risk_type}")
             return []
 
+        # 已分析用户判断：优先使用 Redis 位图，Redis 不可用时退化为内存集合
+        use_index = True
         try:
-            # 创建数据仓库连接
-            url = self._create_warehouse_url()
-            engine = create_async_engine(url)
+            await analyzed_member_index.ensure_loaded(db, risk_type=risk_type)
+            cursor = await analyzed_member_index.get_cursor(risk_type=risk_type)
+        except Exception as e:
+            logger.warning(f"Analyzed member index unavailable, falling back to database: {e}")
+            use_index = False
+            analyzed_ids = {
+                int(member_id)
+                for member_id in await self.get_analyzed_member_ids(db, risk_type=risk_type)
+                if member_id.isdigit()
+            }
+            cursor = 0
 
-            async with engine.connect() as conn:
-                result = await conn.execute(text(query_sql), query_params)
-                users = result.fetchall()
+        conditions = ["id > :after_id"]
+        if type_condition:
+            conditions.append(type_condition)
+        where_clause = self._build_where_clause(conditions)
+        page_size = settings.RISK_UNANALYZED_SCAN_PAGE_SIZE
+        query_sql = f"""
+            SELECT id, nickname, email, username, sex, status,
+                   create_time, last_login_time, avatar, phone, level
+            FROM t_member
+            {where_clause}
+            ORDER BY id ASC
+            LIMIT {page_size}
+        """
+
+        try:
+            users = []
+            after_id = cursor
+            high_water = cursor
+            prefix_analyzed = True
+            pages = 0
+            async with warehouse_engines.connect(self.database_name) as conn:
+                while limit is None or pages < settings.RISK_UNANALYZED_SCAN_MAX_PAGES:
+                    pages += 1
+                    result = await conn.execute(text(query_sql), {"after_id": after_id})
+                    rows = result.fetchall()
+                    if not rows:
+                        break
+
+                    row_ids = [row._mapping["id"] for row in rows]
+                    if use_index:
+                        analyzed_flags = await analyzed_member_index.contains_many(
+                            risk_type=risk_type, member_ids=row_ids
+                        )
+                    else:
+                        analyzed_flags = [row_id in analyzed_ids for row_id in row_ids]
+
+                    for row, row_id, analyzed in zip(rows, row_ids, analyzed_flags):
+                        if analyzed:
+                            # 高水位只越过连续的已分析用户，未分析（含本次返回但分析失败）的用户下次仍会被扫描到
+                            if prefix_analyzed:
+                                high_water = row_id
+                            continue
+                        prefix_analyzed = False
+                        users.append(row)
+                        if limit is not None and len(users) >= limit:
+                            break
+
+                    if (limit is not None and len(users) >= limit) or len(rows) < page_size:
+                        break
+                    after_id = row_ids[-1]
 
-            await engine.dispose()
+            if use_index and high_water > cursor:
+                await analyzed_member_index.set_cursor(risk_type=risk_type, member_id=high_water)
+            logger.info(
+                f"Selected {len(users)} unanalyzed users for {risk_type}, scanned {pages} pages from id {cursor}"
+            )
 
             # 转换数据并创建UserDetailResponse对象
             converted_users = []
@@ -826,11 +765,7 @@ class WarehouseUserService:
     async def get_all_countries(self) -> List[Dict[str, Any]]:
         """获取所有国家列表（不分页）"""
         try:
-            # 创建数据仓库连接
-            url = self._create_warehouse_url()
-            engine = create_async_engine(url)
-
-            async with engine.connect() as conn:
+            async with warehouse_engines.connect(self.database_name) as conn:
                 # 检查表是否存在
                 result = await conn.execute(
                     text(
@@ -841,7 +776,6 @@ class WarehouseUserService:
                 )
 
                 if result.scalar() == 0:
-                    await engine.dispose()
                     logger.warning("t_country table does not exist")
                     return []
 
@@ -850,8 +784,6 @@ class WarehouseUserService:
                 result = await conn.execute(text(query_sql))
                 countries = result.fetchall()
 
-            await engine.dispose()
-
             # 转换为字典列表
             return [dict(country._mapping) for country in countries]
 
@@ -864,8 +796,6 @@ class WarehouseUserService:
         try:
             # 检查t_member_root_path表是否存在
             has_root_path_table = await self.check_t_member_root_path_exists()
-            url = self._create_warehouse_url()
-            engine = create_async_engine(url)
             if has_root_path_table:
                 condict = ""
                 for agent_id in agent_ids:
@@ -873,7 +803,7 @@ class WarehouseUserService:
                         f"path LIKE '{agent_id},%' OR path LIKE '%,{agent_id},%' OR path LIKE '%,{agent_id}' AND "
                     )
                 condict = condict[:-5]
-                async with engine.connect() as conn:
+                async with warehouse_engines.connect(self.database_name) as conn:
                     query_sql = f"""
                         SELECT member_id
                         FROM t_member_root_path
@@ -881,7 +811,6 @@ class WarehouseUserService:
                     """
                     result = await conn.execute(text(query_sql))
                     user_ids = [row[0] for row in result.fetchall()]
-                await engine.dispose()
                 return user_ids
 
         except Exception as e:
@@ -933,9 +862,7 @@ class WarehouseUserService:
                 condict += f"id IN ({','.join([f'{user_id}' for user_id in user_ids])}) AND "
             if condict:
                 condict = condict[:-5]
-                url = self._create_warehouse_url()
-                engine = create_async_engine(url)
-                async with engine.connect() as conn:
+                async with warehouse_engines.connect(self.database_name) as conn:
                     query_sql = f"""
                         SELECT DISTINCT id
                         FROM t_member
@@ -943,7 +870,6 @@ class WarehouseUserService:
                     """
                     result = await conn.execute(text(query_sql))
                     member_ids = [row[0] for row in result.fetchall()]
-                await engine.dispose()
                 return member_ids
             return []
         except Exception as e:
@@ -961,19 +887,13 @@ class WarehouseUserService:
         - 用户名列表: 返回用户ID列表，只包含找到的用户ID
         """
         try:
-            # 创建数据仓库连接
-            url = self._create_warehouse_url()
-            engine = create_async_engine(url)
-
             # 处理单个用户名
             if isinstance(username, str):
-                async with engine.connect() as conn:
+                async with warehouse_engines.connect(self.database_name) as conn:
                     query_sql = "SELECT id FROM t_member WHERE username = :username LIMIT 1"
                     result = await conn.execute(text(query_sql), {"username": username})
                     user = result.fetchone()
 
-                await engine.dispose()
-
                 if user:
                     return user[0]
                 return None
@@ -987,13 +907,11 @@ class WarehouseUserService:
                 placeholders = ", ".join([f":username{i}" for i in range(len(usernames))])
                 params = {f"username{i}": username for i, username in enumerate(usernames)}
 
-                async with engine.connect() as conn:
+                async with warehouse_engines.connect(self.database_name) as conn:
                     query_sql = f"SELECT id, username FROM t_member WHERE username IN ({placeholders})"
                     result = await conn.execute(text(query_sql), params)
                     users = result.fetchall()
 
-                await engine.dispose()
-
                 # 返回找到的用户ID列表
                 return [user[0] for user in users]
 
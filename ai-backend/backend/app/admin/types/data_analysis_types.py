@@ -64,6 +64,7 @@ class UserDataResult(TypedDict):
     success: bool
     message: str
     data: Optional[Dict[str, Any]]
+    data_request: Optional[Dict[str, DataSourceConfig]]
 
 
 class AnalysisResult(TypedDict, total=False):
@@ -104,6 +105,7 @@ class ModelConfig(TypedDict, total=False):
     base_url: Optional[str]
     model_name: Optional[str]
     temperature: Optional[float]
+    context_window: Optional[int]  # 模型上下文长度，未配置时按模型名称匹配
 
 
 class TrainingLogResult(TypedDict):
@@ -25,14 +25,14 @@ from backend.app.home.schema.ai_chat import (
 from backend.app.home.service.agent_service import agent_service
 from backend.app.home.service.ai_chat_service import ai_chat_service
 from backend.app.home.service.ai_model_service import ai_model_service
+from backend.app.home.service.stream_registry import stream_registry
 from backend.common.log import logger
 from backend.common.pagination import PageData
 from backend.database.db import get_db
 from backend.utils.format_output import format_message
+from backend.utils.sse import coalesce_sse
 
 router = APIRouter()
-interruption_status = {}
-confirm_intent_message = {}
 
 
 # 自定义JSON编码器，处理AIMessage对象和枚举类型
@@ -85,8 +85,8 @@ async def stream_chat_completion(
     assistant_message = await ai_chat_service.create_assistant_message(
         db, chat_id=request.chat_id, content="", is_interrupted=False
     )
-    # 生成唯一的任务ID
-    interruption_status[request.chat_id] = False
+    # 登记流式任务，中断信号可由任意进程发出
+    stream_handle = await stream_registry.register(request.chat_id)
 
     # 获取聊天历史消息
     history_messages = await agent_service.get_history_messages(db, chat)
@@ -144,23 +144,17 @@ async def stream_chat_completion(
                 # 保持健壮性，转换失败时不影响主流程
                 crm_user_id = None
 
-            # 创建中断检查器函数
-            def check_interruption():
-                return interruption_status.get(chat_id, False)
-
             async for message in chat_agent.auto_orchestrate(
                 user_query=request.message,
                 conversation_history=history_messages,
                 action=action,
-                last_confirm_intent_message=confirm_intent_message.get(chat_id),
+                last_confirm_intent_message=None,
                 crm_user_id=crm_user_id,
-                interruption_checker=check_interruption,  # 传递中断检查器
+                interruption_checker=stream_handle,  # 传递中断检查器（只读本地标记）
                 result_format=result_format,
             ):
                 message = format_message(message)
 
-                # if message.get("type") == "confirm_intent_message":
-                #     confirm_intent_message[chat_id] = message
                 # print(message)
                 full_content.append(message)
                 # 将字典转换为JSON字符串
@@ -176,11 +170,11 @@ async def stream_chat_completion(
                             and message.get("type") in ["chat", "error", "md_info", "step"]
                         ):
                             full_message += message.get("message")
-                    yield f"data: {json.dumps(message, ensure_ascii=False)}\n\n"
+                    yield message
                 else:
                     if isinstance(message, str):
                         full_message += message
-                    yield f"data: {str(message)}\n\n"
+                    yield str(message)
 
             if file_message:
                 full_message += f"\n以下是相关文件\n{file_message}"
@@ -209,7 +203,7 @@ async def stream_chat_completion(
                 response_data=json.dumps(full_content, ensure_ascii=False, cls=CustomJSONEncoder),
                 is_interrupted=True,
             )
-            yield f"data: {json.dumps({'type': 'interrupted', 'message': interrupted_message}, ensure_ascii=False)}\n\n"
+            yield {"type": "interrupted", "message": interrupted_message}
         except Exception as e:
             # 发生错误时，更新消息内容并标记为已中断
             await ai_chat_service.update_message_content(
@@ -219,13 +213,13 @@ async def stream_chat_completion(
                 content=full_message,
                 is_interrupted=True,
             )
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)}, ensure_ascii=False)}\n"
+            yield {"type": "error", "message": str(e)}
 
         finally:
-            if chat_id in interruption_status:
-                del interruption_status[chat_id]
+            await stream_registry.unregister(stream_handle)
 
-    return StreamingResponse(generate_stream(), media_type="text/event-stream")
+    # 文本增量按时间/大小预算合并为 SSE 帧，步骤等边界消息立即刷新
+    return StreamingResponse(coalesce_sse(generate_stream()), media_type="text/event-stream")
 
 
 @router.post("/interrupt/{chat_id}")
@@ -235,8 +229,10 @@ async def interrupt_stream(
     current_user: User = Depends(get_current_home_user),
 ):
     """中断指定的流式任务"""
-    if chat_id in interruption_status:
-        interruption_status[chat_id] = True
+    interrupted = await stream_registry.interrupt(chat_id)
+    if interrupted is None:
+        raise HTTPException(status_code=503, detail="Interruption signal not delivered")
+    if interrupted:
         return {"status": 1, "message": "Interruption signal sent"}
     else:
         raise HTTPException(status_code=404, detail="Task not found")
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式对话注册表
+
+活跃的流式对话记录在 Redis 中（所属进程 + 心跳续期），中断信号通过 pub/sub 广播到所有进程，
+并额外写入短期标记，防止订阅重连期间丢失信号。每个流在本进程内持有一个 StreamHandle，
+中断检查只读取本地标记，保持 O(1)。
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+
+from typing import Dict, Optional
+
+from backend.core.conf import settings
+from backend.database.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+# 仅当 key 仍属于当前流时删除，避免误删同一会话中新开启的流
+_RELEASE_SCRIPT = """
+local value = redis.call('GET', KEYS[1])
+if value and cjson.decode(value)['token'] == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class StreamHandle:
+    """本进程内的流句柄，可直接作为 interruption_checker 使用"""
+
+    def __init__(self, chat_id: str, token: str):
+        self.chat_id = chat_id
+        self.token = token
+        self.interrupted = False
+
+    def __call__(self) -> bool:
+        return self.interrupted
+
+
+class StreamRegistry:
+    """基于 Redis 的流式对话注册表与中断广播"""
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._streams: Dict[str, StreamHandle] = {}
+        self._tasks: list[asyncio.Task] = []
+
+    @staticmethod
+    def _stream_key(chat_id: str) -> str:
+        return f"{settings.STREAM_REGISTRY_REDIS_PREFIX}:active:{chat_id}"
+
+    @staticmethod
+    def _interrupt_key(chat_id: str) -> str:
+        return f"{settings.STREAM_REGISTRY_REDIS_PREFIX}:interrupt:{chat_id}"
+
+    @staticmethod
+    def _channel() -> str:
+        return f"{settings.STREAM_REGISTRY_REDIS_PREFIX}:interrupt"
+
+    async def start(self) -> None:
+        """启动中断订阅与心跳任务"""
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._listen_interrupts()),
+            asyncio.create_task(self._heartbeat()),
+        ]
+
+    async def stop(self) -> None:
+        """停止后台任务并释放本进程登记的流"""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for handle in list(self._streams.values()):
+            await self.unregister(handle)
+
+    async def register(self, chat_id: str) -> StreamHandle:
+        """
+        登记一个流式对话，同一会话中新开启的流会取代旧流
+
+        :param chat_id: 会话ID
+        :return:
+        """
+        handle = StreamHandle(chat_id, uuid.uuid4().hex)
+        self._streams[chat_id] = handle
+        value = json.dumps({"token": handle.token, "owner": self.worker_id, "started_at": time.time()})
+        try:
+            async with redis_client.pipeline(transaction=True) as pipe:
+                pipe.set(self._stream_key(chat_id), value, ex=settings.STREAM_REGISTRY_TTL_SECONDS)
+                # 清除上一个流遗留的中断标记
+                pipe.delete(self._interrupt_key(chat_id))
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to register stream {chat_id}: {e}")
+        return handle
+
+    async def unregister(self, handle: StreamHandle) -> None:
+        """注销流式对话"""
+        if self._streams.get(handle.chat_id) is handle:
+            del self._streams[handle.chat_id]
+        try:
+            await redis_client.eval(_RELEASE_SCRIPT, 1, self._stream_key(handle.chat_id), handle.token)
+        except Exception as e:
+            logger.warning(f"Failed to unregister stream {handle.chat_id}: {e}")
+
+    async def interrupt(self, chat_id: str) -> Optional[bool]:
+        """
+        中断会话当前的流，任意进程均可调用
+
+        :param chat_id: 会话ID
+        :return: 会话是否存在活跃的流；Redis 不可用且流不在本进程时返回 None，表示中断信号未送达
+        """
+        handle = self._streams.get(chat_id)
+        if handle is not None:
+            handle.interrupted = True
+
+        try:
+            if not await redis_client.exists(self._stream_key(chat_id)):
+                return handle is not None
+
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.set(self._interrupt_key(chat_id), self.worker_id, ex=settings.STREAM_INTERRUPT_EXPIRE_SECONDS)
+                pipe.publish(self._channel(), chat_id)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Failed to broadcast interrupt for stream {chat_id}: {e}")
+            return True if handle is not None else None
+        return True
+
+    def _mark_interrupted(self, chat_id: str) -> None:
+        handle = self._streams.get(chat_id)
+        if handle is not None and not handle.interrupted:
+            handle.interrupted = True
+            logger.info(f"Stream {chat_id} interrupted")
+
+    async def _listen_interrupts(self) -> None:
+        """订阅中断频道，断线后自动重连"""
+        while True:
+            pubsub = redis_client.pubsub()
+            try:
+                await pubsub.subscribe(self._channel())
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message and message.get("type") == "message":
+                        self._mark_interrupted(message.get("data"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Stream interrupt subscription lost, reconnecting: {e}")
+                await asyncio.sleep(1)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    async def _heartbeat(self) -> None:
+        """为本进程的流续期，并补偿订阅期间可能丢失的中断信号"""
+        while True:
+            await asyncio.sleep(settings.STREAM_HEARTBEAT_INTERVAL_SECONDS)
+            chat_ids = list(self._streams)
+            if not chat_ids:
+                continue
+            try:
+                async with redis_client.pipeline(transaction=False) as pipe:
+                    for chat_id in chat_ids:
+                        pipe.expire(self._stream_key(chat_id), settings.STREAM_REGISTRY_TTL_SECONDS)
+                        pipe.exists(self._interrupt_key(chat_id))
+                    results = await pipe.execute()
+                for chat_id, interrupted in zip(chat_ids, results[1::2]):
+                    if interrupted:
+                        self._mark_interrupted(chat_id)
+            except Exception as e:
+                logger.warning(f"Stream heartbeat failed: {e}")
+
+
+stream_registry: StreamRegistry = StreamRegistry()
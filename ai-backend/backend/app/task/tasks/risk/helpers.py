@@ -5,6 +5,7 @@
 风险分析任务辅助函数
 """
 
+from collections import defaultdict
 from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple
@@ -13,15 +14,21 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.app.admin.crud.crud_risk_assistant import crud_risk_assistant
 from backend.app.admin.model.risk_assistant import RiskAssistant
+from backend.app.admin.service.analysis_context_cache import analysis_context_cache
 from backend.app.admin.service.data_analysis_service import DataAnalysisService
 from backend.app.admin.service.warehouse_user_service import UserType, warehouse_user_service
-from backend.app.admin.types import QueryCondition
+from backend.app.admin.types import DataSourceConfig, QueryCondition
 from backend.common.enums import RiskType
 from backend.common.log import logger
+from backend.core.conf import settings
 from backend.database.db import get_db
 
 data_analysis_service = DataAnalysisService()
 
+# 批量取数结果按用户拆分时使用的用户ID列，用户基本信息表以 id 标识用户
+USER_ID_COLUMNS = ("member_id", "user_id")
+TABLE_USER_ID_COLUMNS = {"user_data": "id"}
+
 
 # ==================== 工具函数 ====================
 
@@ -48,10 +55,19 @@ async def _get_db_session():
             pass
 
 
-def _create_detection_window_info(time_window_hours: int, trigger_source: str) -> Dict[str, Any]:
-    """创建检测窗口信息"""
+def _create_detection_window_info(trigger_source: str, window_start: int, window_end: int) -> Dict[str, Any]:
+    """
+    创建检测窗口信息
+
+    :param trigger_source: 触发数据源（逗号分隔）
+    :param window_start: 实际扫描的起始时间（Unix时间戳，不含）
+    :param window_end: 实际扫描的截止时间（Unix时间戳，含）
+    :return:
+    """
     return {
-        "time_window_hours": time_window_hours,
+        "time_window_hours": round((window_end - window_start) / 3600, 2),
+        "window_start": datetime.fromtimestamp(window_start).isoformat(),
+        "window_end": datetime.fromtimestamp(window_end).isoformat(),
         "analysis_time": datetime.now().isoformat(),
         "trigger_source": trigger_source,
     }
@@ -68,6 +84,15 @@ def _create_task_info(user_id: str, task_id: str, **extra_fields) -> Dict[str, A
     return task_info
 
 
+def _no_user_data_message(user_id: str, user_nickname: str, query_condition: Dict[str, Any]) -> str:
+    """用户无数据时的提示信息"""
+    return (
+        f"用户 {user_nickname} (ID: {user_id}) 在时间范围 "
+        f"{query_condition.get('data_time_range_type', 'quarter')} 内没有找到任何数据记录。"
+        "建议：1) 扩大查询时间范围 2) 检查用户是否有实际业务数据 3) 确认数据源配置正确"
+    )
+
+
 # ==================== 响应处理函数 ====================
 
 
@@ -226,47 +251,55 @@ async def _validate_user_and_assistant(
 async def _build_analysis_basic_info(
     db: AsyncSession, assistant: RiskAssistant, setting: Dict[str, Any]
 ) -> Dict[str, Any]:
-    """构建分析基础信息"""
+    """构建分析基础信息（按助手ID和更新时间缓存）"""
     import json
 
     from backend.common.enums import AnalysisType, TrainingLogType
 
-    if isinstance(assistant.variable_config, dict):
-        output_format_table = assistant.variable_config
-    elif isinstance(assistant.variable_config, str):
-        try:
-            output_format_table = json.loads(assistant.variable_config)
-        except json.JSONDecodeError:
+    async def load() -> Dict[str, Any]:
+        if isinstance(assistant.variable_config, dict):
+            output_format_table = assistant.variable_config
+        elif isinstance(assistant.variable_config, str):
+            try:
+                output_format_table = json.loads(assistant.variable_config)
+            except json.JSONDecodeError:
+                output_format_table = {}
+        else:
             output_format_table = {}
-    else:
-        output_format_table = {}
 
-    if isinstance(assistant.report_config, dict):
-        output_format_document = assistant.report_config
-    elif isinstance(assistant.report_config, str):
-        try:
-            output_format_document = json.loads(assistant.report_config)
-        except json.JSONDecodeError:
+        if isinstance(assistant.report_config, dict):
+            output_format_document = assistant.report_config
+        elif isinstance(assistant.report_config, str):
+            try:
+                output_format_document = json.loads(assistant.report_config)
+            except json.JSONDecodeError:
+                output_format_document = {}
+        else:
             output_format_document = {}
-    else:
-        output_format_document = {}
-
-    return await data_analysis_service.build_basic_info(
-        db=db,
-        assistant_id=assistant.id,
-        ai_model_id=assistant.ai_model_id,
-        name=assistant.name,
-        description=assistant.role,
-        background=assistant.background or "",
-        model_definition=assistant.task_prompt,
-        output_format_table=output_format_table,
-        output_format_document=output_format_document.get("content", "")
-        if isinstance(output_format_document, dict)
-        else str(output_format_document or ""),
-        analysis_type=AnalysisType.risk,
-        risk_type=assistant.risk_type,
-        training_type=TrainingLogType.risk_control_assistant,
-    )
+
+        basic_info = await data_analysis_service.build_basic_info(
+            db=db,
+            assistant_id=assistant.id,
+            ai_model_id=assistant.ai_model_id,
+            name=assistant.name,
+            description=assistant.role,
+            background=assistant.background or "",
+            model_definition=assistant.task_prompt,
+            output_format_table=output_format_table,
+            output_format_document=output_format_document.get("content", "")
+            if isinstance(output_format_document, dict)
+            else str(output_format_document or ""),
+            analysis_type=AnalysisType.risk,
+            risk_type=assistant.risk_type,
+            training_type=TrainingLogType.risk_control_assistant,
+        )
+        # API Key 不写入 Redis
+        return data_analysis_service.without_model_api_key(basic_info)
+
+    updated_time = assistant.updated_time.isoformat() if assistant.updated_time else ""
+    basic_info = await analysis_context_cache.get_or_load("risk_basic_info", f"{assistant.id}:{updated_time}", load)
+    basic_info["model"] = await data_analysis_service.with_model_api_key(db, basic_info.get("model"))
+    return basic_info
 
 
 async def _perform_user_analysis(
@@ -302,18 +335,18 @@ async def _perform_user_analysis(
 
         user_data = user_result.get("data")
         if not user_data:
-            error_msg = (
-                f"用户 {user_nickname} (ID: {user_id}) 在时间范围 "
-                f"{query_condition.get('data_time_range_type', 'quarter')} 内没有找到任何数据记录。"
-                "建议：1) 扩大查询时间范围 2) 检查用户是否有实际业务数据 3) 确认数据源配置正确"
-            )
+            error_msg = _no_user_data_message(user_id, user_nickname, query_condition)
             logger.warning(error_msg)
             return False, None, error_msg
 
         # 执行分析
         users_info = {"data": user_data}
         analysis_result = await data_analysis_service.analyze_data(
-            db, users_info, basic_info, basic_info.get("model", {})
+            db,
+            users_info,
+            basic_info,
+            basic_info.get("model", {}),
+            data_request=user_result.get("data_request"),
         )
 
         return True, analysis_result, ""
@@ -324,6 +357,168 @@ async def _perform_user_analysis(
         return False, None, error_msg
 
 
+# ==================== 批量分析函数 ====================
+
+
+async def _resolve_batch_users(
+    db: AsyncSession, users: List[Dict[str, Any]]
+) -> Tuple[List[Dict[str, Any]], List[Tuple[Dict[str, Any], str]]]:
+    """
+    校验批量任务中的用户，补全缺失的昵称
+
+    :return: (有效用户列表, [(无效用户, 错误信息)])
+    """
+    valid_users = []
+    invalid_users = []
+    for user in users:
+        user_id = user.get("user_id")
+        if not user_id:
+            invalid_users.append((user, "未提供用户ID"))
+            continue
+        if "user_nickname" not in user:
+            user_detail = await warehouse_user_service.get_user_detail(db, int(user_id), UserType.WAREHOUSE)
+            if not user_detail:
+                invalid_users.append((user, f"未找到用户ID {user_id} 的信息"))
+                continue
+            user = {**user, "user_nickname": user_detail.nickname or ""}
+        valid_users.append({**user, "user_id": str(user_id)})
+    return valid_users, invalid_users
+
+
+def _user_data_request(
+    batch_request: Dict[str, DataSourceConfig], user_id: str, query_types: Optional[List[str]] = None
+) -> Dict[str, DataSourceConfig]:
+    """从批量查询参数派生单个用户的查询参数，沿用相同的时间范围"""
+    return {
+        query_type: DataSourceConfig(user_id=[user_id], range_time=config["range_time"])
+        for query_type, config in batch_request.items()
+        if query_types is None or query_type in query_types
+    }
+
+
+def _split_batch_user_data(
+    batch_data: Dict[str, Any],
+    user_ids: List[str],
+    row_limit: Optional[int] = None,
+    rows_per_user: Optional[int] = None,
+) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """
+    将批量取数结果按用户拆分
+
+    没有用户ID列的数据源（如按 MT 账号查询的交易表）以及返回行数达到上限、可能被截断的数据源不拆分，
+    由调用方按用户单独补查。每个用户的行数截断到 rows_per_user，与单用户查询返回的行数上限一致
+
+    :param batch_data: MCP 返回的按数据源组织的数据
+    :param user_ids: 批量查询的用户ID列表
+    :param row_limit: 批量查询时每个数据源的行数上限
+    :param rows_per_user: 拆分后每个用户每个数据源保留的行数上限
+    :return: (用户ID -> 该用户的数据, 需要按用户补查的数据源)
+    """
+    user_data_map: Dict[str, Dict[str, Any]] = {user_id: {} for user_id in user_ids}
+    refetch_sources = []
+    for query_type, table_data in batch_data.items():
+        if not table_data:
+            # 查询成功但没有数据
+            for user_data in user_data_map.values():
+                user_data[query_type] = []
+            continue
+        if not isinstance(table_data, dict) or "columns" not in table_data:
+            refetch_sources.append(query_type)
+            continue
+
+        columns = table_data.get("columns") or []
+        rows = table_data.get("rows") or []
+        id_column = TABLE_USER_ID_COLUMNS.get(query_type) or next((c for c in USER_ID_COLUMNS if c in columns), None)
+        if id_column not in columns or (row_limit and len(rows) >= row_limit):
+            refetch_sources.append(query_type)
+            continue
+
+        id_index = columns.index(id_column)
+        rows_by_user = defaultdict(list)
+        for row in rows:
+            rows_by_user[str(row[id_index])].append(row)
+        for user_id, user_data in user_data_map.items():
+            # 按 MCP 返回顺序保留前 rows_per_user 行，与单用户查询的 LIMIT 结果一致
+            user_rows = rows_by_user.get(user_id, [])[:rows_per_user]
+            user_data[query_type] = (
+                {"columns": columns, "rows": user_rows, "count": len(user_rows)} if user_rows else []
+            )
+    return user_data_map, refetch_sources
+
+
+async def _fetch_batch_user_data(
+    user_ids: List[str],
+    data_sources: List[str],
+    query_condition: Dict[str, Any],
+    crm_user_id: int,
+) -> Tuple[Dict[str, DataSourceConfig], Dict[str, Dict[str, Any]], List[str]]:
+    """
+    一次 MCP 调用获取批量用户的数据并按用户拆分，批量查询失败时所有数据源改为按用户查询
+
+    :return: (批量查询参数, 用户ID -> 该用户的数据, 需要按用户补查的数据源)
+    """
+    row_limit = settings.RISK_BATCH_ROWS_PER_USER * len(user_ids)
+    batch_request = await data_analysis_service.build_data_sources(
+        data_sources, user_ids, query_condition, limit=row_limit
+    )
+    try:
+        batch_data = await data_analysis_service.get_batch_user_data(batch_request, crm_user_id)
+    except Exception as e:
+        logger.warning(f"批量获取 {len(user_ids)} 个用户数据失败，改为按用户查询: {str(e)}")
+        return batch_request, {user_id: {} for user_id in user_ids}, list(data_sources)
+
+    user_data_map, refetch_sources = _split_batch_user_data(
+        batch_data, user_ids, row_limit, rows_per_user=settings.RISK_BATCH_ROWS_PER_USER
+    )
+    # MCP 未返回的数据源同样按用户补查
+    refetch_sources.extend(s for s in data_sources if s not in batch_data and s not in refetch_sources)
+    if refetch_sources:
+        logger.info(f"数据源 {refetch_sources} 无法从批量结果中按用户拆分，将按用户补查")
+    return batch_request, user_data_map, refetch_sources
+
+
+async def _perform_batch_user_analysis(
+    db: AsyncSession,
+    user_id: str,
+    user_nickname: str,
+    user_data: Dict[str, Any],
+    refetch_sources: List[str],
+    batch_request: Dict[str, DataSourceConfig],
+    basic_info: Dict[str, Any],
+    analysis_prompt: Dict[str, Any],
+    query_condition: Dict[str, Any],
+    crm_user_id: int,
+) -> Tuple[bool, Optional[Dict[str, Any]], str]:
+    """分析批量取数中的单个用户，无法从批量结果拆分的数据源按该用户补查"""
+    try:
+        user_data = dict(user_data)
+        if refetch_sources:
+            refetched = await data_analysis_service.get_batch_user_data(
+                _user_data_request(batch_request, user_id, refetch_sources), crm_user_id
+            )
+            user_data.update(refetched)
+
+        if not user_data:
+            error_msg = _no_user_data_message(user_id, user_nickname, query_condition)
+            logger.warning(error_msg)
+            return False, None, error_msg
+
+        analysis_result = await data_analysis_service.analyze_data(
+            db,
+            {"data": user_data},
+            basic_info,
+            basic_info.get("model", {}),
+            data_request=_user_data_request(batch_request, user_id),
+            analysis_prompt=analysis_prompt,
+        )
+        return True, analysis_result, ""
+
+    except Exception as e:
+        error_msg = f"数据分析服务调用失败: {str(e)}"
+        logger.error(error_msg)
+        return False, None, error_msg
+
+
 async def _save_analysis_result(
     db: AsyncSession,
     assistant: RiskAssistant,
@@ -1,4 +1,6 @@
-from typing import Any, Dict, Optional
+import asyncio
+
+from typing import Any, Dict, List, Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -8,6 +10,7 @@ from backend.app.admin.service.incremental_risk_user_service import incremental_
 from backend.app.task.celery import celery_app
 from backend.common.enums import RiskAnalysisType, RiskType
 from backend.common.log import logger
+from backend.core.conf import settings
 from backend.database.db import async_db_session
 
 # 导入辅助函数
@@ -18,11 +21,14 @@ from .helpers import (
     _create_error_response,
     _create_success_response,
     _create_task_info,
+    _fetch_batch_user_data,
     _get_data_sources,
     _get_db_session,
     _get_target_users,
     _merge_analysis_config,
+    _perform_batch_user_analysis,
     _perform_user_analysis,
+    _resolve_batch_users,
     _save_analysis_result,
     _validate_analysis_config,
     _validate_and_get_assistant,
@@ -98,11 +104,17 @@ async def _process_parallel_incremental_risk_analysis(
     setting = setting or {}
 
     try:
-        incremental_users_data = await incremental_risk_user_service.get_incremental_users_by_risk_type(
-            db, risk_type=RiskType(assistant.risk_type), hours=time_window_hours, limit=None
+        risk_type = RiskType(assistant.risk_type)
+        incremental_result = await incremental_risk_user_service.get_incremental_users_by_risk_type(
+            db, risk_type=risk_type, hours=time_window_hours, limit=None
         )
+        incremental_users_data = incremental_result["users"]
+        time_range = incremental_result["time_range"]
 
         if not incremental_users_data:
+            if incremental_result["success"]:
+                # 本次时间段内没有需要检测的用户，直接推进高水位
+                await incremental_risk_user_service.advance_watermarks(risk_type, time_range["end_time"])
             return {
                 "status": False,
                 "message": "未找到增量用户",
@@ -114,26 +126,33 @@ async def _process_parallel_incremental_risk_analysis(
 
         total_users = len(incremental_users_data)
         all_task_results = []
-
-        for user_data in incremental_users_data:
-            user_id = user_data["user_id"]
-            trigger_source = user_data["trigger_reasons"]
-
-            task_kwargs = {
-                "risk_type": assistant.risk_type,
-                "user_id": str(user_id),
-                "analysis_type": RiskAnalysisType.INCREMENTAL,
-                "trigger_sources": trigger_source,
-                "detection_window_info": _create_detection_window_info(time_window_hours, trigger_source),
+        sources, end_time = time_range["sources"], time_range["end_time"]
+
+        def _window_start(trigger_reasons: str) -> int:
+            # 用户的检测窗口从其触发数据源中最早的起始时间开始
+            starts = [sources[reason] for reason in trigger_reasons.split(",") if reason in sources]
+            return min(starts or sources.values())
+
+        batch_users = [
+            {
+                "user_id": str(user_data["user_id"]),
+                "trigger_sources": user_data["trigger_reasons"],
+                "detection_window_info": _create_detection_window_info(
+                    user_data["trigger_reasons"], _window_start(user_data["trigger_reasons"]), end_time
+                ),
             }
-            if setting:
-                task_kwargs["setting"] = setting
-            if task_creator_id:
-                task_kwargs["task_creator_id"] = task_creator_id
-
-            task = process_single_user_risk_analysis.delay(**task_kwargs)  # type: ignore[attr-defined]
+            for user_data in incremental_users_data
+        ]
+        for users in _chunk_users(batch_users):
+            task = _submit_batch_analysis(
+                assistant, users, setting, task_creator_id, analysis_type=RiskAnalysisType.INCREMENTAL
+            )
+            all_task_results.extend(
+                _create_task_info(user["user_id"], task.id, trigger_source=user["trigger_sources"]) for user in users
+            )
 
-            all_task_results.append(_create_task_info(str(user_id), task.id, trigger_source=trigger_source))
+        # 所有批次提交成功后才推进高水位，提交失败时下次重新检测这段时间
+        await incremental_risk_user_service.advance_watermarks(risk_type, end_time)
 
         return {
             "status": True,
@@ -165,19 +184,12 @@ async def _process_parallel_risk_analysis(
             return {"status": False, "message": "未找到未分析的用户", "total_submitted": 0, "submitted_tasks": []}
 
         task_results = []
-        for user in unanalyzed_users:
-            task_kwargs = {
-                "risk_type": assistant.risk_type,
-                "user_id": str(user.id),
-                "user_nickname": user.nickname,
-            }
-            if setting:
-                task_kwargs["setting"] = setting
-            if task_creator_id:
-                task_kwargs["task_creator_id"] = task_creator_id
-
-            task = process_single_user_risk_analysis.delay(**task_kwargs)  # type: ignore[attr-defined]
-            task_results.append(_create_task_info(str(user.id), task.id, user_nickname=user.nickname))
+        batch_users = [{"user_id": str(user.id), "user_nickname": user.nickname} for user in unanalyzed_users]
+        for users in _chunk_users(batch_users):
+            task = _submit_batch_analysis(assistant, users, setting, task_creator_id)
+            task_results.extend(
+                _create_task_info(user["user_id"], task.id, user_nickname=user["user_nickname"]) for user in users
+            )
 
         return {
             "status": True,
@@ -191,6 +203,166 @@ async def _process_parallel_risk_analysis(
         return {"status": False, "message": str(e)}
 
 
+def _chunk_users(users: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """按批量大小拆分用户"""
+    batch_size = max(1, settings.RISK_BATCH_SIZE)
+    return [users[i : i + batch_size] for i in range(0, len(users), batch_size)]
+
+
+def _submit_batch_analysis(
+    assistant: RiskAssistant,
+    users: List[Dict[str, Any]],
+    setting: Dict[str, Any],
+    task_creator_id: Optional[int] = None,
+    analysis_type: str = RiskAnalysisType.STOCK,
+) -> Any:
+    """提交批量用户风控分析任务"""
+    task_kwargs = {
+        "risk_type": assistant.risk_type,
+        "users": users,
+        "analysis_type": analysis_type,
+    }
+    if setting:
+        task_kwargs["setting"] = setting
+    if task_creator_id:
+        task_kwargs["task_creator_id"] = task_creator_id
+
+    return process_batch_user_risk_analysis.delay(**task_kwargs)  # type: ignore[attr-defined]
+
+
+@celery_app.task(
+    name="process_batch_user_risk_analysis",
+    bind=True,
+    autoretry_for=(ConnectionError, TimeoutError, OSError),
+    retry_kwargs={"max_retries": 2, "countdown": 30},
+    time_limit=1800,  # 硬超时：30分钟
+    soft_time_limit=1680,  # 软超时：28分钟
+)
+async def process_batch_user_risk_analysis(
+    self,
+    risk_type: str,
+    users: List[Dict[str, Any]],
+    setting: Optional[Dict[str, Any]] = None,
+    analysis_type: str = RiskAnalysisType.STOCK,
+    **kwargs,
+) -> dict:
+    """
+    批量用户风控分析任务
+
+    助手配置、分析基础信息和提示配置每批只构建一次，所有用户的数据通过一次 MCP 调用获取后按用户拆分，
+    各用户的分析在共享的并发限制下执行，结果按用户分别保存
+
+    :param users: 用户列表，每项包含 user_id，可选 user_nickname、trigger_sources、detection_window_info
+    """
+    setting = setting or {}
+    task_id = self.request.id
+
+    def _fail_all(message: str) -> dict:
+        logger.error(message)
+        return {
+            "status": False,
+            "message": message,
+            "results": [
+                _create_error_response(
+                    str(user.get("user_id") or "unknown"), message, task_id, user.get("user_nickname")
+                )
+                for user in users
+            ],
+        }
+
+    async with async_db_session() as db:
+        try:
+            is_valid, assistant, error_msg = await _validate_and_get_assistant(db, RiskType(risk_type))
+            if not is_valid or assistant is None:
+                return _fail_all(error_msg)
+
+            # 配置验证和准备
+            analysis_config = _merge_analysis_config(assistant.setting or {}, setting)
+            is_valid, error_msg = _validate_analysis_config(analysis_config)
+            if not is_valid:
+                return _fail_all(f"配置验证失败: {error_msg}")
+
+            basic_info = await _build_analysis_basic_info(db, assistant, analysis_config)
+            data_sources = _get_data_sources(analysis_config)
+            query_condition = _build_query_condition(analysis_config)
+            analysis_prompt = await data_analysis_service.get_analysis_prompt(db, basic_info)
+
+            # 获取任务创建者ID，未提供时（比如通过Flower调用）使用系统默认用户
+            task_creator_id = kwargs.get("task_creator_id")
+            if not task_creator_id:
+                task_creator_id = settings.SYSTEM_DEFAULT_USER_ID
+                logger.warning(f"使用系统默认用户ID: {task_creator_id}")
+            crm_user_id = int(task_creator_id)
+
+            valid_users, invalid_users = await _resolve_batch_users(db, users)
+            results = [
+                _create_error_response(str(user.get("user_id") or "unknown"), message, task_id)
+                for user, message in invalid_users
+            ]
+            if not valid_users:
+                return {"status": False, "message": "没有可分析的用户", "results": results}
+
+            batch_request, user_data_map, refetch_sources = await _fetch_batch_user_data(
+                [user["user_id"] for user in valid_users], data_sources, query_condition, crm_user_id
+            )
+        except Exception as e:
+            logger.exception(f"批量风控分析任务准备失败: {str(e)}")
+            return _fail_all(str(e))
+
+    semaphore = asyncio.Semaphore(max(1, settings.RISK_BATCH_ANALYSIS_CONCURRENCY))
+
+    async def _analyze_user(user: Dict[str, Any]) -> dict:
+        user_id = user["user_id"]
+        user_nickname = user.get("user_nickname") or ""
+        async with semaphore:
+            try:
+                # AsyncSession 不能并发使用，每个用户使用独立的会话
+                async with async_db_session() as user_db:
+                    success, analysis_result, error_msg = await _perform_batch_user_analysis(
+                        user_db,
+                        user_id,
+                        user_nickname,
+                        user_data_map.get(user_id, {}),
+                        refetch_sources,
+                        batch_request,
+                        basic_info,
+                        analysis_prompt,
+                        query_condition,
+                        crm_user_id,
+                    )
+                    if not success:
+                        return _create_error_response(user_id, error_msg, task_id, user_nickname)
+
+                    await _save_analysis_result(
+                        user_db,
+                        assistant,
+                        user_id,
+                        user_nickname,
+                        basic_info,
+                        analysis_result,
+                        data_sources,
+                        query_condition,
+                        analysis_type,
+                        user.get("trigger_sources"),
+                        user.get("detection_window_info"),
+                    )
+                return _create_success_response(
+                    user_id, user_nickname, True, "分析完成", analysis_result.get("data"), task_id
+                )
+            except Exception as e:
+                logger.exception(f"批量任务中用户 {user_id} 风控分析失败: {str(e)}")
+                return _create_error_response(user_id, str(e), task_id, user_nickname)
+
+    results.extend(await asyncio.gather(*(_analyze_user(user) for user in valid_users)))
+    success_count = sum(1 for result in results if result.get("status"))
+    logger.info(f"批量风控分析任务完成: {success_count}/{len(users)} 个用户分析成功")
+    return {
+        "status": success_count > 0,
+        "message": f"{success_count}/{len(users)} 个用户分析完成",
+        "results": results,
+    }
+
+
 @celery_app.task(
     name="process_single_user_risk_analysis",
     bind=True,
@@ -5,14 +5,12 @@ AI服务调用日志记录器
 记录所有AI服务的请求、响应、状态和时间等信息
 """
 
-import json
 import os
 import uuid
 
 from typing import Any, Dict, List, Optional
 
-from loguru import logger
-
+from backend.common.log_pipeline import AsyncLogWriter, should_sample, truncate_payload
 from backend.core.path_conf import LOG_DIR
 from backend.utils.timezone import timezone
 
@@ -21,31 +19,9 @@ class AIServiceLogger:
     """AI服务调用日志记录器"""
 
     def __init__(self):
-        self.logger = logger
         self.log_requests = os.getenv("AI_LOG_REQUESTS", "false").lower() == "true"  # 默认不记录请求
-        self._setup_ai_logger()
-
-    def _setup_ai_logger(self):
-        """设置AI服务专用日志文件"""
-        if not os.path.exists(LOG_DIR):
-            os.makedirs(LOG_DIR, exist_ok=True)
-
-        # AI服务日志文件路径
-        ai_log_file = os.path.join(LOG_DIR, "ai_service.log")
-
-        # 添加AI服务专用日志处理器
-        self.logger.add(
-            str(ai_log_file),
-            level="WARNING",  # 改为WARNING级别，减少AI请求日志
-            format="{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | {message}",
-            enqueue=False,  # 同步写入，确保日志立即写入文件
-            rotation="00:00",  # 每天轮转
-            retention="30 days",  # 保留30天
-            compression="zip",  # 压缩旧日志
-            filter=lambda record: record["extra"].get("ai_service", False),
-            backtrace=False,
-            diagnose=False,
-        )
+        # AI服务专用日志文件，后台线程批量写入，按大小轮转
+        self.writer = AsyncLogWriter(LOG_DIR / "ai_service.log")
 
     def log_ai_request(
         self,
@@ -70,22 +46,19 @@ class AIServiceLogger:
             "service_name": service_name,
             "model_name": model_name,
             "base_url": base_url,
-            "request_data": request_data,
+            # 消息内容按采样记录截断后的预览
+            "request_data": truncate_payload(request_data) if should_sample() else {"sampled": False},
             "user_id": user_id,
             "chat_id": chat_id,
             "agent_id": agent_id,
             "request_type": "REQUEST",
         }
 
-        # 添加额外的配置信息，避免重复的关键字参数
+        # 添加额外的配置信息，已存在的键不覆盖
         for key, value in kwargs.items():
-            if key not in log_data:
-                log_data[key] = value
-            else:
-                # 如果键已存在，记录警告但不覆盖
-                self.logger.warning(f"Duplicate key '{key}' in log_ai_request kwargs, ignoring kwargs value")
+            log_data.setdefault(key, value)
 
-        self.logger.bind(ai_service=True).info(f"AI_REQUEST | {json.dumps(log_data, ensure_ascii=False)}")
+        self.writer.write("INFO", "AI_REQUEST", log_data)
 
     def log_ai_response(
         self,
@@ -94,33 +67,51 @@ class AIServiceLogger:
         status_code: int = 200,
         response_time: float = 0.0,
         error_message: Optional[str] = None,
+        model_name: Optional[str] = None,
         **kwargs,
     ):
-        """记录AI服务响应"""
+        """记录AI服务响应，调用次数、耗时和内容长度汇总为指标，开启请求日志时另写一条响应记录"""
+        response_time_ms = round(response_time * 1000, 2)
+        self.writer.record(
+            f"ai:{model_name or 'unknown'}",
+            response_time_ms,
+            error=status_code >= 400,
+            content_length=response_data.get("content_length"),
+            estimated_tokens=response_data.get("estimated_tokens"),
+            chunks=response_data.get("chunk_count"),
+        )
+        if not self.log_requests:
+            return
+
         log_data = {
             "request_id": request_id,
             "timestamp": timezone.now().isoformat(),
-            "response_data": response_data,
+            "model_name": model_name,
+            "response_data": truncate_payload(response_data),
             "status_code": status_code,
-            "response_time_ms": round(response_time * 1000, 2),
+            "response_time_ms": response_time_ms,
             "error_message": error_message,
             "response_type": "RESPONSE",
             **kwargs,
         }
 
-        self.logger.bind(ai_service=True).info(f"AI_RESPONSE | {json.dumps(log_data, ensure_ascii=False)}")
+        self.writer.write("INFO", "AI_RESPONSE", log_data)
 
     def log_ai_error(self, request_id: str, error_message: str, error_type: str, **kwargs):
         """记录AI服务错误"""
         log_data = {
             "request_id": request_id,
             "timestamp": timezone.now().isoformat(),
-            "error_message": error_message,
+            "error_message": truncate_payload(error_message),
             "error_type": error_type,
             **kwargs,
         }
 
-        self.logger.bind(ai_service=True).error(f"AI_ERROR | {json.dumps(log_data, ensure_ascii=False)}")
+        self.writer.write("ERROR", "AI_ERROR", log_data)
+
+    def shutdown(self) -> None:
+        """写完队列中的日志"""
+        self.writer.shutdown()
 
 
 # 创建全局AI服务日志记录器实例
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+服务调用日志管道
+
+调用方只把日志记录放入有界队列（队列满时丢弃并计数），序列化、批量写盘和按大小轮转都在后台线程完成，
+不阻塞事件循环。载荷只保留截断后的预览，调用次数、耗时等按周期汇总为指标输出。
+"""
+
+import atexit
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from backend.core.conf import settings
+
+_STOP = object()
+
+
+def should_sample() -> bool:
+    """按 SERVICE_LOG_PAYLOAD_SAMPLE_RATE 决定是否记录载荷预览"""
+    return random.random() < settings.SERVICE_LOG_PAYLOAD_SAMPLE_RATE
+
+
+def truncate_payload(value: Any, _depth: int = 0) -> Any:
+    """
+    生成载荷的有界预览，开销只与预览大小有关，不会完整遍历或序列化大载荷
+
+    :param value: 原始载荷
+    :return:
+    """
+    max_chars = settings.SERVICE_LOG_PAYLOAD_MAX_CHARS
+    max_items = settings.SERVICE_LOG_PAYLOAD_MAX_ITEMS
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        return value if len(value) <= max_chars else f"{value[:max_chars]}...(+{len(value) - max_chars} chars)"
+    if _depth >= settings.SERVICE_LOG_PAYLOAD_MAX_DEPTH:
+        size = f", {len(value)} items" if isinstance(value, (dict, list, tuple)) else ""
+        return f"<{type(value).__name__}{size}>"
+    if isinstance(value, dict):
+        preview = {str(k): truncate_payload(v, _depth + 1) for k, v in islice(value.items(), max_items)}
+        if len(value) > max_items:
+            preview["..."] = f"+{len(value) - max_items} keys"
+        return preview
+    if isinstance(value, (list, tuple)):
+        preview = [truncate_payload(v, _depth + 1) for v in islice(value, max_items)]
+        if len(value) > max_items:
+            preview.append(f"...(+{len(value) - max_items} items)")
+        return preview
+    return truncate_payload(str(value), _depth)
+
+
+class ServiceMetrics:
+    """按名称累计调用次数、错误数、耗时与计数类指标，周期性汇总后清零"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict[str, float]] = {}
+
+    def record(self, name: str, duration_ms: float, error: bool = False, **counts: float) -> None:
+        """
+        记录一次调用
+
+        :param name: 指标名称（如 query_type、模型名）
+        :param duration_ms: 耗时（毫秒）
+        :param error: 是否失败
+        :param counts: 需要累加的计数（如返回行数、内容长度）
+        :return:
+        """
+        with self._lock:
+            item = self._data.get(name)
+            if item is None:
+                item = self._data[name] = {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0}
+            item["count"] += 1
+            item["errors"] += int(error)
+            item["total_ms"] += duration_ms
+            item["max_ms"] = max(item["max_ms"], duration_ms)
+            for key, value in counts.items():
+                if value is not None:
+                    item[key] = item.get(key, 0) + value
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """取出当前周期的指标并清零"""
+        with self._lock:
+            data, self._data = self._data, {}
+        for item in data.values():
+            item["avg_ms"] = round(item["total_ms"] / item["count"], 2) if item["count"] else 0.0
+            item["total_ms"] = round(item["total_ms"], 2)
+            item["max_ms"] = round(item["max_ms"], 2)
+        return data
+
+
+class AsyncLogWriter:
+    """
+    后台线程批量写入的日志文件
+
+    write() 只做入队，首次写入时启动后台线程；进程退出时尽量写完队列中的日志。
+    """
+
+    def __init__(self, log_file: Path):
+        self.log_file = Path(log_file)
+        self.metrics = ServiceMetrics()
+        self.dropped = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=settings.SERVICE_LOG_QUEUE_SIZE)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def write(self, level: str, tag: str, record: Dict[str, Any]) -> None:
+        """
+        提交一条日志（非阻塞）
+
+        :param level: 日志级别
+        :param tag: 日志类型标记，如 MCP_REQUEST
+        :param record: 日志内容，需为写入后不再修改的新字典
+        :return:
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((time.time(), level, tag, record))
+        except queue.Full:
+            self.dropped += 1
+
+    def record(self, name: str, duration_ms: float, error: bool = False, **counts: float) -> None:
+        """记录一次调用的指标，按 SERVICE_LOG_METRICS_INTERVAL_SECONDS 周期汇总写入"""
+        self._ensure_started()
+        self.metrics.record(name, duration_ms, error, **counts)
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"log-writer-{self.log_file.stem}", daemon=True)
+                self._thread.start()
+                atexit.register(self.shutdown)
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """写完队列中的日志并停止后台线程"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return
+        thread.join(timeout)
+
+    @staticmethod
+    def _format(item) -> str:
+        ts, level, tag, record = item
+        timestamp = datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+        try:
+            body = json.dumps(record, ensure_ascii=False, default=str)
+        except (TypeError, ValueError) as e:
+            body = json.dumps({"log_error": str(e)})
+        return f"{timestamp} | {level:<8} | {tag} | {body}\n"
+
+    def _metrics_item(self):
+        metrics = self.metrics.snapshot()
+        dropped, self.dropped = self.dropped, 0
+        if not metrics and not dropped:
+            return None
+        return time.time(), "INFO", "METRICS", {"metrics": metrics, "dropped": dropped}
+
+    def _run(self) -> None:
+        stream = None
+        size = 0
+        next_metrics_at = time.monotonic() + settings.SERVICE_LOG_METRICS_INTERVAL_SECONDS
+        stopping = False
+        while not stopping:
+            timeout = min(settings.SERVICE_LOG_FLUSH_INTERVAL_SECONDS, max(0.0, next_metrics_at - time.monotonic()))
+            batch = []
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+                while len(batch) < settings.SERVICE_LOG_BATCH_SIZE:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if _STOP in batch:
+                batch.remove(_STOP)
+                stopping = True
+
+            if stopping or time.monotonic() >= next_metrics_at:
+                next_metrics_at = time.monotonic() + settings.SERVICE_LOG_METRICS_INTERVAL_SECONDS
+                metrics_item = self._metrics_item()
+                if metrics_item is not None:
+                    batch.append(metrics_item)
+            if not batch:
+                continue
+
+            data = "".join(self._format(item) for item in batch).encode("utf-8")
+            try:
+                if stream is None:
+                    self.log_file.parent.mkdir(parents=True, exist_ok=True)
+                    stream = open(self.log_file, "ab")
+                    size = stream.tell()
+                if size and size + len(data) > settings.SERVICE_LOG_MAX_BYTES:
+                    stream.close()
+                    self._rotate()
+                    stream = open(self.log_file, "ab")
+                    size = 0
+                stream.write(data)
+                stream.flush()
+                size += len(data)
+            except OSError:
+                # 写盘失败时丢弃本批日志，下次重新打开文件
+                if stream is not None:
+                    stream.close()
+                stream = None
+        if stream is not None:
+            stream.close()
+
+    def _rotate(self) -> None:
+        """按大小轮转：log -> log.1 -> log.2 ...，超出保留数量的最旧文件被覆盖"""
+        backup_count = settings.SERVICE_LOG_BACKUP_COUNT
+        if backup_count <= 0:
+            os.remove(self.log_file)
+            return
+        for i in range(backup_count - 1, 0, -1):
+            src = Path(f"{self.log_file}.{i}")
+            if src.exists():
+                os.replace(src, f"{self.log_file}.{i + 1}")
+        os.replace(self.log_file, f"{self.log_file}.1")
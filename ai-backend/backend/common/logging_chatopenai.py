@@ -5,6 +5,7 @@ ChatOpenAI包装类，用于拦截和记录所有AI服务调用
 支持 LangSmith 追踪
 """
 
+import contextlib
 import time
 
 from typing import Any, Dict, List, Optional, Union
@@ -37,6 +38,8 @@ class LoggingChatOpenAI(ChatOpenAI):
         model_id = kwargs.pop("model_id", None)
         intent_name = kwargs.pop("intent_name", None)
         model_alias_name = kwargs.pop("model_alias_name", None)
+        # 模型并发信号量（由客户端池按模型共享）
+        concurrency_limiter = kwargs.pop("concurrency_limiter", None)
         # 打印完整的 kwargs 配置信息
         logger.info(
             f"[模型信息：LoggingChatOpenAI.__init__] kwargs:intent_name={intent_name}, model_name={model_alias_name}, model={kwargs.get('model')}, model_id={model_id}, base_url={kwargs.get('base_url')}, temperature={kwargs.get('temperature')}"
@@ -49,6 +52,7 @@ class LoggingChatOpenAI(ChatOpenAI):
         object.__setattr__(self, "_langsmith_metadata", langsmith_metadata)
         object.__setattr__(self, "_service_name", "ChatOpenAI")
         object.__setattr__(self, "_model_id", model_id)
+        object.__setattr__(self, "_concurrency_limiter", concurrency_limiter)
         object.__setattr__(self, "_config_info", self._extract_config_info())
 
     def _extract_config_info(self):
@@ -66,6 +70,22 @@ class LoggingChatOpenAI(ChatOpenAI):
             "max_retries": getattr(self, "max_retries", 2),
         }
 
+    @staticmethod
+    def _request_info(messages) -> Dict[str, Any]:
+        """提取请求信息；未开启请求日志时跳过，避免在事件循环中遍历完整提示词"""
+        if not ai_service_logger.log_requests:
+            return {"messages": [], "total_tokens": 0}
+        return extract_request_info(messages)
+
+    def _log_model_name(self) -> str:
+        """用于日志指标的模型名称"""
+        return getattr(self, "_config_info", {}).get("model", "unknown")
+
+    def _concurrency_slot(self):
+        """获取模型并发槽位，未设置并发上限时不限制"""
+        limiter = getattr(self, "_concurrency_limiter", None)
+        return limiter if limiter is not None else contextlib.nullcontext()
+
     def _prepare_langsmith_config(
         self,
         config: Optional[Dict[str, Any]] = None,
@@ -141,7 +161,7 @@ class LoggingChatOpenAI(ChatOpenAI):
             messages = [{"role": "user", "content": messages}]
 
         # 提取请求信息
-        request_info = extract_request_info(messages)
+        request_info = self._request_info(messages)
 
         # 准备 LangSmith 配置
         service_name = getattr(self, "_service_name", "ChatOpenAI")
@@ -182,6 +202,7 @@ class LoggingChatOpenAI(ChatOpenAI):
             # 记录响应
             ai_service_logger.log_ai_response(
                 request_id=request_id,
+                model_name=self._log_model_name(),
                 response_data=response_info,
                 status_code=200,
                 response_time=response_time,
@@ -203,6 +224,7 @@ class LoggingChatOpenAI(ChatOpenAI):
             # 记录错误响应
             ai_service_logger.log_ai_response(
                 request_id=request_id,
+                model_name=self._log_model_name(),
                 response_data={"error": str(e)},
                 status_code=500,
                 response_time=response_time,
@@ -229,7 +251,7 @@ class LoggingChatOpenAI(ChatOpenAI):
             messages = [{"role": "user", "content": messages}]
 
         # 提取请求信息
-        request_info = extract_request_info(messages)
+        request_info = self._request_info(messages)
 
         # 准备 LangSmith 配置
         service_name = getattr(self, "_service_name", "ChatOpenAI")
@@ -259,7 +281,8 @@ class LoggingChatOpenAI(ChatOpenAI):
 
         try:
             # 调用原始方法（会自动使用 LangSmith 追踪）
-            response = await super().ainvoke(messages, config, **kwargs)
+            async with self._concurrency_slot():
+                response = await super().ainvoke(messages, config, **kwargs)
 
             # 计算响应时间
             response_time = time.time() - start_time
@@ -270,6 +293,7 @@ class LoggingChatOpenAI(ChatOpenAI):
             # 记录响应
             ai_service_logger.log_ai_response(
                 request_id=request_id,
+                model_name=self._log_model_name(),
                 response_data=response_info,
                 status_code=200,
                 response_time=response_time,
@@ -291,6 +315,7 @@ class LoggingChatOpenAI(ChatOpenAI):
             # 记录错误响应
             ai_service_logger.log_ai_response(
                 request_id=request_id,
+                model_name=self._log_model_name(),
                 response_data={"error": str(e)},
                 status_code=500,
                 response_time=response_time,
@@ -317,7 +342,7 @@ class LoggingChatOpenAI(ChatOpenAI):
             messages = [{"role": "user", "content": messages}]
 
         # 提取请求信息
-        request_info = extract_request_info(messages)
+        request_info = self._request_info(messages)
 
         # 准备 LangSmith 配置
         service_name = getattr(self, "_service_name", "ChatOpenAI")
@@ -367,6 +392,7 @@ class LoggingChatOpenAI(ChatOpenAI):
             # 记录错误响应
             ai_service_logger.log_ai_response(
                 request_id=request_id,
+                model_name=self._log_model_name(),
                 response_data={"error": str(e)},
                 status_code=500,
                 response_time=response_time,
@@ -394,7 +420,7 @@ class LoggingChatOpenAI(ChatOpenAI):
             messages = [{"role": "user", "content": messages}]
 
         # 提取请求信息
-        request_info = extract_request_info(messages)
+        request_info = self._request_info(messages)
 
         # 准备 LangSmith 配置
         service_name = getattr(self, "_service_name", "ChatOpenAI")
@@ -426,9 +452,10 @@ class LoggingChatOpenAI(ChatOpenAI):
         chunks = []
         try:
             # 调用原始方法（会自动使用 LangSmith 追踪）
-            async for chunk in super().astream(messages, config, **kwargs):
-                chunks.append(chunk)
-                yield chunk
+            async with self._concurrency_slot():
+                async for chunk in super().astream(messages, config, **kwargs):
+                    chunks.append(chunk)
+                    yield chunk
 
             # 计算总响应时间
             response_time = time.time() - start_time
@@ -436,6 +463,7 @@ class LoggingChatOpenAI(ChatOpenAI):
             # 记录流式响应
             ai_service_logger.log_ai_response(
                 request_id=request_id,
+                model_name=self._log_model_name(),
                 response_data={
                     "stream": True,
                     "chunk_count": len(chunks),
@@ -459,6 +487,7 @@ class LoggingChatOpenAI(ChatOpenAI):
             # 记录错误响应
             ai_service_logger.log_ai_response(
                 request_id=request_id,
+                model_name=self._log_model_name(),
                 response_data={"error": str(e)},
                 status_code=500,
                 response_time=response_time,
@@ -482,6 +511,7 @@ class LoggingChatOpenAI(ChatOpenAI):
             # 记录流式响应
             ai_service_logger.log_ai_response(
                 request_id=request_id,
+                model_name=self._log_model_name(),
                 response_data={
                     "stream": True,
                     "chunk_count": len(chunks),
@@ -506,6 +536,7 @@ class LoggingChatOpenAI(ChatOpenAI):
             # 记录流式响应
             ai_service_logger.log_ai_response(
                 request_id=request_id,
+                model_name=self._log_model_name(),
                 response_data={
                     "stream": True,
                     "chunk_count": len(chunks),
@@ -5,63 +5,43 @@ MCP服务请求日志记录器
 专门记录MCP客户端的请求和响应信息
 """
 
-import json
-import logging
 import time
+import uuid
 
 from datetime import datetime
-from pathlib import Path
 from typing import Any, Dict, Optional
 
+from backend.common.log_pipeline import AsyncLogWriter, should_sample, truncate_payload
+from backend.core.path_conf import LOG_DIR
+
 
 class MCPLogger:
     """MCP服务请求日志记录器"""
 
-    def __init__(self, log_file: str = "backend/log/mcp_service.log"):
+    def __init__(self, log_file: str = str(LOG_DIR / "mcp_service.log")):
         """初始化MCP日志记录器
 
         参数:
             log_file: 日志文件路径
         """
-        self.log_file = Path(log_file)
-        self.log_file.parent.mkdir(parents=True, exist_ok=True)
-
-        # 创建独立的logger实例
-        self.logger = logging.getLogger("mcp_service")
-        self.logger.setLevel(logging.INFO)
-
-        # 清除现有的handlers
-        self.logger.handlers.clear()
-
-        # 创建文件handler
-        file_handler = logging.FileHandler(self.log_file, encoding="utf-8")
-        file_handler.setLevel(logging.INFO)
-
-        # 创建格式器
-        formatter = logging.Formatter("%(asctime)s | %(levelname)-8s | %(message)s", datefmt="%Y-%m-%d %H:%M:%S.%f")
-        file_handler.setFormatter(formatter)
-
-        # 添加handler到logger
-        self.logger.addHandler(file_handler)
-
-        # 防止日志传播到父logger
-        self.logger.propagate = False
+        # 后台线程批量写入，按大小轮转
+        self.writer = AsyncLogWriter(log_file)
 
     def _generate_request_id(self) -> str:
         """生成请求ID"""
-        return f"mcp_req_{int(time.time() * 1000)}"
+        return f"mcp_req_{int(time.time() * 1000)}_{uuid.uuid4().hex[:6]}"
 
     def _extract_request_info(self, url: str, headers: Dict[str, str], payload: Any) -> Dict[str, Any]:
-        """提取请求信息"""
+        """提取请求信息，载荷只按采样记录截断后的预览"""
         request_info = {
             "url": url,
             "method": "POST",
             "headers": {k: v for k, v in headers.items() if k.lower() != "authorization"},  # 隐藏API密钥
             "has_auth": "Authorization" in headers,
-            "payload_size": len(json.dumps(payload)) if payload else 0,
             "payload_type": type(payload).__name__,
-            "payload": payload,  # 添加完整的请求载荷
         }
+        if should_sample():
+            request_info["payload"] = truncate_payload(payload)
 
         # 如果是查询请求，提取关键信息
         if isinstance(payload, dict):
@@ -73,32 +53,19 @@ class MCPLogger:
 
         return request_info
 
-    def _extract_response_info(self, response: Any, response_time_ms: float) -> Dict[str, Any]:
-        """提取响应信息"""
-        response_info = {
-            "response_time_ms": response_time_ms,
-            "response_type": type(response).__name__,
-            "has_data": False,
-            "data_size": 0,
-            "success": False,
-            "response": response,  # 添加完整的响应数据
-        }
-
-        if isinstance(response, dict):
-            response_info["success"] = response.get("success", False)
-            response_info["has_data"] = bool(response.get("data"))
-            response_info["message"] = response.get("message", "")
-
-            if response.get("data"):
-                data_str = json.dumps(response["data"])
-                response_info["data_size"] = len(data_str)
-                response_info["data_type"] = type(response["data"]).__name__
-
-                # 如果是列表，记录数量
-                if isinstance(response["data"], list):
-                    response_info["data_count"] = len(response["data"])
-
-        return response_info
+    @staticmethod
+    def _row_counts(data: Any) -> Dict[str, int]:
+        """按查询类型统计返回行数（使用响应中的 count，不序列化数据）"""
+        if not isinstance(data, dict):
+            return {}
+        counts = {}
+        for query_type, result in data.items():
+            if isinstance(result, dict):
+                count = result.get("count")
+                counts[query_type] = count if isinstance(count, int) else len(result.get("rows") or [])
+            elif isinstance(result, list):
+                counts[query_type] = len(result)
+        return counts
 
     def log_mcp_request(
         self,
@@ -136,7 +103,7 @@ class MCPLogger:
             "request_data": request_info,
         }
 
-        self.logger.info(f"MCP_REQUEST | {json.dumps(log_data, ensure_ascii=False)}")
+        self.writer.write("INFO", "MCP_REQUEST", log_data)
         return request_id
 
     def log_mcp_response(
@@ -147,7 +114,7 @@ class MCPLogger:
         status_code: Optional[int] = None,
         error_message: Optional[str] = None,
     ):
-        """记录MCP响应
+        """记录MCP响应，只汇总为指标（按查询类型的调用次数、耗时和返回行数）
 
         参数:
             request_id: 请求ID
@@ -156,19 +123,12 @@ class MCPLogger:
             status_code: HTTP状态码（可选）
             error_message: 错误消息（可选）
         """
-        response_info = self._extract_response_info(response, response_time_ms)
-
-        log_data = {
-            "request_id": request_id,
-            "timestamp": datetime.now().isoformat(),
-            "response_data": response_info,
-            "status_code": status_code,
-            "response_time_ms": response_time_ms,
-            "error_message": error_message,
-            "response_type": "RESPONSE",
-        }
-
-        # self.logger.info(f"MCP_RESPONSE | {json.dumps(log_data, ensure_ascii=False)}")
+        success = isinstance(response, dict) and bool(response.get("success", False))
+        row_counts = self._row_counts(response.get("data") if isinstance(response, dict) else None)
+        if not row_counts:
+            self.writer.record("mcp", response_time_ms, error=not success)
+        for query_type, rows in row_counts.items():
+            self.writer.record(f"mcp:{query_type}", response_time_ms, error=not success, rows=rows)
 
     def log_mcp_error(self, request_id: str, error: Exception, response_time_ms: float, url: str):
         """记录MCP错误
@@ -189,7 +149,12 @@ class MCPLogger:
             "response_type": "ERROR",
         }
 
-        self.logger.error(f"MCP_ERROR | {json.dumps(error_info, ensure_ascii=False)}")
+        self.writer.record("mcp", response_time_ms, error=True)
+        self.writer.write("ERROR", "MCP_ERROR", error_info)
+
+    def shutdown(self) -> None:
+        """写完队列中的日志"""
+        self.writer.shutdown()
 
 
 # 创建全局MCP日志记录器实例
@@ -53,6 +53,13 @@ class Settings(BaseSettings):
     DATABASE_WAREHOUSE_USER: str = "root"
     DATABASE_WAREHOUSE_PASSWORD: str = "1f347dea91bd3778"
     DATABASE_WAREHOUSE_CHARSET: str = "utf8mb4"
+    # 数据仓库连接池（按数据库名共享引擎）
+    DATABASE_WAREHOUSE_POOL_SIZE: int = 20
+    DATABASE_WAREHOUSE_MAX_OVERFLOW: int = 30
+    DATABASE_WAREHOUSE_POOL_TIMEOUT: int = 30
+    DATABASE_WAREHOUSE_POOL_RECYCLE: int = 3600
+    DATABASE_WAREHOUSE_MAX_ENGINES: int = 16  # 超出后淘汰最久未使用的引擎
+    DATABASE_WAREHOUSE_METADATA_POOL_SIZE: int = 2  # 元数据扫描/测试查询每个库的连接数（不允许溢出）
 
     # 数据库
     DATABASE_ECHO: bool | Literal["debug"] = True
@@ -227,6 +234,18 @@ class Settings(BaseSettings):
     LOG_ACCESS_FILENAME: str = "fba_access.log"
     LOG_ERROR_FILENAME: str = "fba_error.log"
 
+    # 日志（MCP / AI 服务调用，异步批量写入）
+    SERVICE_LOG_QUEUE_SIZE: int = 10000  # 队列满时丢弃新日志，不阻塞调用方
+    SERVICE_LOG_BATCH_SIZE: int = 200
+    SERVICE_LOG_FLUSH_INTERVAL_SECONDS: float = 1.0
+    SERVICE_LOG_MAX_BYTES: int = 100 * 1024 * 1024  # 按大小轮转
+    SERVICE_LOG_BACKUP_COUNT: int = 5
+    SERVICE_LOG_PAYLOAD_SAMPLE_RATE: float = 0.1  # 记录请求/响应载荷预览的采样比例，错误日志不受影响
+    SERVICE_LOG_PAYLOAD_MAX_CHARS: int = 1000  # 载荷预览中单个字符串的最大长度
+    SERVICE_LOG_PAYLOAD_MAX_ITEMS: int = 20  # 载荷预览中每个列表/字典保留的元素数
+    SERVICE_LOG_PAYLOAD_MAX_DEPTH: int = 4
+    SERVICE_LOG_METRICS_INTERVAL_SECONDS: int = 60  # 调用次数、耗时等指标的汇总输出间隔
+
     # .env 操作日志
     OPERA_LOG_ENCRYPT_SECRET_KEY: str  # 密钥 os.urandom(32), 需使用 bytes.hex() 方法转换为 str
 
@@ -276,6 +295,41 @@ class Settings(BaseSettings):
     CELERY_REDIS_PREFIX: str = "fba:celery"
     CELERY_TASK_MAX_RETRIES: int = 5
 
+    # 风控未分析用户筛选（Redis 位图 + 扫描高水位）
+    RISK_ANALYZED_INDEX_REDIS_PREFIX: str = "fba:risk:analyzed"
+    RISK_ANALYZED_INDEX_EXPIRE_SECONDS: int = 60 * 60 * 24  # 过期后从分析记录表重建
+    RISK_ANALYZED_INDEX_LOAD_BATCH_SIZE: int = 10000
+    RISK_ANALYZED_INDEX_SHARD_BITS: int = 1 << 20  # 位图按用户ID区间分片，每片 128KB
+    RISK_ANALYZED_INDEX_BUILD_TIMEOUT_SECONDS: int = 60 * 30  # 重建版本登记的有效期
+    RISK_UNANALYZED_SCAN_PAGE_SIZE: int = 1000  # 每次从数据仓库读取的用户数
+    RISK_UNANALYZED_SCAN_MAX_PAGES: int = 100  # 单次筛选最多扫描的页数
+
+    # 风控增量用户检测（按数据源持久化高水位，只扫描上次检测之后的新数据）
+    RISK_INCREMENTAL_WATERMARK_REDIS_PREFIX: str = "fba:risk:watermark"
+    RISK_INCREMENTAL_WATERMARK_LAG_SECONDS: int = 60  # 检测截止时间相对当前时间的延迟，避免遗漏尚未提交的数据
+
+    # 风控批量分析（一次取数，按用户并发分析）
+    RISK_BATCH_SIZE: int = 20  # 单个批量分析任务包含的用户数
+    RISK_BATCH_ANALYSIS_CONCURRENCY: int = 4  # 批量任务内同时进行的用户分析数
+    RISK_BATCH_ROWS_PER_USER: int = 1000  # 批量取数时每个用户每个数据源的行数上限（与单用户查询的默认上限一致）
+
+    # 分析上下文缓存（模型配置、风险标签模板、风控助手基础信息）
+    ANALYSIS_CONTEXT_CACHE_REDIS_PREFIX: str = "fba:analysis:context"
+    ANALYSIS_CONTEXT_CACHE_EXPIRE_SECONDS: int = 60 * 60 * 24
+    ANALYSIS_CONTEXT_VERSION_CHECK_SECONDS: int = 5  # 其他进程感知后台修改的最长延迟
+    ANALYSIS_CONTEXT_L1_TTL_SECONDS: int = 300
+    ANALYSIS_CONTEXT_L1_MAX_ENTRIES: int = 256
+
+    # 流式对话注册表（跨进程中断）
+    STREAM_REGISTRY_REDIS_PREFIX: str = "fba:chat:stream"
+    STREAM_REGISTRY_TTL_SECONDS: int = 30  # 所属进程失联后登记自动过期
+    STREAM_HEARTBEAT_INTERVAL_SECONDS: int = 10
+    STREAM_INTERRUPT_EXPIRE_SECONDS: int = 60  # 中断标记保留时长，用于补偿丢失的 pub/sub 消息
+
+    # 流式对话 SSE 输出帧合并
+    SSE_FRAME_MAX_DELAY_SECONDS: float = 0.05  # 文本增量最长缓冲时间
+    SSE_FRAME_MAX_BYTES: int = 4096  # 缓冲文本达到该大小时立即刷新
+
     ##################################################
     # [ Plugin ] code_generator
     ##################################################
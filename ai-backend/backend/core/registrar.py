@@ -15,12 +15,19 @@ from fastapi_pagination import add_pagination
 from starlette.middleware.authentication import AuthenticationMiddleware
 from starlette.staticfiles import StaticFiles
 
+from backend.agents.tools.mcp_client import mcp_client
+from backend.agents.utils.debug_artifacts import debug_artifacts
+from backend.agents.utils.llm_client_pool import llm_client_pool
+from backend.app.home.service.stream_registry import stream_registry
+from backend.common.ai_logger import ai_service_logger
 from backend.common.exception.exception_handler import register_exception
 from backend.common.log import set_custom_logfile, setup_logging
+from backend.common.mcp_logger import mcp_logger
 from backend.core.conf import settings
 from backend.core.path_conf import STATIC_DIR, UPLOAD_DIR
 from backend.database.db import create_tables
 from backend.database.redis import redis_client
+from backend.database.warehouse import warehouse_engines, warehouse_metadata_engines
 from backend.middleware.access_middleware import AccessMiddleware
 from backend.middleware.i18n_middleware import I18nMiddleware
 from backend.middleware.jwt_auth_middleware import JwtAuthMiddleware
@@ -57,8 +64,31 @@ async def register_init(app: FastAPI) -> AsyncGenerator[None, None]:
     # 创建操作日志任务
     create_task(OperaLogMiddleware.consumer())
 
+    # 启动流式对话中断订阅
+    await stream_registry.start()
+
     yield
 
+    # 停止流式对话中断订阅
+    await stream_registry.stop()
+
+    # 关闭 MCP 客户端连接池
+    await mcp_client.aclose()
+
+    # 关闭 LLM 客户端长连接
+    await llm_client_pool.aclose()
+
+    # 等待调试产物写完
+    debug_artifacts.shutdown()
+
+    # 写完 MCP / AI 服务调用日志
+    mcp_logger.shutdown()
+    ai_service_logger.shutdown()
+
+    # 关闭数据仓库连接池
+    await warehouse_engines.dispose_all()
+    await warehouse_metadata_engines.dispose_all()
+
     # 关闭 redis 连接
     await redis_client.close()
 
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator
+
+from sqlalchemy import URL
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine
+
+from backend.common.log import log
+from backend.core.conf import settings
+
+
+def create_warehouse_url(database_name: str | None = None) -> URL:
+    """
+    创建数据仓库连接 URL
+
+    :param database_name: 数据库名，为空时连接到服务器（不指定库）
+    :return:
+    """
+    return URL.create(
+        drivername="mysql+asyncmy",
+        username=settings.DATABASE_WAREHOUSE_USER,
+        password=settings.DATABASE_WAREHOUSE_PASSWORD,
+        host=settings.DATABASE_WAREHOUSE_HOST,
+        port=settings.DATABASE_WAREHOUSE_PORT,
+        database=database_name,
+        query={"charset": settings.DATABASE_WAREHOUSE_CHARSET},
+    )
+
+
+class _PoolWaitStats:
+    """连接获取耗时统计"""
+
+    def __init__(self):
+        self.acquired = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float) -> None:
+        self.acquired += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+
+
+class WarehouseEngineRegistry:
+    """
+    数据仓库引擎注册表
+
+    按数据库名缓存长期存活的连接池引擎（连接前 ping 检测），引擎数量超过上限时淘汰最久未使用的引擎。
+    引擎与连接绑定事件循环（Celery 任务中每次 asyncio.run 都是新的事件循环），事件循环变化时整体重建。
+    被淘汰的引擎可能仍有借出的连接，先移出注册表，借出的连接全部归还后再关闭。
+    """
+
+    def __init__(self, pool_size: int | None = None, max_overflow: int | None = None, max_engines: int | None = None):
+        """
+        :param pool_size: 每个引擎的连接池大小，为空时取配置
+        :param max_overflow: 每个引擎允许的溢出连接数，为空时取配置
+        :param max_engines: 缓存的引擎数量上限（已淘汰待关闭的引擎同样受此限制），为空时取配置
+        """
+        self._pool_size = settings.DATABASE_WAREHOUSE_POOL_SIZE if pool_size is None else pool_size
+        self._max_overflow = settings.DATABASE_WAREHOUSE_MAX_OVERFLOW if max_overflow is None else max_overflow
+        self._max_engines = settings.DATABASE_WAREHOUSE_MAX_ENGINES if max_engines is None else max_engines
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._lock: asyncio.Lock | None = None
+        self._engines: OrderedDict[str, AsyncEngine] = OrderedDict()
+        self._retired: list[AsyncEngine] = []
+        self._stats: dict[str, _PoolWaitStats] = {}
+
+    def _bind_loop(self) -> asyncio.Lock:
+        """绑定当前事件循环，变化时释放旧循环下的引擎"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            if self._engines or self._retired:
+                log.info("Event loop changed, releasing warehouse engines created in the previous loop")
+            # 旧事件循环中的连接无法在新循环中关闭，只释放连接池引用，由垃圾回收关闭底层连接
+            for engine in [*self._engines.values(), *self._retired]:
+                engine.sync_engine.dispose(close=False)
+            self._engines = OrderedDict()
+            self._retired = []
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        return self._lock
+
+    async def get_engine(self, database_name: str | None = None) -> AsyncEngine:
+        """
+        获取数据库对应的引擎，不存在时创建
+
+        :param database_name: 数据库名，为空时连接到服务器（不指定库）
+        :return:
+        """
+        key = database_name or ""
+        lock = self._bind_loop()
+        engine = self._engines.get(key)
+        if engine is not None:
+            self._engines.move_to_end(key)
+            return engine
+
+        async with lock:
+            engine = self._engines.get(key)
+            if engine is not None:
+                return engine
+
+            engine = create_async_engine(
+                create_warehouse_url(database_name),
+                pool_size=self._pool_size,
+                max_overflow=self._max_overflow,
+                pool_timeout=settings.DATABASE_WAREHOUSE_POOL_TIMEOUT,
+                pool_recycle=settings.DATABASE_WAREHOUSE_POOL_RECYCLE,
+                pool_pre_ping=True,
+                echo=False,
+            )
+            self._engines[key] = engine
+            self._stats.setdefault(key, _PoolWaitStats())
+            log.info(f"Created warehouse engine for database: {key or '<server>'}")
+
+            while len(self._engines) > self._max_engines:
+                evicted_key, evicted = self._engines.popitem(last=False)
+                self._stats.pop(evicted_key, None)
+                # 其他协程可能仍持有该引擎的连接，归还后再关闭
+                self._retired.append(evicted)
+                log.info(f"Retired warehouse engine for database: {evicted_key or '<server>'}")
+            await self._dispose_retired()
+            return engine
+
+    async def _dispose_retired(self) -> None:
+        """关闭已无借出连接的淘汰引擎，超出上限时强制关闭最早淘汰的引擎"""
+        if not self._retired:
+            return
+        idle = [engine for engine in self._retired if engine.pool.checkedout() == 0]
+        busy = [engine for engine in self._retired if engine.pool.checkedout() > 0]
+        # 强制关闭时借出的连接不受影响，归还时随旧连接池一起关闭
+        overflow = max(len(busy) - self._max_engines, 0)
+        self._retired = busy[overflow:]
+        for engine in idle + busy[:overflow]:
+            await engine.dispose()
+
+    @asynccontextmanager
+    async def connect(self, database_name: str | None = None) -> AsyncGenerator[AsyncConnection, None]:
+        """
+        从连接池获取连接，并记录等待耗时
+
+        :param database_name: 数据库名，为空时连接到服务器（不指定库）
+        :return:
+        """
+        engine = await self.get_engine(database_name)
+        stats = self._stats.setdefault(database_name or "", _PoolWaitStats())
+        start = time.perf_counter()
+        try:
+            conn = await engine.connect()
+        except PoolTimeoutError:
+            stats.timeouts += 1
+            raise
+        stats.record(time.perf_counter() - start)
+        try:
+            yield conn
+        finally:
+            await conn.close()
+            await self._dispose_retired()
+
+    def get_pool_stats(self) -> list[dict[str, Any]]:
+        """获取各引擎连接池状态"""
+        result = []
+        for key, engine in self._engines.items():
+            pool = engine.pool
+            stats = self._stats.get(key) or _PoolWaitStats()
+            result.append(
+                {
+                    "database": key or None,
+                    "pool_size": pool.size(),
+                    "checked_in": pool.checkedin(),
+                    "checked_out": pool.checkedout(),
+                    "overflow": pool.overflow(),
+                    "max_overflow": self._max_overflow,
+                    "acquired": stats.acquired,
+                    "timeouts": stats.timeouts,
+                    "avg_wait_ms": round(stats.total_wait / stats.acquired * 1000, 2) if stats.acquired else 0.0,
+                    "max_wait_ms": round(stats.max_wait * 1000, 2),
+                }
+            )
+        return result
+
+    async def dispose_all(self) -> None:
+        """关闭当前事件循环下的所有引擎（包括已淘汰的引擎）"""
+        engines = list(self._engines.values()) + self._retired
+        self._engines = OrderedDict()
+        self._retired = []
+        self._stats.clear()
+        if self._loop is not asyncio.get_running_loop():
+            # 引擎属于其他事件循环，无法在当前循环中关闭，只释放连接池引用
+            for engine in engines:
+                engine.sync_engine.dispose(close=False)
+            return
+        for engine in engines:
+            await engine.dispose()
+
+
+warehouse_engines = WarehouseEngineRegistry()
+
+# 元数据扫描与测试查询按库逐个建引擎，使用小连接池且不允许溢出，避免占满数据仓库连接数
+warehouse_metadata_engines = WarehouseEngineRegistry(
+    pool_size=settings.DATABASE_WAREHOUSE_METADATA_POOL_SIZE, max_overflow=0
+)
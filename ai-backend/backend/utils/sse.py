@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SSE 输出帧合并
+
+连续的文本增量消息（chat / md_info，前端按顺序拼接 message）合并为一条事件，多条事件合并为一次写出；
+缓冲按时间与大小预算刷新，步骤、文件、错误等其他消息到达时立即连同缓冲一起刷新。
+"""
+
+import asyncio
+import json
+import time
+
+from typing import Any, AsyncGenerator, AsyncIterable, Dict, List
+
+from backend.core.conf import settings
+
+# 可合并的文本增量消息类型
+MERGEABLE_TYPES = {"chat", "md_info"}
+_MERGEABLE_KEYS = {"name", "type", "status", "message"}
+
+
+def encode_sse(message: Any) -> str:
+    """编码为一条 SSE 事件"""
+    if isinstance(message, dict):
+        return f"data: {json.dumps(message, ensure_ascii=False)}\n\n"
+    return f"data: {message}\n\n"
+
+
+def _is_delta(message: Any) -> bool:
+    # YieldResponse.model_dump 总会带上值为 None 的 file / result / output，这些键不影响合并
+    return (
+        isinstance(message, dict)
+        and message.get("type") in MERGEABLE_TYPES
+        and isinstance(message.get("message"), str)
+        and all(key in _MERGEABLE_KEYS or value is None for key, value in message.items())
+    )
+
+
+def _can_merge(previous: Any, message: Dict[str, Any]) -> bool:
+    return (
+        _is_delta(previous)
+        and previous.get("type") == message.get("type")
+        and previous.get("name") == message.get("name")
+        and previous.get("status") == message.get("status")
+    )
+
+
+async def coalesce_sse(messages: AsyncIterable[Any]) -> AsyncGenerator[str, None]:
+    """
+    合并消息流为 SSE 帧
+
+    消息流在单独的任务中完整运行（保持同一上下文），客户端断开时取消该任务
+
+    :param messages: 消息流，元素为字典或字符串
+    :return:
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=256)
+
+    async def produce():
+        try:
+            async for message in messages:
+                await queue.put((False, message))
+        except Exception as e:
+            await queue.put((True, e))
+            return
+        await queue.put((True, None))
+
+    producer = asyncio.create_task(produce())
+    pending: List[Any] = []
+    pending_bytes = 0
+    deadline = 0.0
+
+    def flush() -> str:
+        nonlocal pending, pending_bytes
+        frame = "".join(encode_sse(message) for message in pending)
+        pending, pending_bytes = [], 0
+        return frame
+
+    try:
+        while True:
+            try:
+                timeout = max(0.0, deadline - time.monotonic()) if pending else None
+                finished, message = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield flush()
+                continue
+
+            if finished:
+                if pending:
+                    yield flush()
+                if message is not None:
+                    raise message
+                return
+
+            if not _is_delta(message):
+                # 边界消息立即刷新
+                pending.append(message)
+                yield flush()
+                continue
+
+            if pending and _can_merge(pending[-1], message):
+                # 复制后合并，调用方持有的消息字典保持不变
+                pending[-1] = {**pending[-1], "message": pending[-1]["message"] + message["message"]}
+            else:
+                if not pending:
+                    deadline = time.monotonic() + settings.SSE_FRAME_MAX_DELAY_SECONDS
+                pending.append(message)
+            pending_bytes += len(message["message"].encode("utf-8"))
+            if pending_bytes >= settings.SSE_FRAME_MAX_BYTES:
+                yield flush()
+    finally:
+        if not producer.done():
+            producer.cancel()
+            try:
+                await producer
+            except asyncio.CancelledError:
+                pass
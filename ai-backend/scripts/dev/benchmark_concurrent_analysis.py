@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并发分析隔离与吞吐基准测试
+
+同一个 DataAnalysisService 实例上并发执行多次分析（MCP 与 LLM 均为带延迟的桩），
+每次分析使用不同的模型、用户和数据标记，校验基础信息、MCP 查询参数与结果在各运行上下文之间没有串扰，
+并输出吞吐量与相对串行执行的加速比。
+
+用法（在 ai-backend 目录下执行）:
+    python scripts/dev/benchmark_concurrent_analysis.py
+    python scripts/dev/benchmark_concurrent_analysis.py --runs 50 --mcp-latency 0.05 --llm-latency 0.2
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.app.admin.service import data_analysis_service as service_module
+from backend.app.admin.service.data_analysis_service import DataAnalysisService
+
+QUERY_TYPE = "user_data"
+
+
+class StubGetUsersAgent:
+    """MCP 桩：按查询参数中的用户ID返回带运行标记的数据"""
+
+    latency = 0.05
+
+    async def get_users(self, data_sources, crm_user_id=None):
+        await asyncio.sleep(random.uniform(0, self.latency * 2))
+        data = {}
+        for query_type, request in data_sources.items():
+            user_ids = request["user_id"]
+            data[query_type] = {
+                "columns": ["member_id", "marker", "crm_user_id"],
+                "rows": [[user_id, f"marker-{user_id}", crm_user_id] for user_id in user_ids],
+                "count": len(user_ids),
+            }
+        return {"success": True, "message": "ok", "data": data}
+
+
+class StubDataAnalyzeAgent:
+    """LLM 桩：把收到的模型配置、查询参数和数据原样写入结果"""
+
+    latency = 0.2
+
+    def __init__(self, config=None):
+        self.config = config or {}
+        self.result = None
+
+    async def report_analyze_data(self, analyze_data, data_request, **kwargs):
+        await asyncio.sleep(random.uniform(0, self.latency * 2))
+        self.result = {
+            "confidence": 0,
+            "analytical_report": "\n".join(analyze_data),
+            "property_analysis": {
+                "model_id": self.config.get("llm", {}).get("id"),
+                "user_ids": [user_id for request in data_request.values() for user_id in request["user_id"]],
+            },
+        }
+        return True, self.result, ""
+
+
+async def stub_get_model(db, model_id=None):
+    await asyncio.sleep(0)
+    return {"id": model_id, "name": model_id, "model_name": "deepseek-chat"}
+
+
+async def run_one(service: DataAnalysisService, index: int) -> list[str]:
+    """执行一次分析，返回发现的串扰问题"""
+    model_id = f"model-{index}"
+    user_id = f"user-{index}"
+    basic_info = {"assistant_id": f"assistant-{index}", "ai_model_id": model_id, "name": f"run-{index}"}
+
+    context = await service.create_context(None, basic_info)
+    user_result = await service.get_user_data(None, [QUERY_TYPE], [user_id], crm_user_id=index, context=context)
+    result = await service.analyze_data(
+        None,
+        {"data": user_result["data"]},
+        context.basic_info,
+        llm_config=context.model,
+        data_request=context.data_request,
+    )
+
+    problems = []
+    if context.basic_info.get("assistant_id") != f"assistant-{index}" or context.model.get("id") != model_id:
+        problems.append(f"run {index}: basic info leaked {context.basic_info}")
+    if context.data_request[QUERY_TYPE]["user_id"] != [user_id]:
+        problems.append(f"run {index}: data request leaked {context.data_request}")
+    if user_result["data"][QUERY_TYPE]["rows"] != [[user_id, f"marker-{user_id}", index]]:
+        problems.append(f"run {index}: MCP result leaked {user_result['data']}")
+    analysis = result.get("data") or {}
+    if analysis.get("property_analysis") != {"model_id": model_id, "user_ids": [user_id]}:
+        problems.append(f"run {index}: analysis input leaked {analysis.get('property_analysis')}")
+    markers = set(re.findall(r"marker-user-\d+", analysis.get("analytical_report", "")))
+    if markers != {f"marker-{user_id}"}:
+        problems.append(f"run {index}: analysed data leaked {sorted(markers)}")
+    return problems
+
+
+async def main_async(runs: int, min_speedup: float) -> int:
+    service = DataAnalysisService()
+    service._get_model = stub_get_model
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run_one(service, index) for index in range(runs)))
+    concurrent_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for index in range(min(runs, 5)):
+        await run_one(service, index)
+    serial_time = (time.perf_counter() - start) / min(runs, 5) * runs
+
+    problems = [problem for result in results for problem in result]
+    print(f"并发运行数: {runs}")
+    print(f"并发耗时: {concurrent_time:.3f}s, 吞吐量: {runs / concurrent_time:.1f} 次/秒")
+    print(f"串行估算耗时: {serial_time:.3f}s, 加速比: {serial_time / concurrent_time:.1f}x")
+    if problems:
+        print(f"发现 {len(problems)} 处上下文串扰:")
+        for problem in problems[:20]:
+            print(f"  {problem}")
+        return 1
+    print("上下文隔离校验通过")
+    if serial_time / concurrent_time < min_speedup:
+        print(f"加速比低于 {min_speedup}x，并发分析可能被串行化")
+        return 1
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="并发分析隔离与吞吐基准测试")
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--mcp-latency", type=float, default=StubGetUsersAgent.latency, help="MCP 桩平均延迟（秒）")
+    parser.add_argument("--llm-latency", type=float, default=StubDataAnalyzeAgent.latency, help="LLM 桩平均延迟（秒）")
+    parser.add_argument("--min-speedup", type=float, default=5.0, help="加速比低于该值时视为失败")
+    args = parser.parse_args()
+
+    StubGetUsersAgent.latency = args.mcp_latency
+    StubDataAnalyzeAgent.latency = args.llm_latency
+    service_module.GetUsersAgent = StubGetUsersAgent
+    service_module.DataAnalyzeAgent = StubDataAnalyzeAgent
+    sys.exit(asyncio.run(main_async(args.runs, args.min_speedup)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Markdown表格渲染基准测试
+
+对比逐行累加token的渲染实现与改写前的实现（每行重新拼接并估算整块token）的耗时，
+两者使用相同的字符规则估算时校验输出完全一致；另列出使用模型分词器时 format_table_data 的耗时。
+
+用法（在 ai-backend 目录下执行）:
+    python scripts/dev/benchmark_markdown_table.py
+    python scripts/dev/benchmark_markdown_table.py --sizes 1000 10000 50000 --repeat 3
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.agents.config.setting import settings
+from backend.agents.tools.data_to_markdown import format_table_data, iter_table_chunks
+from backend.agents.utils.token_utils import estimate_tokens, get_token_counter, token_weight
+
+COLUMNS = [
+    "id(编号)",
+    "member_id(用户ID)",
+    "source_account(来源账户)",
+    "source_money(金额)",
+    "source_currency(币种)",
+    "destination_money_usd(美元金额)",
+    "payment_method_name(支付方式)",
+    "direction(方向)",
+    "status(状态)",
+    "created_at(创建时间)",
+]
+
+
+def legacy_format_table_data(columns, rows, is_split=False):
+    """改写前的实现，仅用于对比"""
+    if not columns or not rows:
+        return "无数据"
+
+    header = "| " + " | ".join(columns) + " |"
+    separator = "| " + " | ".join(["---"] * len(columns)) + " |"
+
+    data_rows = []
+    current_row = []
+    current_rows_count = 0
+    for row in rows:
+        formatted_row = []
+        for cell in row:
+            if cell is None:
+                formatted_row.append("`null`")
+            elif isinstance(cell, str):
+                formatted_row.append(f"`{cell}`")
+            elif isinstance(cell, (int, float)):
+                formatted_row.append(str(cell))
+            else:
+                formatted_row.append(f"`{str(cell)}`")
+        current_row.append("| " + " | ".join(formatted_row) + " |")
+        current_rows_count += 1
+        current_row_str = "\n".join([header, separator] + current_row)
+        if is_split and estimate_tokens(current_row_str) > settings.SPLIT_MAX_TOKEN * 0.95:
+            data_rows.append({"content": current_row_str, "count": current_rows_count})
+            current_row = []
+            current_rows_count = 0
+    if current_row:
+        data_rows.append({"content": "\n".join([header, separator] + current_row), "count": current_rows_count})
+    if len(data_rows) == 1:
+        return data_rows[0]["content"]
+    else:
+        return data_rows
+
+
+def estimate_format_table_data(columns, rows, is_split=False):
+    """逐行累加实现，使用与旧实现相同的字符规则估算"""
+    max_tokens = settings.SPLIT_MAX_TOKEN * 0.95 if is_split else None
+    data_rows = list(iter_table_chunks(columns, rows, max_tokens, token_weight))
+    if len(data_rows) == 1:
+        return data_rows[0]["content"]
+    else:
+        return data_rows
+
+
+def build_rows(count: int, seed: int = 42):
+    """生成模拟的资金流水数据"""
+    rng = random.Random(seed)
+    methods = ["银行卡", "USDT", "电汇", "Skrill", None]
+    statuses = ["成功", "处理中", "失败"]
+    rows = []
+    for i in range(count):
+        rows.append(
+            [
+                100000 + i,
+                rng.randint(1000, 99999),
+                f"MT5-{rng.randint(100000, 999999)}",
+                round(rng.uniform(10, 50000), 2),
+                rng.choice(["USD", "CNY", "EUR"]),
+                round(rng.uniform(10, 50000), 4),
+                rng.choice(methods),
+                rng.choice(["入金", "出金"]),
+                rng.choice(statuses),
+                f"2025-10-{rng.randint(1, 30):02d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00",
+            ]
+        )
+    return rows
+
+
+def timed(func, *args, repeat: int = 1):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Markdown表格渲染基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--skip-legacy-above", type=int, default=None, help="超过该行数时不运行旧实现")
+    args = parser.parse_args()
+
+    print(f"SPLIT_MAX_TOKEN={settings.SPLIT_MAX_TOKEN}, tokenizer={get_token_counter().backend}")
+    print(
+        f"{'行数':>8} | {'新实现(s)':>10} | {'旧实现(s)':>10} | {'加速比':>8} | {'分块数':>6} | {'输出一致':>6} | 分词器(s)"
+    )
+    for size in args.sizes:
+        rows = build_rows(size)
+        new_result, new_time = timed(estimate_format_table_data, COLUMNS, rows, True, repeat=args.repeat)
+        chunk_count = len(new_result) if isinstance(new_result, list) else 1
+        _, tokenizer_time = timed(format_table_data, COLUMNS, rows, True, repeat=args.repeat)
+
+        if args.skip_legacy_above is not None and size > args.skip_legacy_above:
+            old_time_str, speedup_str, same = "-", "-", "-"
+        else:
+            old_result, old_time = timed(legacy_format_table_data, COLUMNS, rows, True, repeat=args.repeat)
+            old_time_str = f"{old_time:.3f}"
+            speedup_str = f"{old_time / new_time:.1f}x" if new_time else "inf"
+            same = "是" if old_result == new_result else "否"
+        print(
+            f"{size:>8} | {new_time:>10.3f} | {old_time_str:>10} | {speedup_str:>8} | {chunk_count:>6} | {same:>6} | "
+            f"{tokenizer_time:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
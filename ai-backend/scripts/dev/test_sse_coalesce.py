@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+SSE 输出帧合并测试
+
+使用智能体实际产出的 YieldResponse（经 format_message 转换）作为输入
+
+用法（在 ai-backend 目录下执行）:
+    python -m pytest scripts/dev/test_sse_coalesce.py
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from backend.agents.schema.agent import ExecuteStatus, ResponseType, YieldResponse
+from backend.utils.format_output import format_message
+from backend.utils.sse import coalesce_sse
+
+
+def _delta(text: str, type_: ResponseType = ResponseType.CHAT) -> dict:
+    return format_message(
+        YieldResponse(name="general_chat_running_chat", type=type_, status=ExecuteStatus.RUNNING, message=text)
+    )
+
+
+async def _collect(messages: list) -> list[str]:
+    async def source():
+        for message in messages:
+            yield message
+
+    return [frame async for frame in coalesce_sse(source())]
+
+
+def _events(frames: list[str]) -> list[dict]:
+    return [json.loads(event[len("data: ") :]) for frame in frames for event in frame.split("\n\n") if event]
+
+
+def test_yield_response_deltas_are_coalesced():
+    messages = [_delta(text) for text in ("你", "好", "，", "世界")]
+    # model_dump 会带上值为 None 的 file / result / output
+    assert messages[0]["file"] is None
+
+    frames = asyncio.run(_collect(messages))
+
+    assert len(frames) == 1
+    events = _events(frames)
+    assert len(events) == 1
+    assert events[0]["message"] == "你好，世界"
+    assert events[0]["type"] == "chat"
+    assert events[0]["name"] == "general_chat_running_chat"
+
+
+def test_boundary_messages_flush_and_are_not_merged():
+    step = format_message(
+        YieldResponse(
+            name="step",
+            type=ResponseType.EXECUTE,
+            status=ExecuteStatus.RUNNING,
+            message="开始分析",
+        )
+    )
+    file_message = format_message(
+        YieldResponse(
+            name="export",
+            type=ResponseType.CHAT,
+            status=ExecuteStatus.COMPLETED,
+            message="",
+            file={"url": "report.xlsx"},
+        )
+    )
+    messages = [_delta("a"), _delta("b"), step, _delta("c", ResponseType.MD_INFO), file_message]
+
+    events = _events(asyncio.run(_collect(messages)))
+
+    assert [event["message"] for event in events] == ["ab", "开始分析", "c", ""]
+    assert events[1]["type"] == "execute"
+    assert events[3]["file"] == {"url": "report.xlsx"}
+
+
+def test_caller_messages_are_not_mutated():
+    messages = [_delta("a"), _delta("b")]
+
+    asyncio.run(_collect(messages))
+
+    assert [message["message"] for message in messages] == ["a", "b"]
@@ -2,8 +2,9 @@
 # -*- coding: utf-8 -*-
 from fastapi import APIRouter
 
-from app.api.api_v1.endpoints import getdata
+from app.api.api_v1.endpoints import cache, getdata
 
 api_router = APIRouter()
 
 api_router.include_router(getdata.router, prefix="/getdata", tags=["获取数据"])
+api_router.include_router(cache.router, prefix="/cache", tags=["缓存管理"])
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from fastapi import APIRouter, Depends
+
+from app.api.deps import get_api_key
+from app.common.response import ResponseFactory
+from app.models.schema import CacheInvalidateRequest, QueryResponse
+from app.services.access_scope_service import access_scope_cache, member_tree_index
+from app.services.query.base_mt_service import mtlogin_cache
+from core.log import logger
+
+router = APIRouter()
+
+
+@router.get("/stats", response_model=QueryResponse)
+async def get_cache_stats(api_key: str = Depends(get_api_key)):
+    """获取缓存与索引的统计信息"""
+    return ResponseFactory.success_response(
+        data={
+            "access_scope": access_scope_cache.stats(),
+            "member_index": member_tree_index.stats(),
+            "mtlogin": mtlogin_cache.stats(),
+        },
+        message="查询成功",
+    )
+
+
+@router.post("/invalidate", response_model=QueryResponse)
+async def invalidate_cache(
+    request: CacheInvalidateRequest, api_key: str = Depends(get_api_key)
+):
+    """使CRM访问范围与mt账号缓存失效，可选同时刷新成员层级索引"""
+    try:
+        if request.crm_user_id is None:
+            cleared = access_scope_cache.invalidate()
+            mtlogin_cleared = mtlogin_cache.invalidate()
+        else:
+            cleared = access_scope_cache.invalidate(request.crm_user_id)
+            # mt账号缓存键以crm_user_id开头，按crm范围清除
+            crm_key = str(request.crm_user_id)
+            mtlogin_cleared = mtlogin_cache.invalidate(
+                predicate=lambda key: key[0] == crm_key
+            )
+        if request.refresh_member_index:
+            await member_tree_index.refresh(full=True)
+        logger.info(
+            f"缓存失效: crm_user_id={request.crm_user_id}, cleared={cleared}, "
+            f"refresh_member_index={request.refresh_member_index}"
+        )
+        return ResponseFactory.success_response(
+            data={
+                "access_scope_cleared": cleared,
+                "mtlogin_cleared": mtlogin_cleared,
+            },
+            message="缓存已失效",
+        )
+    except Exception as e:
+        logger.error(f"Cache invalidate failed: {str(e)}")
+        return ResponseFactory.error_response(
+            message=f"缓存失效失败: {str(e)}", error_code="CACHE_INVALIDATE_EXCEPTION"
+        )
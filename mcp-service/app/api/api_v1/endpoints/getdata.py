@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 import time
+from typing import Any, Dict, Optional
 
 from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
 
 from app.api.deps import get_api_key
 from app.common.response import ResponseFactory
@@ -16,16 +18,75 @@ from app.services.query_service import query_service
 from core.log import logger
 from core.query import QUERY_TYPES
 from utils.data import compress_data
+from utils.json_encoder import safe_json_dumps
 
 router = APIRouter()
 
 DEFAULT_ERROR_MESSAGE = "未找到用户数据"
 DEFAULT_COMPRESS = True
+STREAM_MEDIA_TYPE = "application/x-ndjson"
+
+
+async def _stream_query_response(
+    query_type: str, parameters: Dict[str, Any], batch_size: Optional[int] = None
+):
+    """以NDJSON分块方式返回查询结果
+
+    行格式:
+        {"success": true, "columns": [...]}      首行，列名
+        {"rows": [[...], ...]}                   每批数据
+        {"success": true, "count": n, "query_time": "x.xxs"}  结束行
+        {"success": false, "message": "..."}     传输过程中出错时的结束行
+
+    权限校验与SQL执行错误在开始传输前返回普通错误响应。
+    """
+    start_time = time.time()
+    stream = query_service.stream_query(query_type, parameters, batch_size)
+    try:
+        columns, first_rows = await stream.__anext__()
+    except StopAsyncIteration:
+        columns, first_rows = [], []
+    except Exception as e:
+        await stream.aclose()
+        logger.error(f"Stream query failed: {str(e)}")
+        return ResponseFactory.error_response(
+            message=f"查询失败: {str(e)}",
+            parameters=parameters,
+            error_code="STREAM_QUERY_EXCEPTION",
+        )
+
+    async def body():
+        count = 0
+        try:
+            yield safe_json_dumps({"success": True, "columns": columns}) + "\n"
+            if first_rows:
+                count += len(first_rows)
+                yield safe_json_dumps({"rows": first_rows}) + "\n"
+            async for _, rows in stream:
+                if rows:
+                    count += len(rows)
+                    yield safe_json_dumps({"rows": rows}) + "\n"
+            yield safe_json_dumps(
+                {
+                    "success": True,
+                    "count": count,
+                    "query_time": f"{time.time() - start_time:.2f}s",
+                }
+            ) + "\n"
+        except Exception as e:
+            logger.error(f"Stream query failed after {count} rows: {str(e)}")
+            yield safe_json_dumps(
+                {"success": False, "message": f"查询失败: {str(e)}"}
+            ) + "\n"
+        finally:
+            await stream.aclose()
+
+    return StreamingResponse(body(), media_type=STREAM_MEDIA_TYPE)
 
 
 @router.post("/query", response_model=QueryResponse)
 async def execute_query(request: GetDataRequest, api_key: str = Depends(get_api_key)):
-    """执行单个查询"""
+    """执行单个查询（is_stream=True 时对支持的查询类型以NDJSON分块返回）"""
     try:
         query_type = request.query_type
         parameters = request.parameters
@@ -57,6 +118,12 @@ async def execute_query(request: GetDataRequest, api_key: str = Depends(get_api_
                 error_code="INVALID_CRM_USER_ID",
             )
 
+        # 大数据量查询可选择流式返回，内存占用与批大小成正比
+        if request.is_stream and query_service.supports_stream(query_type):
+            return await _stream_query_response(
+                query_type, parameters, request.batch_size
+            )
+
         result: QueryDataResponse = await query_service.execute_query(
             query_type, parameters
         )
@@ -135,12 +202,14 @@ async def execute_querys(request: GetDataRequest, api_key: str = Depends(get_api
         total_count = 0
         failed_queries = []
         successful_queries = []
+        query_times = {}
 
-        for query_type in query_types:
-            result: QueryDataResponse = await query_service.execute_query(
-                query_type, parameters
-            )
+        # 各查询类型相互独立，并发执行（单请求内限制并发数）
+        batch_results = await query_service.execute_batch_query(query_types, parameters)
+
+        for query_type, (result, elapsed) in batch_results.items():
             logger.info(f"Batch query result - {query_type}: {result}")
+            query_times[query_type] = f"{elapsed:.2f}s"
 
             if result.success:
                 count = len(result.data) if isinstance(result.data, list) else 0
@@ -153,6 +222,7 @@ async def execute_querys(request: GetDataRequest, api_key: str = Depends(get_api
                     "message": result.message,
                     "metadata": {
                         "count": count,
+                        "query_time": query_times[query_type],
                         "query_type_name": QUERY_TYPES.get(query_type, {}).get(
                             "name", ""
                         ),
@@ -167,6 +237,7 @@ async def execute_querys(request: GetDataRequest, api_key: str = Depends(get_api
                     "message": result.message or "查询失败",
                     "metadata": {
                         "count": 0,
+                        "query_time": query_times[query_type],
                         "query_type_name": QUERY_TYPES.get(query_type, {}).get(
                             "name", ""
                         ),
@@ -197,6 +268,7 @@ async def execute_querys(request: GetDataRequest, api_key: str = Depends(get_api
             parameters=request.parameters,
             failed_queries=failed_queries if failed_queries else None,
             successful_queries=successful_queries if successful_queries else None,
+            query_times=query_times,
         )
 
         return (
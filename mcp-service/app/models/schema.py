@@ -11,6 +11,10 @@ class GetDataRequest(BaseModel):
     parameters: Optional[Dict[str, Any]] = Field(None, description="查询参数")
     context: Optional[str] = Field(None, description="查询上下文，用于理解查询意图")
     is_compress_data: Optional[bool] = Field(True, description="是否压缩数据")
+    is_stream: Optional[bool] = Field(
+        False, description="是否以分块(NDJSON)方式流式返回，仅支持单个查询且类型支持流式查询"
+    )
+    batch_size: Optional[int] = Field(None, description="流式查询每批行数")
 
 
 # class QueryRequest(BaseModel):
@@ -33,6 +37,7 @@ class QueryMetadata(BaseModel):
     parameters: Optional[Dict[str, Any]] = Field(None, description="查询参数")
     failed_queries: Optional[Dict[str, Any]] = Field(None, description="失败的查询类型列表")
     successful_queries: Optional[List[str]] = Field(None, description="成功的查询类型列表")
+    query_times: Optional[Dict[str, str]] = Field(None, description="各查询类型耗时（秒）")
 
 
 # 查询响应模型
@@ -63,6 +68,12 @@ class QueryDataResponse(BaseModel):
         }
 
 
+# 缓存失效请求模型
+class CacheInvalidateRequest(BaseModel):
+    crm_user_id: Optional[int] = Field(None, description="CRM用户ID，为空时清空全部访问范围缓存")
+    refresh_member_index: Optional[bool] = Field(False, description="是否同时全量重建成员层级索引")
+
+
 # 对话消息模型
 class ConversationMessage(BaseModel):
     role: str = Field(..., description="消息角色，如'user'或'assistant'")
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CRM访问范围缓存与成员层级索引
+
+- access_scope_cache: 按crm_user_id缓存访问范围（TTL + 显式失效），并合并并发的相同加载请求
+- MemberTreeIndex: 基于t_member_root_path构建的内存层级索引，替代 `path LIKE 'x,%'` 扫描
+"""
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.config import settings
+from core.log import logger
+from core.sql_config import SQL_TABLES
+from db.warehouse import warehouse_db as base_db
+from utils.cache import TTLCache
+
+
+def to_member_id(value: Any) -> Optional[int]:
+    """将可能带千分位的字符串安全转换为正整数"""
+    if value is None:
+        return None
+    s = str(value).replace(",", "").strip()
+    if not s:
+        return None
+    try:
+        i = int(s)
+        return i if i > 0 else None
+    except Exception:
+        return None
+
+
+class _PathNode:
+    """层级路径前缀树节点"""
+
+    __slots__ = ("members", "children")
+
+    def __init__(self):
+        self.members: set = set()
+        self.children: Dict[str, "_PathNode"] = {}
+
+
+class MemberTreeIndex:
+    """基于 t_member_root_path 的成员层级内存索引
+
+    path 按逗号拆分后存入前缀树，语义与 `path LIKE '<path>,%'` 一致：
+    - is_under(X, Y): X 是否为 Y 本人或其下级，复杂度 O(depth)
+    - descendants(Y): Y 本人及全部下级，复杂度 O(subtree)
+
+    定时增量刷新（按 member_id 高水位拉取新成员），并周期性全量重建以同步层级变更。
+    """
+
+    def __init__(self):
+        self._root = _PathNode()
+        self._paths: Dict[int, Tuple[str, ...]] = {}
+        self._high_water_mark = 0
+        self._last_full_build = 0.0
+        self._last_refresh = 0.0
+        self._ready = False
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    @staticmethod
+    def _table() -> str:
+        db = SQL_TABLES.get("t_member", {}).get("database_name") or "devapi1_mtarde_c"
+        return f"{db}.t_member_root_path"
+
+    @staticmethod
+    def _split_path(path: Any) -> Optional[Tuple[str, ...]]:
+        if not isinstance(path, str) or not path.strip():
+            return None
+        return tuple(token.strip() for token in path.strip().split(","))
+
+    @staticmethod
+    def _node(
+        root: _PathNode, tokens: Tuple[str, ...], create: bool = False
+    ) -> Optional[_PathNode]:
+        node = root
+        for token in tokens:
+            child = node.children.get(token)
+            if child is None:
+                if not create:
+                    return None
+                child = node.children[token] = _PathNode()
+            node = child
+        return node
+
+    @classmethod
+    def _add(
+        cls,
+        root: _PathNode,
+        paths: Dict[int, Tuple[str, ...]],
+        member_id: int,
+        tokens: Tuple[str, ...],
+    ) -> None:
+        old_tokens = paths.get(member_id)
+        if old_tokens == tokens:
+            return
+        if old_tokens is not None:
+            old_node = cls._node(root, old_tokens)
+            if old_node is not None:
+                old_node.members.discard(member_id)
+        paths[member_id] = tokens
+        cls._node(root, tokens, create=True).members.add(member_id)
+
+    async def _load_since(
+        self,
+        root: _PathNode,
+        paths: Dict[int, Tuple[str, ...]],
+        high_water_mark: int,
+    ) -> int:
+        """按 member_id 分批拉取高水位之后的路径记录写入索引，返回新的高水位"""
+        batch_size = settings.MEMBER_INDEX_BATCH_SIZE
+        while True:
+            rows = await base_db.execute_query(
+                f"SELECT member_id, path FROM {self._table()} "
+                f"WHERE member_id > %s ORDER BY member_id LIMIT %s",
+                [high_water_mark, batch_size],
+            )
+            previous_mark = high_water_mark
+            for row in rows or []:
+                member_id = to_member_id(row.get("member_id"))
+                if member_id is None:
+                    continue
+                high_water_mark = max(high_water_mark, member_id)
+                tokens = self._split_path(row.get("path"))
+                if tokens:
+                    self._add(root, paths, member_id, tokens)
+            # 不足一批或高水位未推进（无法解析的member_id）时结束
+            if not rows or len(rows) < batch_size or high_water_mark == previous_mark:
+                return high_water_mark
+
+    async def refresh(self, full: bool = False) -> None:
+        """刷新索引：full=True 时全量重建，否则仅增量加载新成员"""
+        async with self._lock:
+            start_time = time.time()
+            if full or not self._ready:
+                # 全量重建在新结构上进行，完成后整体替换，避免读到半成品
+                root, paths = _PathNode(), {}
+                high_water_mark = await self._load_since(root, paths, 0)
+                self._root, self._paths = root, paths
+                self._high_water_mark = high_water_mark
+                self._last_full_build = time.time()
+                self._ready = True
+                mode = "全量"
+            else:
+                self._high_water_mark = await self._load_since(
+                    self._root, self._paths, self._high_water_mark
+                )
+                mode = "增量"
+            self._last_refresh = time.time()
+            logger.info(
+                f"成员层级索引{mode}刷新完成: {len(self._paths)} 个成员, "
+                f"高水位 {self._high_water_mark}, 耗时 {time.time() - start_time:.2f}s"
+            )
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                full = (
+                    not self._ready
+                    or time.time() - self._last_full_build
+                    >= settings.MEMBER_INDEX_FULL_REBUILD_INTERVAL
+                )
+                await self.refresh(full=full)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"成员层级索引刷新失败: {e}")
+            await asyncio.sleep(settings.MEMBER_INDEX_REFRESH_INTERVAL)
+
+    def start(self) -> None:
+        """启动定时刷新任务（需在事件循环中调用，重复调用无副作用）"""
+        if not settings.MEMBER_INDEX_ENABLED:
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        """停止定时刷新任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def contains(self, member_id: int) -> bool:
+        return member_id in self._paths
+
+    def is_under(self, member_id: int, crm_id: int) -> bool:
+        """判断 member_id 是否为 crm_id 本人或其下级"""
+        if member_id == crm_id:
+            return crm_id in self._paths
+        crm_tokens = self._paths.get(crm_id)
+        member_tokens = self._paths.get(member_id)
+        if crm_tokens is None or member_tokens is None:
+            return False
+        return (
+            len(member_tokens) > len(crm_tokens)
+            and member_tokens[: len(crm_tokens)] == crm_tokens
+        )
+
+    def descendants(self, crm_id: int) -> List[int]:
+        """获取 crm_id 本人及其全部下级"""
+        crm_tokens = self._paths.get(crm_id)
+        if crm_tokens is None:
+            return []
+        node = self._node(self._root, crm_tokens)
+        ids = [crm_id]
+        stack = list(node.children.values()) if node else []
+        while stack:
+            current = stack.pop()
+            ids.extend(current.members)
+            stack.extend(current.children.values())
+        return ids
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.MEMBER_INDEX_ENABLED,
+            "ready": self._ready,
+            "members": len(self._paths),
+            "high_water_mark": self._high_water_mark,
+            "last_refresh": self._last_refresh or None,
+            "last_full_build": self._last_full_build or None,
+        }
+
+
+access_scope_cache = TTLCache(
+    "access_scope",
+    max_size=settings.ACCESS_SCOPE_CACHE_MAX_SIZE,
+    ttl=settings.ACCESS_SCOPE_CACHE_TTL,
+)
+member_tree_index = MemberTreeIndex()
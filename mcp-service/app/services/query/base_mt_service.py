@@ -8,23 +8,49 @@ import time
 from abc import ABC, abstractmethod
 from datetime import datetime
 from numbers import Number
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from app.models.schema import QueryDataResponse
 from app.services.query.warehouse_user_service import warehouse_user_service
 from app.services.sql_generate_service import SQLGenerator
+from core.config import settings
 from core.log import logger
 from core.query_logger import QueryTimer
 from db.warehouse import warehouse_db as base_db
+from utils.cache import TTLCache
+from utils.data import compress_rows
 from utils.query_type_helper import get_query_type_description
 
+# 决定用户范围的参数（时间范围、分页、limit等不影响mt账号查询结果，不参与缓存键）
+MTLOGIN_USER_PARAMS = (
+    "crm_user_id",
+    "user_id",
+    "username",
+    "user_name",
+    "email",
+    "user_type",
+    "country",
+    "kyc",
+    "register_time",
+    "limit",
+)
+# 按创建时间查询mt账号时生效的时间参数（与 utils.date.get_start_and_end_time 读取的键一致）
+MTLOGIN_TIME_PARAMS = ("start_date", "end_date", "range_time")
+
+# MT4/MT5服务共享的mt账号查询缓存
+mtlogin_cache = TTLCache(
+    "mtlogin",
+    max_size=settings.MTLOGIN_CACHE_MAX_SIZE,
+    ttl=settings.MTLOGIN_CACHE_TTL,
+)
+
 
 class BaseMTService(ABC):
     """MT服务基类"""
 
     def __init__(self):
         self._query_start_time: Optional[float] = None
-        self._mtlogin_cache: Dict[str, List[Any]] = {}  # 缓存user_mtlogin结果
+        self._mtlogin_cache = mtlogin_cache  # 缓存user_mtlogin结果（MT4/MT5共享）
 
     def _build_response_with_sql_info(
         self,
@@ -53,30 +79,62 @@ class BaseMTService(ABC):
             },
         }
 
+    @staticmethod
+    def _build_mtlogin_lookup(
+        parameters: Dict[str, Any], is_create_time: bool = False
+    ) -> Tuple[Dict[str, Any], Tuple[str, str]]:
+        """提取决定mt账号查询结果的参数（用户标识、crm范围、条数限制及时间范围），并生成规范化的缓存键"""
+        keys = MTLOGIN_USER_PARAMS + (MTLOGIN_TIME_PARAMS if is_create_time else ())
+        lookup_parameters = {
+            key: parameters[key]
+            for key in keys
+            if key in parameters and parameters[key] is not None
+        }
+        normalized = {
+            key: sorted(str(v) for v in value)
+            if isinstance(value, (list, tuple, set))
+            else str(value)
+            if isinstance(value, (int, str))
+            else value
+            for key, value in lookup_parameters.items()
+        }
+        # 以crm_user_id作为键的第一部分，便于按crm范围失效
+        crm_user_id = str(normalized.pop("crm_user_id", "")).strip()
+        cache_key = (
+            crm_user_id,
+            json.dumps(
+                [normalized, is_create_time],
+                sort_keys=True,
+                ensure_ascii=False,
+                default=str,
+            ),
+        )
+        return lookup_parameters, cache_key
+
     async def _get_user_mtlogin(
         self, parameters: Dict[str, Any], is_create_time: bool = False
     ) -> Optional[List[Any]]:
-        """查询用户mt交易账号信息（带缓存）"""
-        # 生成缓存键：将parameters的所有值组成字符串
-        cache_key = json.dumps(parameters, sort_keys=True, ensure_ascii=False)
+        """查询用户mt交易账号信息（带缓存）
 
-        # 检查缓存
-        if cache_key in self._mtlogin_cache:
-            logger.info(f"使用缓存的user_mtlogin结果: {cache_key}")
-            return self._mtlogin_cache[cache_key]
+        缓存键仅包含影响账号查询结果的参数，同一用户的MT4/MT5交易、持仓查询共享一次账号查询。
+        """
+        lookup_parameters, cache_key = self._build_mtlogin_lookup(
+            parameters, is_create_time
+        )
 
-        try:
+        async def _load() -> List[Any]:
             mtlogin_response: QueryDataResponse = (
                 await warehouse_user_service.get_user_mtlogin(
-                    parameters, log_query=False, is_create_time=is_create_time
+                    lookup_parameters, log_query=False, is_create_time=is_create_time
                 )
             )
-            if mtlogin_response.success:
-                # 缓存结果
-                self._mtlogin_cache[cache_key] = mtlogin_response.data
-                logger.info(f"缓存user_mtlogin结果: {cache_key}")
-                return mtlogin_response.data
-            return None
+            if not mtlogin_response.success:
+                raise RuntimeError(mtlogin_response.message)
+            logger.info(f"缓存user_mtlogin结果: {cache_key}")
+            return mtlogin_response.data
+
+        try:
+            return await self._mtlogin_cache.get_or_load(cache_key, _load)
         except Exception as e:
             logger.error(f"查询用户mt交易账号信息错误: {str(e)}")
             return None
@@ -127,6 +185,138 @@ class BaseMTService(ABC):
 
         return loginids, matched_db_name
 
+    async def _build_mt_query(
+        self,
+        parameters: Dict[str, Any],
+        table_name: str,
+        target_db_name: str,
+        login_field: str = "LOGIN",
+        time_field: Optional[str] = None,
+        order_by: Optional[Tuple[str, str]] = None,
+        isstrptime: bool = False,
+        query_type: str = "mt_data",
+        default_limit: Optional[int] = None,
+    ) -> Optional[Tuple[SQLGenerator, str, List[Any]]]:
+        """构建MT数据查询SQL，用户没有匹配的mt账号时返回None"""
+        mtlogins = await self._get_user_mtlogin(parameters)
+        if not mtlogins:
+            return None
+
+        loginids, matched_db_name = self._filter_mtlogins_by_db_name(
+            mtlogins, target_db_name
+        )
+        if not loginids:
+            return None
+
+        # 根据匹配的数据库名选择正确的表配置
+        actual_table_name = self._get_table_name_by_db_name(matched_db_name, table_name)
+
+        # 生成SQL
+        sql_generator = SQLGenerator(actual_table_name)
+        sql_generator.add_condition(login_field, "IN", loginids)
+        # 限制仅查询交易方向为买卖的记录（CMD=0或CMD=1）
+        if query_type in ["user_mt4_trades", "user_mt5_trades"]:
+            sql_generator.add_condition("CMD", "IN", [0, 1])
+
+        # 用户基本信息查询默认只返回一条记录
+        # 如果需要查询多条记录，请在参数中明确指定 limit
+        if (
+            query_type in ["user_data", "user_mt4_user", "user_mt5_user"]
+            and "limit" not in parameters
+        ):
+            parameters["limit"] = 1
+
+        sql, params = sql_generator.generate_sql(
+            parameters,
+            time_field=time_field,
+            isstrptime=isstrptime,
+            order_by=order_by,
+            default_limit=default_limit,
+        )
+        return sql_generator, sql, params
+
+    @staticmethod
+    def _scale_volume(volume_value: Any) -> Any:
+        """VOLUME字段按手数换算（除以100），无法换算时保持原值"""
+        if volume_value is None:
+            return volume_value
+        if isinstance(volume_value, Number):
+            return volume_value / 100
+        try:
+            return float(volume_value) / 100
+        except (TypeError, ValueError):
+            return volume_value
+
+    async def _stream_mt_data(
+        self,
+        parameters: Dict[str, Any],
+        table_name: str,
+        target_db_name: str,
+        login_field: str = "LOGIN",
+        time_field: Optional[str] = None,
+        order_by: Optional[Tuple[str, str]] = None,
+        isstrptime: bool = False,
+        query_type: str = "mt_data",
+        batch_size: Optional[int] = None,
+    ) -> AsyncIterator[Tuple[List[str], List[List[Any]]]]:
+        """通用MT数据流式查询方法，按批返回压缩格式的 (columns, rows)"""
+        query = await self._build_mt_query(
+            parameters,
+            table_name,
+            target_db_name,
+            login_field=login_field,
+            time_field=time_field,
+            order_by=order_by,
+            isstrptime=isstrptime,
+            query_type=query_type,
+            default_limit=settings.STREAM_DEFAULT_LIMIT,
+        )
+        if query is None:
+            yield [], []
+            return
+        _, sql, params = query
+
+        with QueryTimer(
+            query_type,
+            parameters,
+            sql,
+            table_name,
+            target_db_name,
+            sql_params=params,
+        ) as timer:
+            row_count = 0
+            async for columns, rows in base_db.stream_query(
+                sql, params, batch_size=batch_size
+            ):
+                rows = compress_rows(columns, rows)
+                if "VOLUME" in columns:
+                    index = columns.index("VOLUME")
+                    for row in rows:
+                        row[index] = self._scale_volume(row[index])
+                row_count += len(rows)
+                yield columns, rows
+            timer.log_result(row_count)
+
+    def _stream_by_config(
+        self,
+        config_name: str,
+        parameters: Dict[str, Any],
+        batch_size: Optional[int] = None,
+    ) -> AsyncIterator[Tuple[List[str], List[List[Any]]]]:
+        """按 get_mt_config 中的配置流式查询MT数据"""
+        config = self.get_mt_config()[config_name]
+        return self._stream_mt_data(
+            parameters=parameters,
+            table_name=config["table_name"],
+            target_db_name=config["db_name"],
+            login_field=config.get("login_field", "LOGIN"),
+            time_field=config["time_field"],
+            order_by=config["order_by"],
+            isstrptime=config["isstrptime"],
+            query_type=config["query_type"],
+            batch_size=batch_size,
+        )
+
     async def _query_mt_data(
         self,
         parameters: Dict[str, Any],
@@ -141,26 +331,17 @@ class BaseMTService(ABC):
     ) -> QueryDataResponse:
         """通用MT数据查询方法"""
         try:
-            mtlogins = await self._get_user_mtlogin(parameters)
-            # print('======mtlogins=====',mtlogins)
-            if not mtlogins:
-                return QueryDataResponse(
-                    success=True,
-                    message=f"未找到{get_query_type_description(query_type)}",
-                    data=[],
-                    parameters=parameters,
-                    sql_info=None,
-                    query_metadata={
-                        "query_type": query_type,
-                        "timestamp": datetime.now().isoformat(),
-                    },
-                )
-
-            loginids, matched_db_name = self._filter_mtlogins_by_db_name(
-                mtlogins, target_db_name
+            query = await self._build_mt_query(
+                parameters,
+                table_name,
+                target_db_name,
+                login_field=login_field,
+                time_field=time_field,
+                order_by=order_by,
+                isstrptime=isstrptime,
+                query_type=query_type,
             )
-            # print('======loginids=====',mtlogins)
-            if not loginids:
+            if query is None:
                 return QueryDataResponse(
                     success=True,
                     message=f"未找到{get_query_type_description(query_type)}",
@@ -172,33 +353,8 @@ class BaseMTService(ABC):
                         "timestamp": datetime.now().isoformat(),
                     },
                 )
+            sql_generator, sql, params = query
 
-            # 根据匹配的数据库名选择正确的表配置
-            actual_table_name = self._get_table_name_by_db_name(
-                matched_db_name, table_name
-            )
-
-            # 生成SQL
-            sql_generator = SQLGenerator(actual_table_name)
-            sql_generator.add_condition(login_field, "IN", loginids)
-            # 限制仅查询交易方向为买卖的记录（CMD=0或CMD=1）
-            if query_type in ["user_mt4_trades", "user_mt5_trades"]:
-                sql_generator.add_condition("CMD", "IN", [0, 1])
-
-            # 用户基本信息查询默认只返回一条记录
-            # 如果需要查询多条记录，请在参数中明确指定 limit
-            if (
-                query_type in ["user_data", "user_mt4_user", "user_mt5_user"]
-                and "limit" not in parameters
-            ):
-                parameters["limit"] = 1
-
-            sql, params = sql_generator.generate_sql(
-                parameters,
-                time_field=time_field,
-                isstrptime=isstrptime,
-                order_by=order_by,
-            )
             # print('========isstrptime======',isstrptime)
             # print('========time_field======',time_field)
             # print('========sql======',sql)
@@ -217,16 +373,7 @@ class BaseMTService(ABC):
                 if results:
                     for row in results:
                         if isinstance(row, dict) and "VOLUME" in row:
-                            volume_value = row.get("VOLUME")
-                            if volume_value is None:
-                                continue
-                            if isinstance(volume_value, Number):
-                                row["VOLUME"] = volume_value / 100
-                            else:
-                                try:
-                                    row["VOLUME"] = float(volume_value) / 100
-                                except (TypeError, ValueError):
-                                    continue
+                            row["VOLUME"] = self._scale_volume(row.get("VOLUME"))
 
                 execution_time = time.time() - self._query_start_time
 
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from app.models.schema import QueryDataResponse
 
@@ -48,6 +48,12 @@ class Mt4Service(BaseMTService):
             error_message=config["error_message"],
         )
 
+    def stream_mt4_194_trades(
+        self, parameters: Dict[str, Any], batch_size: Optional[int] = None
+    ) -> AsyncIterator[Tuple[List[str], List[List[Any]]]]:
+        """流式查询MT4交易信息"""
+        return self._stream_by_config("trades", parameters, batch_size)
+
     async def get_mt4_194_user(self, parameters: Dict[str, Any]) -> QueryDataResponse:
         """查询MT4用户信息"""
         config = self.get_mt_config()["user"]
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from app.models.schema import QueryDataResponse
 
@@ -59,6 +59,12 @@ class Mt5Service(BaseMTService):
             error_message=config["error_message"],
         )
 
+    def stream_mt5_1110_trades(
+        self, parameters: Dict[str, Any], batch_size: Optional[int] = None
+    ) -> AsyncIterator[Tuple[List[str], List[List[Any]]]]:
+        """流式查询MT5交易信息"""
+        return self._stream_by_config("trades", parameters, batch_size)
+
     async def get_mt5_1110_user(self, parameters: Dict[str, Any]) -> QueryDataResponse:
         """查询MT5用户信息"""
         config = self.get_mt_config()["user"]
@@ -90,5 +96,11 @@ class Mt5Service(BaseMTService):
             error_message=config["error_message"],
         )
 
+    def stream_mt5_1110_positions(
+        self, parameters: Dict[str, Any], batch_size: Optional[int] = None
+    ) -> AsyncIterator[Tuple[List[str], List[List[Any]]]]:
+        """流式查询MT5持仓信息"""
+        return self._stream_by_config("positions", parameters, batch_size)
+
 
 mt5_service = Mt5Service()
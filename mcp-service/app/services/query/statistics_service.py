@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from typing import Any, Dict
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
 
 from app.models.schema import QueryDataResponse
 from app.services.query.warehouse_user_service import warehouse_user_service
@@ -28,30 +29,29 @@ class StatisticsService:
         """
         sql_info = {}
         # print("=========parameters===============", parameters)
-        # if parameters.get("crm_user_id") == 1:
-        #     del parameters["crm_user_id"]
-        #     del parameters["user_id"]
-        #     del parameters["user_name"]
-        # 获取入金账号数（direction=1的唯一member_id数量）
-        (
-            deposit_accounts,
-            deposit_amount,
-            sql_info["deposit_sql"],
-        ) = await self.get_fund_statistics(parameters, 1)
-
-        # 获取出金金额（根据source_currency联立t_currency_rate表计算）
-        (
-            withdrawal_accounts,
-            withdrawal_amount,
-            sql_info["withdrawal_sql"],
-        ) = await self.get_fund_statistics(parameters, 2)
+        # 访问范围每个请求只解析一次，出入金与登录统计共用
+        member_scope = await self._resolve_member_scope(parameters)
 
-        # 获取登录统计数据
+        # 出入金在同一次聚合中统计，登录统计并行查询
         (
-            login_accounts,
-            login_count,
-            sql_info["login_sql"],
-        ) = await self.get_login_statistics(parameters)
+            (
+                deposit_accounts,
+                deposit_amount,
+                withdrawal_accounts,
+                withdrawal_amount,
+                fund_sql,
+            ),
+            (
+                login_accounts,
+                login_count,
+                sql_info["login_sql"],
+            ),
+        ) = await asyncio.gather(
+            self.get_fund_summary(parameters, member_scope),
+            self.get_login_statistics(parameters, member_scope),
+        )
+        # 出入金共用一条聚合SQL，保留原有的 deposit_sql/withdrawal_sql 字段
+        sql_info["deposit_sql"] = sql_info["withdrawal_sql"] = fund_sql
 
         statistics_data = {
             "deposit_accounts": deposit_accounts,
@@ -106,46 +106,67 @@ class StatisticsService:
                 },
             )
 
-    async def get_fund_statistics(
-        self, parameters: Dict[str, Any], direction: int = 1
-    ) -> tuple[int, float, str]:
-        """获取出入金统计"""
-        # 创建SQLGenerator实例
-        sql_gen = SQLGenerator("t_member_amount_log")
+    async def _resolve_member_scope(
+        self, parameters: Dict[str, Any]
+    ) -> Tuple[bool, Optional[List[int]]]:
+        """
+        解析统计查询的成员范围
 
-        sql_gen.add_condition("direction", "=", direction)
+        参数:
+            parameters: 查询参数，包含crm_user_id及用户筛选条件
+
+        返回:
+            (是否可查询, 成员ID列表)，成员ID列表为None表示不限制范围
+        """
+        crm_user_id = parameters.get("crm_user_id")
+        if crm_user_id == 1:
+            return True, None
 
-        # 添加条件：member_id
         member_id = None
         try:
             # 优先使用显式用户筛选（会自动进行层级校验）
             member_id = await warehouse_user_service._get_user_id(parameters)
         except Exception:
             member_id = None
-        crm_user_id = parameters.get("crm_user_id")
-        if crm_user_id == 1:
-            pass
-        else:
-            if member_id:
-                sql_gen.add_condition("member_id", "in", member_id)
-            else:
-                # 未提供用户筛选时，使用 crm_user_id 的层级范围（含本人）
-                if crm_user_id is not None and str(crm_user_id).strip():
-                    accessible_ids = (
-                        await warehouse_user_service._get_accessible_member_ids_by_crm(
-                            crm_user_id
-                        )
-                    )
-                    # 若无可访问成员，则返回0统计（避免全库查询）
-                    if not accessible_ids:
-                        return 0, 0, ""
-                    sql_gen.add_condition("member_id", "in", accessible_ids)
-                else:
-                    # 没有 crm_user_id，无法进行授权范围限制
-                    return 0, 0, ""
+        if member_id:
+            return True, member_id
 
-        start_time, end_time = get_start_and_end_time(parameters, False)
+        # 未提供用户筛选时，使用 crm_user_id 的层级范围（含本人）
+        if crm_user_id is not None and str(crm_user_id).strip():
+            accessible_ids = (
+                await warehouse_user_service._get_accessible_member_ids_by_crm(
+                    crm_user_id
+                )
+            )
+            # 若无可访问成员，则返回0统计（避免全库查询）
+            return bool(accessible_ids), accessible_ids
+
+        # 没有 crm_user_id，无法进行授权范围限制
+        return False, None
+
+    async def get_fund_summary(
+        self,
+        parameters: Dict[str, Any],
+        member_scope: Optional[Tuple[bool, Optional[List[int]]]] = None,
+    ) -> tuple[int, float, int, float, str]:
+        """
+        一次聚合获取入金和出金统计
+
+        返回:
+            (入金账号数, 入金金额, 出金账号数, 出金金额, SQL)
+        """
+        if member_scope is None:
+            member_scope = await self._resolve_member_scope(parameters)
+        allowed, member_ids = member_scope
+        if not allowed:
+            return 0, 0, 0, 0, ""
+
+        sql_gen = SQLGenerator("t_member_amount_log")
+        sql_gen.add_condition("direction", "in", [1, 2])
+        if member_ids:
+            sql_gen.add_condition("member_id", "in", member_ids)
 
+        start_time, end_time = get_start_and_end_time(parameters, False)
         if start_time:
             sql_gen.add_condition("created_at", ">=", start_time)
         if end_time:
@@ -153,8 +174,10 @@ class StatisticsService:
 
         sql, params = sql_gen.generate_select(
             [
-                "COUNT(DISTINCT member_id) as total_accounts",
-                "SUM(destination_money_usd) as total_amounts",
+                "COUNT(DISTINCT CASE WHEN direction = 1 THEN member_id END) as deposit_accounts",
+                "SUM(CASE WHEN direction = 1 THEN destination_money_usd END) as deposit_amount",
+                "COUNT(DISTINCT CASE WHEN direction = 2 THEN member_id END) as withdrawal_accounts",
+                "SUM(CASE WHEN direction = 2 THEN destination_money_usd END) as withdrawal_amount",
             ]
         )
 
@@ -166,60 +189,66 @@ class StatisticsService:
             "t_fund_changes_history",
             sql_params=params,
         ) as timer:
-            # print("=========sql===============", sql)
-            # print("=========params===============", params)
             results = await base_db.execute_query(sql, params)
             timer.log_result(len(results) if results else 0, results)
 
         if results and results[0]:
-            return results[0]["total_accounts"], results[0]["total_amounts"], sql
+            row = results[0]
+            return (
+                row["deposit_accounts"],
+                row["deposit_amount"],
+                row["withdrawal_accounts"],
+                row["withdrawal_amount"],
+                sql,
+            )
         else:
-            return 0, 0, sql
+            return 0, 0, 0, 0, sql
+
+    async def get_fund_statistics(
+        self,
+        parameters: Dict[str, Any],
+        direction: int = 1,
+        member_scope: Optional[Tuple[bool, Optional[List[int]]]] = None,
+    ) -> tuple[int, float, str]:
+        """获取出入金统计（direction: 1入金，2出金），基于 get_fund_summary 的聚合结果"""
+        (
+            deposit_accounts,
+            deposit_amount,
+            withdrawal_accounts,
+            withdrawal_amount,
+            sql,
+        ) = await self.get_fund_summary(parameters, member_scope)
+        if direction == 2:
+            return withdrawal_accounts, withdrawal_amount, sql
+        return deposit_accounts, deposit_amount, sql
 
     async def get_login_statistics(
-        self, parameters: Dict[str, Any]
+        self,
+        parameters: Dict[str, Any],
+        member_scope: Optional[Tuple[bool, Optional[List[int]]]] = None,
     ) -> tuple[int, int, str]:
         """
         获取登录统计数据
 
         参数:
             parameters: 查询参数，包含时间范围等
+            member_scope: 已解析的成员范围，为None时自行解析
 
         返回:
             (登录用户数, 登录次数)
         """
+        if member_scope is None:
+            member_scope = await self._resolve_member_scope(parameters)
+        allowed, member_ids = member_scope
+        if not allowed:
+            return 0, 0, ""
+
         # 创建SQLGenerator实例
         sql_gen = SQLGenerator("t_member_login_log")
 
         # 添加条件：member_id
-        member_id = None
-        try:
-            # 优先使用显式用户筛选（会自动进行层级校验）
-            member_id = await warehouse_user_service._get_user_id(parameters)
-        except Exception:
-            member_id = None
-
-        crm_user_id = parameters.get("crm_user_id")
-        if crm_user_id == 1:
-            pass
-        else:
-            if member_id:
-                sql_gen.add_condition("member_id", "in", member_id)
-            else:
-                # 未提供用户筛选时，使用 crm_user_id 的层级范围（含本人）
-                if crm_user_id is not None and str(crm_user_id).strip():
-                    accessible_ids = (
-                        await warehouse_user_service._get_accessible_member_ids_by_crm(
-                            crm_user_id
-                        )
-                    )
-                    # 若无可访问成员，则返回0统计（避免全库查询）
-                    if not accessible_ids:
-                        return 0, 0, ""
-                    sql_gen.add_condition("member_id", "in", accessible_ids)
-                else:
-                    # 没有 crm_user_id，无法进行授权范围限制
-                    return 0, 0, ""
+        if member_ids:
+            sql_gen.add_condition("member_id", "in", member_ids)
 
         start_time, end_time = get_start_and_end_time(parameters, True)
 
@@ -1,20 +1,35 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import asyncio
 import math
 import sys
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 # backend_dir = Path(__file__).parent.parent.parent.parent
 # print(backend_dir)
 # sys.path.insert(0, str(backend_dir))
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 import pytz
-import requests
 
 from app.models.schema import QueryDataResponse
+from core.config import settings
+from db.tdengine import tdengine_client
+from utils.cache import TTLCache
+
+# 每次返回的K线数量
+CANDLE_LIMIT = 200
+
+COLUMN_NAMES = {
+    "t": "MT_DATE",
+    "o": "OPEN",
+    "h": "HIGH",
+    "l": "LOW",
+    "c": "CLOSE",
+    "v": "VOLUME",
+}
 
 
 def get_period_str(period):
@@ -33,15 +48,141 @@ def get_period_str(period):
         return f"{math.floor(period / 43200)}n"
 
 
+# 周期单位对应的秒数（月按31天计，仅用于判断K线是否超出时间范围）
+PERIOD_UNIT_SECONDS = {"m": 60, "h": 3600, "d": 86400, "w": 604800, "n": 31 * 86400}
+
+
+def get_period_seconds(period: str) -> int:
+    """get_period_str 生成的周期字符串对应的秒数"""
+    value = period.split(",")[0]
+    return int(value[:-1]) * PERIOD_UNIT_SECONDS.get(value[-1], 60)
+
+
+def parse_bar_time(value: Any) -> Optional[datetime]:
+    """解析K线时间桶（RFC3339字符串或毫秒时间戳），不带时区的时间按本地时区处理，无法解析时返回None"""
+    try:
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value / 1000, tz=timezone.utc)
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).astimezone(
+            timezone.utc
+        )
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+class CandleSeries:
+    """
+    单个品种、周期的K线缓存
+
+    K线按时间桶倒序保存，最新一根可能尚未收盘，之前的均已收盘不会再变化；
+    后续请求只需查询最新一根所在时间桶及之后的数据。
+    每次合并后移除已完全超出请求时间范围（最近 days 天）的K线，与完整查询的结果保持一致。
+    """
+
+    def __init__(self, columns: List[str], days: Any, period: str):
+        self.columns = columns
+        try:
+            self.window: Optional[timedelta] = timedelta(days=float(days))
+        except (TypeError, ValueError):
+            # 无法解析的天数不裁剪，与查询条件保持一致
+            self.window = None
+        self.period = timedelta(seconds=get_period_seconds(period))
+        self.open_bar: Optional[list] = None
+        self.closed_bars: List[list] = []
+        # 同一序列的增量查询与合并串行执行
+        self.lock = asyncio.Lock()
+
+    @property
+    def open_from(self) -> Optional[str]:
+        """最新一根K线的时间桶"""
+        return self.open_bar[0] if self.open_bar else None
+
+    def merge(self, rows: Optional[List[list]]):
+        """合并按时间倒序查询到的K线（均不早于当前最新一根）"""
+        if rows:
+            self.open_bar = rows[0]
+            self.closed_bars = (rows[1:] + self.closed_bars)[: CANDLE_LIMIT - 1]
+        self.trim()
+
+    def trim(self):
+        """移除时间桶结束时间早于 now - days 的已收盘K线"""
+        if self.window is None:
+            return
+        bound = datetime.now(timezone.utc) - self.window
+        for index, bar in enumerate(self.closed_bars):
+            bar_time = parse_bar_time(bar[0])
+            if bar_time is not None and bar_time + self.period <= bound:
+                del self.closed_bars[index:]
+                break
+
+    def rows(self) -> List[list]:
+        return ([self.open_bar] if self.open_bar else []) + self.closed_bars
+
+
 class ToolService:
+    def __init__(self):
+        self.candle_cache = TTLCache(
+            "candle",
+            max_size=settings.CANDLE_CACHE_MAX_SIZE,
+            ttl=settings.CANDLE_CACHE_TTL,
+        )
+
+    @staticmethod
+    def _candle_sql(code: str, period: str, where: str) -> str:
+        return f" select _wstart as t,FIRST(o) as o, MAX(h) as h, MIN(l) as l, LAST(c) as c, SUM(v) as v from `{settings.TDENGINE_DATABASE}`.`{code}_m1`  where {where} INTERVAL({period})  ORDER by _wstart desc  limit {CANDLE_LIMIT}"
+
+    def candle_sql(self, code: str, days: Any, period: str) -> str:
+        """请求参数对应的完整K线查询"""
+        return self._candle_sql(code, period, f"t > now()-{days}*86400*1000")
+
+    async def _load_candles(
+        self, sql: str, days: Any, period: str
+    ) -> Optional[CandleSeries]:
+        """查询K线，请求失败时返回None"""
+        result = await tdengine_client.query(sql)
+        if result is None:
+            return None
+        columns = [
+            COLUMN_NAMES.get(column[0], column[0])
+            for column in result.get("column_meta", [])
+        ]
+        series = CandleSeries(columns, days, period)
+        series.merge(result.get("data"))
+        return series
+
+    async def get_candles(
+        self, code: str, days: Any, period: str
+    ) -> Optional[CandleSeries]:
+        """
+        获取K线，已收盘的K线从缓存读取，只实时查询最新一根及之后的数据
+
+        返回:
+            K线序列，查询失败时返回None
+        """
+        key = (code, period, str(days))
+        series = self.candle_cache.get(key)
+        if series is None or series.open_from is None:
+            series = await self._load_candles(
+                self.candle_sql(code, days, period), days, period
+            )
+            if series is not None and series.open_from is not None:
+                self.candle_cache.set(key, series)
+            return series
+
+        async with series.lock:
+            sql = self._candle_sql(code, period, f"t >= '{series.open_from}'")
+            result = await tdengine_client.query(sql)
+            if result is None:
+                return None
+            series.merge(result.get("data"))
+        return series
+
     async def get_wh_data(self, parameters: Dict[str, Any]):
         code = parameters.get("code")
         if isinstance(code, list):
             code = code[0]
         days = parameters.get("days", "30")
         period = get_period_str(parameters.get("period", "1"))
-        url = "http://122.51.27.47:6041/rest/sql"
-        sql = f" select _wstart as t,FIRST(o) as o, MAX(h) as h, MIN(l) as l, LAST(c) as c, SUM(v) as v from `GTC-Demo_5`.`{code}_m1`  where t > now()-{days}*86400*1000 INTERVAL({period})  ORDER by _wstart desc  limit 200"
         parameters = {"code": code, "days": days, "period": period}
         if not code:
             return QueryDataResponse(
@@ -49,32 +190,15 @@ class ToolService:
                 message="没有对应的品种",
                 data=0,
                 parameters=parameters,
-                sql_info={"sql": sql},
+                sql_info={"sql": self.candle_sql(code, days, period)},
                 query_metadata={"query_type": "tool_get_wh_data"},
             )
 
-        response = requests.post(url, data=sql, auth=("root", "taosdata"))
-        if response.status_code == 200:
-            resault = response.json()
-            column_meta = resault.get("column_meta", [])
-            columns = []
-            for column in column_meta:
-                if column[0] == "t":
-                    columns.append("MT_DATE")
-                elif column[0] == "o":
-                    columns.append("OPEN")
-                elif column[0] == "h":
-                    columns.append("HIGH")
-                elif column[0] == "l":
-                    columns.append("LOW")
-                elif column[0] == "c":
-                    columns.append("CLOSE")
-                elif column[0] == "v":
-                    columns.append("VOLUME")
-                else:
-                    columns.append(column[0])
-
-            data = {"columns": columns, "rows": resault.get("data")}
+        # 缓存命中时实际只执行增量查询，这里返回请求参数对应的完整查询
+        sql = self.candle_sql(code, days, period)
+        series = await self.get_candles(code, days, period)
+        if series is not None:
+            data = {"columns": series.columns, "rows": series.rows() or None}
             return QueryDataResponse(
                 success=True,
                 message="获取行情数据成功",
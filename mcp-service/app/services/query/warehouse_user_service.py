@@ -2,16 +2,21 @@
 # -*- coding: utf-8 -*-
 import time
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from app.models.schema import QueryDataResponse
+from app.services.access_scope_service import (
+    access_scope_cache,
+    member_tree_index,
+    to_member_id,
+)
 from app.services.sql_generate_service import SQLGenerator
 from core.config import settings
 from core.log import logger
 from core.query_logger import QueryTimer
 from core.sql_config import SQL_TABLES
 from db.warehouse import warehouse_db as base_db
-from utils.data import convert_to_list, convert_to_timestamp
+from utils.data import compress_rows, convert_to_list, convert_to_timestamp
 from utils.date import get_register_time
 from utils.device_name_extractor import device_extractor
 from utils.query_type_helper import get_query_type_description
@@ -126,37 +131,38 @@ class WarehouseUserService:
     ) -> QueryDataResponse:
         """通用日志查询方法"""
         try:
-            member_id = await self._get_user_id(parameters)
-            sql_generator = SQLGenerator(table_name)
-            if member_id:
-                sql_generator.add_condition("member_id", "in", member_id)
-            elif table_name != "t_member":
-                sql_generator.add_join_table(
-                    "t_member",
-                    "member_id",
-                    "id",
-                    join_type="LEFT JOIN",
-                    table_alias="user",
+            pagination = None
+            if self._is_paginated(parameters):
+                (
+                    sql_generator,
+                    sql,
+                    params,
+                    results,
+                    pagination,
+                    execution_time,
+                ) = await self._query_log_page(
+                    table_name,
+                    parameters,
+                    query_type,
+                    time_field,
+                    kwargs.get("isstrptime", True),
                 )
-
-            sql, params = sql_generator.generate_sql(
-                parameters,
-                time_field=time_field,
-                isstrptime=kwargs.get("isstrptime", True),
-                order_by=(time_field, "DESC"),
-            )
-
-            # 使用查询计时器记录SQL执行情况
-            with QueryTimer(
-                query_type, parameters, sql, table_name, sql_params=params
-            ) as timer:
-                self._query_start_time = time.time()
-                results, execution_time = await self._execute_query_with_timing(
-                    sql, params
+            else:
+                sql_generator, sql, params = await self._build_log_query(
+                    table_name, parameters, time_field, kwargs.get("isstrptime", True)
                 )
 
-                # 记录查询结果
-                timer.log_result(len(results) if results else 0, results)
+                # 使用查询计时器记录SQL执行情况
+                with QueryTimer(
+                    query_type, parameters, sql, table_name, sql_params=params
+                ) as timer:
+                    self._query_start_time = time.time()
+                    results, execution_time = await self._execute_query_with_timing(
+                        sql, params
+                    )
+
+                    # 记录查询结果
+                    timer.log_result(len(results) if results else 0, results)
 
             if process_result and results:
                 results = process_result(results)
@@ -169,6 +175,8 @@ class WarehouseUserService:
                 len(results) if results else 0,
             )
             query_metadata = self._build_query_metadata(query_type)
+            if pagination is not None:
+                query_metadata["pagination"] = pagination
 
             # 无论是否有结果，都返回success=True，没有数据时返回空列表
             return QueryDataResponse(
@@ -196,6 +204,119 @@ class WarehouseUserService:
                 },
             )
 
+    async def _build_log_query(
+        self,
+        table_name: str,
+        parameters: Dict[str, Any],
+        time_field: str = "create_time",
+        isstrptime: bool = True,
+        default_limit: Optional[int] = None,
+    ) -> Tuple[SQLGenerator, str, List[Any]]:
+        """构建日志查询SQL（含用户权限校验）"""
+        sql_generator = await self._prepare_log_query(table_name, parameters)
+        sql, params = sql_generator.generate_sql(
+            parameters,
+            time_field=time_field,
+            isstrptime=isstrptime,
+            order_by=(time_field, "DESC"),
+            default_limit=default_limit,
+        )
+        return sql_generator, sql, params
+
+    async def _prepare_log_query(
+        self, table_name: str, parameters: Dict[str, Any]
+    ) -> SQLGenerator:
+        """创建日志查询SQL生成器并添加用户条件"""
+        member_id = await self._get_user_id(parameters)
+        sql_generator = SQLGenerator(table_name)
+        if member_id:
+            sql_generator.add_condition("member_id", "in", member_id)
+        elif table_name != "t_member":
+            sql_generator.add_join_table(
+                "t_member",
+                "member_id",
+                "id",
+                join_type="LEFT JOIN",
+                table_alias="user",
+            )
+        return sql_generator
+
+    @staticmethod
+    def _is_paginated(parameters: Dict[str, Any]) -> bool:
+        """传入 cursor 或显式指定 pagination="keyset" 时使用键集分页，其余请求保持原有查询方式"""
+        return (
+            bool(parameters.get("cursor")) or parameters.get("pagination") == "keyset"
+        )
+
+    async def _query_log_page(
+        self,
+        table_name: str,
+        parameters: Dict[str, Any],
+        query_type: str,
+        time_field: str,
+        isstrptime: bool,
+    ) -> Tuple[SQLGenerator, str, List[Any], List[Any], Dict[str, Any], float]:
+        """键集分页查询日志，按 (time_field, id) 倒序，返回下一页游标"""
+        sql_generator = await self._prepare_log_query(table_name, parameters)
+        sql, params, count_sql, count_params = sql_generator.generate_keyset_sql(
+            parameters, time_field=time_field, isstrptime=isstrptime
+        )
+        with QueryTimer(
+            query_type, parameters, sql, table_name, sql_params=params
+        ) as timer:
+            start_time = time.time()
+            page = await base_db.execute_paginated_query(
+                sql,
+                params,
+                page_size=sql_generator.page_size,
+                keyset_fields=(time_field, "id"),
+                count_sql=count_sql,
+                count_params=count_params,
+                total_mode=parameters.get("total_mode") or "exact",
+            )
+            execution_time = time.time() - start_time
+            timer.log_result(len(page["data"]), page["data"])
+        return (
+            sql_generator,
+            sql,
+            params,
+            page["data"],
+            page["metadata"],
+            execution_time,
+        )
+
+    async def _stream_log_data(
+        self,
+        table_name: str,
+        parameters: Dict[str, Any],
+        query_type: str,
+        time_field: str = "create_time",
+        process_rows: Optional[callable] = None,
+        batch_size: Optional[int] = None,
+        **kwargs,
+    ) -> AsyncIterator[Tuple[List[str], List[List[Any]]]]:
+        """通用日志流式查询方法，按批返回压缩格式的 (columns, rows)"""
+        _, sql, params = await self._build_log_query(
+            table_name,
+            parameters,
+            time_field,
+            kwargs.get("isstrptime", True),
+            default_limit=settings.STREAM_DEFAULT_LIMIT,
+        )
+        with QueryTimer(
+            query_type, parameters, sql, table_name, sql_params=params
+        ) as timer:
+            row_count = 0
+            async for columns, rows in base_db.stream_query(
+                sql, params, batch_size=batch_size
+            ):
+                rows = compress_rows(columns, rows)
+                if process_rows and rows:
+                    rows = process_rows(columns, rows)
+                row_count += len(rows)
+                yield columns, rows
+            timer.log_result(row_count)
+
     async def get_user(self, parameters: Dict[str, Any]) -> QueryDataResponse:
         """查询用户信息"""
         try:
@@ -519,11 +640,11 @@ class WarehouseUserService:
         """查询用户登录日志"""
 
         def process_device_names(results):
-            for result in results:
-                device_info = (
-                    device_extractor.extract_device_name(result.get("agent", "")) or {}
-                )
-                result["agent"] = device_info.get("device_name")
+            device_names = device_extractor.batch_device_names(
+                result.get("agent", "") for result in results
+            )
+            for result, device_name in zip(results, device_names):
+                result["agent"] = device_name
             return results
 
         return await self._query_log_data(
@@ -541,6 +662,66 @@ class WarehouseUserService:
             TABLE_FORWORD_LOG, parameters, QUERY_TYPE_FORWORD_LOG
         )
 
+    def stream_user_op_log(
+        self, parameters: Dict[str, Any], batch_size: Optional[int] = None
+    ) -> AsyncIterator[Tuple[List[str], List[List[Any]]]]:
+        """流式查询用户操作日志"""
+        return self._stream_log_data(
+            TABLE_OPERATION_LOG,
+            parameters,
+            QUERY_TYPE_OP_LOG,
+            time_field="created_at",
+            batch_size=batch_size,
+        )
+
+    def stream_user_amount_log(
+        self, parameters: Dict[str, Any], batch_size: Optional[int] = None
+    ) -> AsyncIterator[Tuple[List[str], List[List[Any]]]]:
+        """流式查询用户资金情况"""
+        return self._stream_log_data(
+            TABLE_AMOUNT_LOG,
+            parameters,
+            QUERY_TYPE_AMOUNT_LOG,
+            time_field="created_at",
+            batch_size=batch_size,
+            isstrptime=False,
+        )
+
+    def stream_user_login_log(
+        self, parameters: Dict[str, Any], batch_size: Optional[int] = None
+    ) -> AsyncIterator[Tuple[List[str], List[List[Any]]]]:
+        """流式查询用户登录日志"""
+
+        def process_device_names(columns, rows):
+            if "agent" not in columns:
+                return rows
+            index = columns.index("agent")
+            device_names = device_extractor.batch_device_names(
+                row[index] for row in rows
+            )
+            for row, device_name in zip(rows, device_names):
+                row[index] = device_name
+            return rows
+
+        return self._stream_log_data(
+            TABLE_LOGIN_LOG,
+            parameters,
+            QUERY_TYPE_LOGIN_LOG,
+            process_rows=process_device_names,
+            batch_size=batch_size,
+        )
+
+    def stream_user_forword_log(
+        self, parameters: Dict[str, Any], batch_size: Optional[int] = None
+    ) -> AsyncIterator[Tuple[List[str], List[List[Any]]]]:
+        """流式查询用户转账情况"""
+        return self._stream_log_data(
+            TABLE_FORWORD_LOG,
+            parameters,
+            QUERY_TYPE_FORWORD_LOG,
+            batch_size=batch_size,
+        )
+
     async def get_user_mtlogin(
         self,
         parameters: Dict[str, Any],
@@ -653,31 +834,44 @@ class WarehouseUserService:
     ) -> List[int]:
         """根据 t_member_root_path 的 path 层级获取 CRM 可访问的成员ID（含本人）。
 
-        - 先通过 `member_id = crm_user_id` 查出其 `path`
-        - 再通过 `path LIKE <path>%` 查出所有下级（包含本人）
+        - 成员层级索引已就绪且包含该CRM时，直接在内存中计算下级
+        - 否则回退到SQL：先查出CRM的 `path`，再通过 `path LIKE <path>,%` 查出所有下级
         - 如果传入 `restrict_to` 则仅返回其中属于可访问范围的ID
 
         返回：成员ID列表（int）
         """
-
-        def _to_int_safe(v: Any) -> Optional[int]:
-            """将可能带千分位的字符串安全转换为正整数。"""
-            if v is None:
-                return None
-            s = str(v).replace(",", "").strip()
-            if not s:
-                return None
-            try:
-                i = int(s)
-                return i if i > 0 else None
-            except Exception:
-                return None
-
         # 规范化 CRM ID
-        crm_id = _to_int_safe(crm_user_id)
+        crm_id = to_member_id(crm_user_id)
         if crm_id is None:
             return []
 
+        target_ids: Optional[List[int]] = None
+        if restrict_to:
+            # 过滤、去重并排序 restrict_to 中的有效整数ID
+            target_ids = sorted(
+                {i for i in (to_member_id(uid) for uid in restrict_to) if i is not None}
+            )
+            if not target_ids:
+                return []
+
+        if member_tree_index.ready and member_tree_index.contains(crm_id):
+            if target_ids is None:
+                return member_tree_index.descendants(crm_id)
+            ids = [uid for uid in target_ids if member_tree_index.is_under(uid, crm_id)]
+            # 索引刷新前新增的成员回退到SQL校验
+            unknown_ids = [
+                uid for uid in target_ids if not member_tree_index.contains(uid)
+            ]
+            if unknown_ids:
+                ids.extend(await self._query_accessible_member_ids(crm_id, unknown_ids))
+            return ids
+
+        return await self._query_accessible_member_ids(crm_id, target_ids)
+
+    async def _query_accessible_member_ids(
+        self, crm_id: int, target_ids: Optional[List[int]] = None
+    ) -> List[int]:
+        """通过 `path LIKE` 查询 CRM 可访问的成员ID（索引不可用时的回退路径）"""
         # 查询 CRM 本人的路径
         db = self._member_db or "devapi1_mtarde_c"
         path_rows = await base_db.execute_query(
@@ -693,15 +887,8 @@ class WarehouseUserService:
         where_clause = "member_id = %s OR path LIKE %s"
         base_params: List[Any] = [root_path, f"{root_path},%"]
 
-        # 查询所有下级（包含本人）；如 restrict_to 提供则限定在该集合内
-        if restrict_to:
-            # 过滤、去重并排序 restrict_to 中的有效整数ID
-            target_ids = sorted(
-                {i for i in (_to_int_safe(uid) for uid in restrict_to) if i is not None}
-            )
-            if not target_ids:
-                return []
-
+        # 查询所有下级（包含本人）；如 target_ids 提供则限定在该集合内
+        if target_ids:
             placeholders = ", ".join(["%s"] * len(target_ids))
             sql = (
                 f"SELECT member_id FROM {db}.t_member_root_path "
@@ -717,13 +904,28 @@ class WarehouseUserService:
         # 提取有效 member_id
         ids: List[int] = []
         for row in rows or []:
-            mid = _to_int_safe(row.get("member_id"))
+            mid = to_member_id(row.get("member_id"))
             if mid is not None:
                 ids.append(mid)
         return ids
 
     async def _get_crm_access_scope(self, crm_user_id: int) -> Dict[str, Any]:
-        """根据crm_user_id获取访问范围信息。
+        """根据crm_user_id获取访问范围信息（带缓存，详见 `_load_crm_access_scope`）
+
+        缓存在多个请求间共享：accessible_member_ids 以元组缓存，每次返回新的字典，调用方修改返回值不影响缓存。
+        """
+        crm_user_id = int(crm_user_id)
+
+        async def _load() -> Dict[str, Any]:
+            scope = await self._load_crm_access_scope(crm_user_id)
+            if scope.get("accessible_member_ids") is not None:
+                scope["accessible_member_ids"] = tuple(scope["accessible_member_ids"])
+            return scope
+
+        return dict(await access_scope_cache.get_or_load(crm_user_id, _load))
+
+    async def _load_crm_access_scope(self, crm_user_id: int) -> Dict[str, Any]:
+        """根据crm_user_id从数据仓库加载访问范围信息。
 
         规则：
         - admin(管理员)：由`t_member.admin`标识，值为1时拥有全部访问权限
@@ -1,11 +1,14 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import asyncio
 import importlib
 import logging
+import time
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 from app.models.schema import QueryDataResponse
+from core.config import settings
 from core.log import logger
 from core.query import QUERY_TYPES
 
@@ -114,6 +117,75 @@ class QueryService:
                 },
             )
 
+    def supports_stream(self, query_type: str) -> bool:
+        """查询类型是否支持流式查询"""
+        return bool(QUERY_TYPES.get(query_type, {}).get("stream_method"))
+
+    def stream_query(
+        self,
+        query_type: str,
+        parameters: Dict[str, Any],
+        batch_size: Optional[int] = None,
+    ) -> AsyncIterator[Tuple[List[str], List[List[Any]]]]:
+        """流式执行指定类型的查询（服务端游标，按批返回压缩格式的行）
+
+        参数:
+            query_type: 查询类型（需在QUERY_TYPES中配置stream_method）
+            parameters: 查询参数
+            batch_size: 每批行数，None表示使用默认值
+
+        返回:
+            异步迭代器，每项为 (列名列表, 行列表)；权限等错误在首次迭代时抛出
+
+        异常:
+            KeyError: 查询类型不存在或不支持流式查询时抛出
+        """
+        query_config = QUERY_TYPES.get(query_type)
+        if not query_config:
+            raise KeyError(f"未知的查询类型: {query_type}")
+        stream_method_name = query_config.get("stream_method")
+        service = self.get_service(query_config.get("query_service"))
+        if not stream_method_name or not service:
+            raise KeyError(f"查询类型不支持流式查询: {query_type}")
+        return getattr(service, stream_method_name)(parameters, batch_size=batch_size)
+
+    async def execute_batch_query(
+        self,
+        query_types: List[str],
+        parameters: Dict[str, Any],
+        max_concurrency: Optional[int] = None,
+    ) -> Dict[str, Tuple[QueryDataResponse, float]]:
+        """并发执行多个查询类型（单请求内限制并发数）
+
+        各查询类型相互独立，通过信号量限制同时占用的数据仓库连接数，
+        避免单个报表请求耗尽连接池。
+
+        参数:
+            query_types: 查询类型列表
+            parameters: 查询参数（每个查询类型使用独立副本）
+            max_concurrency: 最大并发数，None表示使用配置值
+
+        返回:
+            按query_types顺序排列的字典，值为 (查询结果, 耗时秒数)
+        """
+        if max_concurrency is None:
+            max_concurrency = settings.BATCH_QUERY_CONCURRENCY
+        # 去重并保持原有顺序
+        unique_types = list(dict.fromkeys(query_types))
+        semaphore = asyncio.Semaphore(max(1, min(max_concurrency, len(unique_types))))
+
+        async def _run(query_type: str) -> Tuple[QueryDataResponse, float]:
+            async with semaphore:
+                start_time = time.time()
+                # 子查询可能会修改参数（如默认limit），使用副本避免相互影响
+                result = await self.execute_query(query_type, dict(parameters or {}))
+                return result, time.time() - start_time
+
+        outcomes = await asyncio.gather(
+            *(_run(query_type) for query_type in unique_types)
+        )
+        return dict(zip(unique_types, outcomes))
+
 
 # 创建单例实例
 query_service = QueryService()
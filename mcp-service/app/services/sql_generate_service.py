@@ -6,6 +6,7 @@ from core.config import settings
 from core.log import logger
 from core.sql_config import SQL_TABLES, VALID_OPERATORS
 from utils.date import get_start_and_end_time
+from utils.pagination import decode_cursor
 
 
 class SQLGenerator:
@@ -32,6 +33,7 @@ class SQLGenerator:
         self.join_clauses: List[str] = []
         self.order_by = ""
         self.limit_clause = ""
+        self.page_size: Optional[int] = None
 
     def add_join_table(
         self,
@@ -335,6 +337,64 @@ class SQLGenerator:
         self.limit_clause = f" LIMIT {offset}, {limit}"
         return self
 
+    def seek(
+        self,
+        time_field: str,
+        key_field: str = "id",
+        direction: str = "DESC",
+        after: Optional[List[Any]] = None,
+        size: int = 100,
+        table_name: Optional[str] = None,
+    ) -> "SQLGenerator":
+        """
+        添加键集（seek）分页：按 (time_field, key_field) 排序，从游标位置之后继续读取
+        多取1条用于判断是否还有下一页，避免 OFFSET 深翻页和 COUNT(*) 扫描
+        :param time_field: 时间字段
+        :param key_field: 主键字段，保证排序唯一
+        :param direction: 排序方向（ASC或DESC）
+        :param after: 上一页最后一条记录的 [time_field值, key_field值]，None表示第一页
+        :param size: 每页记录数
+        :param table_name: 表名，用于处理联立查询中的字段歧义
+        :return: self，支持链式调用
+        """
+        direction = direction.upper()
+        if direction not in ("ASC", "DESC"):
+            raise ValueError("排序方向必须是'ASC'或'DESC'")
+        if size <= 0:
+            raise ValueError("每页记录数必须是正整数")
+        for field in (time_field, key_field):
+            if field not in self.table_config["fields"]:
+                raise ValueError(f"字段 {field} 不在表配置中")
+
+        prefix = table_name or (self.table_name if self.join_clauses else None)
+        qualified_time = f"{prefix}.{time_field}" if prefix else time_field
+        qualified_key = f"{prefix}.{key_field}" if prefix else key_field
+
+        if after is not None:
+            if len(after) != 2:
+                raise ValueError("分页游标必须包含时间字段与主键两个值")
+            op = "<" if direction == "DESC" else ">"
+            self.add_raw_condition(
+                f"({qualified_time} {op} %s OR "
+                f"({qualified_time} = %s AND {qualified_key} {op} %s))",
+                after[0],
+                after[0],
+                after[1],
+            )
+
+        # 游标取值依赖排序键，确保其出现在查询字段中
+        if key_field not in self.fields:
+            self.fields.append(key_field)
+        if time_field not in self.fields:
+            self.fields.append(time_field)
+
+        self.order_by = (
+            f" ORDER BY {qualified_time} {direction}, {qualified_key} {direction}"
+        )
+        self.page_size = int(size)
+        self.limit_clause = f" LIMIT {self.page_size + 1}"
+        return self
+
     def generate_select(
         self, selected_fields: Optional[List[str]] = None
     ) -> Tuple[str, List[Any]]:
@@ -405,12 +465,23 @@ class SQLGenerator:
             sql = f"({sql})"
         return sql, params
 
+    def _add_time_range(
+        self, parameters: Dict[str, Any], time_field: str, isstrptime: bool
+    ) -> None:
+        """根据参数中的起止时间添加时间范围条件"""
+        start_time, end_time = get_start_and_end_time(parameters, isstrptime)
+        if start_time and time_field:
+            self.add_condition(time_field, ">=", start_time)
+        if end_time and time_field:
+            self.add_condition(time_field, "<=", end_time)
+
     def generate_sql(
         self,
         parameters: Dict[str, Any],
         time_field: str = "create_time",
         isstrptime: bool = False,
         order_by: Optional[Tuple[str, str]] = None,
+        default_limit: Optional[int] = None,
     ) -> Tuple[str, List[Any]]:
         """
         生成完整的SQL查询语句
@@ -418,15 +489,11 @@ class SQLGenerator:
         :param time_field: 时间字段名
         :param isstrptime: 是否需要转换时间格式
         :param order_by: 排序字段和方向的元组 (field, direction)
+        :param default_limit: 参数中未指定limit时使用的限制条数，默认为settings.DEFAULT_LIMIT
         :return: (SQL语句, 参数列表)
         """
         # 处理时间范围条件
-        start_time, end_time = get_start_and_end_time(parameters, isstrptime)
-        # print("====start_time, end_time====== ", start_time, end_time)
-        if start_time and time_field:
-            self.add_condition(time_field, ">=", start_time)
-        if end_time and time_field:
-            self.add_condition(time_field, "<=", end_time)
+        self._add_time_range(parameters, time_field, isstrptime)
 
         # 处理排序
         if order_by:
@@ -442,5 +509,43 @@ class SQLGenerator:
             else:
                 raise ValueError(f"limit参数必须是正整数，当前值: {parameters_limit}")
         else:
-            self.limit(settings.DEFAULT_LIMIT)
+            self.limit(default_limit or settings.DEFAULT_LIMIT)
         return self.generate_select()
+
+    def generate_keyset_sql(
+        self,
+        parameters: Dict[str, Any],
+        time_field: str = "create_time",
+        isstrptime: bool = False,
+        key_field: str = "id",
+        direction: str = "DESC",
+    ) -> Tuple[str, List[Any], str, List[Any]]:
+        """
+        生成键集分页查询语句及对应的COUNT语句
+        :param parameters: 查询参数字典，size为每页记录数，cursor为上一页返回的游标
+        :param time_field: 时间字段名
+        :param isstrptime: 是否需要转换时间格式
+        :param key_field: 主键字段名
+        :param direction: 排序方向
+        :return: (分页SQL, 参数列表, COUNT SQL, COUNT参数列表)
+        """
+        self._add_time_range(parameters, time_field, isstrptime)
+
+        # COUNT语句只包含过滤条件，不受游标位置影响，便于按条件缓存总数
+        count_sql, count_params = self.generate_count()
+        count_params = list(count_params)
+
+        size = parameters.get("size") or parameters.get("limit") or 100
+        try:
+            size = int(size)
+        except (TypeError, ValueError):
+            raise ValueError(f"size参数必须是正整数，当前值: {size}")
+        if size <= 0:
+            raise ValueError(f"size参数必须是正整数，当前值: {size}")
+        size = min(size, settings.DEFAULT_LIMIT)
+
+        cursor = parameters.get("cursor")
+        after = decode_cursor(cursor, 2) if cursor else None
+        self.seek(time_field, key_field, direction, after=after, size=size)
+        sql, params = self.generate_select()
+        return sql, list(params), count_sql, count_params
@@ -98,6 +98,48 @@ class Settings(BaseSettings):
 
     # 数据源配置
     DEFAULT_LIMIT: int = 1000
+    # 流式查询（is_stream）未指定limit时的最大返回条数
+    STREAM_DEFAULT_LIMIT: int = int(os.getenv("MCP_STREAM_DEFAULT_LIMIT", "1000000"))
+
+    # 批量查询配置（单个请求内并发执行的查询类型上限，避免占满数据仓库连接池）
+    BATCH_QUERY_CONCURRENCY: int = int(os.getenv("MCP_BATCH_QUERY_CONCURRENCY", "4"))
+
+    # CRM访问范围缓存配置
+    ACCESS_SCOPE_CACHE_TTL: int = int(os.getenv("MCP_ACCESS_SCOPE_CACHE_TTL", "300"))
+    ACCESS_SCOPE_CACHE_MAX_SIZE: int = 10000
+
+    # 成员层级索引配置（基于t_member_root_path）
+    MEMBER_INDEX_ENABLED: bool = (
+        os.getenv("MCP_MEMBER_INDEX_ENABLED", "True").lower() == "true"
+    )
+    MEMBER_INDEX_REFRESH_INTERVAL: int = int(
+        os.getenv("MCP_MEMBER_INDEX_REFRESH_INTERVAL", "60")
+    )  # 增量刷新间隔（秒）
+    MEMBER_INDEX_FULL_REBUILD_INTERVAL: int = 3600  # 全量重建间隔（秒）
+    MEMBER_INDEX_BATCH_SIZE: int = 50000
+
+    # mt交易账号查询缓存配置
+    MTLOGIN_CACHE_TTL: int = int(os.getenv("MCP_MTLOGIN_CACHE_TTL", "300"))
+    MTLOGIN_CACHE_MAX_SIZE: int = 2000
+
+    # 分页查询精确总数缓存配置
+    PAGINATION_COUNT_CACHE_TTL: int = int(
+        os.getenv("MCP_PAGINATION_COUNT_CACHE_TTL", "120")
+    )
+    PAGINATION_COUNT_CACHE_MAX_SIZE: int = 1000
+
+    # TDengine行情库配置（REST接口）
+    TDENGINE_REST_URL: str = os.getenv("TDENGINE_REST_URL", "http://122.51.27.47:6041")
+    TDENGINE_USER: str = os.getenv("TDENGINE_USER", "root")
+    TDENGINE_PASSWORD: str = os.getenv("TDENGINE_PASSWORD", "taosdata")
+    TDENGINE_DATABASE: str = os.getenv("TDENGINE_DATABASE", "GTC-Demo_5")
+    TDENGINE_TIMEOUT: float = float(os.getenv("TDENGINE_TIMEOUT", "30"))
+    TDENGINE_MAX_CONNECTIONS: int = 20
+    TDENGINE_MAX_KEEPALIVE_CONNECTIONS: int = 10
+
+    # K线缓存配置（已收盘的K线按品种、周期缓存，只实时获取最新一根）
+    CANDLE_CACHE_TTL: int = int(os.getenv("MCP_CANDLE_CACHE_TTL", "3600"))
+    CANDLE_CACHE_MAX_SIZE: int = 500
 
 
 settings = Settings()
@@ -20,6 +20,7 @@ QUERY_TYPES = {
         "description": "用户资金信息查询",
         "query_service": "warehouse_user_service",
         "service_method": "get_user_amount_log",
+        "stream_method": "stream_user_amount_log",
         "required_params": ["crm_user_id"],
         "one_of_params": ["user_id", "username", "user_name", "email"],
         "optional_params": [
@@ -28,6 +29,9 @@ QUERY_TYPES = {
             "limit",
             "page",
             "size",
+            "cursor",
+            "pagination",
+            "total_mode",
         ],
     },
     "user_login_log": {
@@ -35,6 +39,7 @@ QUERY_TYPES = {
         "description": "用户登录信息查询",
         "query_service": "warehouse_user_service",
         "service_method": "get_user_login_log",
+        "stream_method": "stream_user_login_log",
         "required_params": ["crm_user_id"],
         "one_of_params": ["user_id", "username", "user_name", "email"],
         "optional_params": [
@@ -43,6 +48,9 @@ QUERY_TYPES = {
             "limit",
             "page",
             "size",
+            "cursor",
+            "pagination",
+            "total_mode",
         ],
     },
     "user_forword_log": {
@@ -50,6 +58,7 @@ QUERY_TYPES = {
         "description": "用户转账信息查询",
         "query_service": "warehouse_user_service",
         "service_method": "get_user_forword_log",
+        "stream_method": "stream_user_forword_log",
         "required_params": ["crm_user_id"],
         "one_of_params": ["user_id", "username", "user_name", "email"],
         "optional_params": [
@@ -58,6 +67,9 @@ QUERY_TYPES = {
             "limit",
             "page",
             "size",
+            "cursor",
+            "pagination",
+            "total_mode",
         ],
     },
     "user_mtlogin": {
@@ -74,6 +86,7 @@ QUERY_TYPES = {
         "description": "用户mt4交易信息查询",
         "query_service": "mt4_service",
         "service_method": "get_mt4_194_trades",
+        "stream_method": "stream_mt4_194_trades",
         "required_params": ["crm_user_id"],
         "one_of_params": ["user_id", "username", "user_name"],
         "optional_params": [
@@ -97,6 +110,7 @@ QUERY_TYPES = {
         "description": "用户mt5交易信息查询",
         "query_service": "mt5_service",
         "service_method": "get_mt5_1110_trades",
+        "stream_method": "stream_mt5_1110_trades",
         "required_params": ["crm_user_id"],
         "one_of_params": ["user_id", "username", "user_name"],
         "optional_params": [
@@ -120,6 +134,7 @@ QUERY_TYPES = {
         "description": "用户mt5持仓信息查询",
         "query_service": "mt5_service",
         "service_method": "get_mt5_1110_positions",
+        "stream_method": "stream_mt5_1110_positions",
         "required_params": ["crm_user_id"],
         "one_of_params": ["user_id", "username", "user_name"],
         "optional_params": [
@@ -134,8 +149,18 @@ QUERY_TYPES = {
         "description": "用户操作日志查询",
         "query_service": "warehouse_user_service",
         "service_method": "get_user_op_log",
+        "stream_method": "stream_user_op_log",
         "required_params": ["crm_user_id"],
-        "optional_params": ["start_time", "end_time", "limit", "page", "size"],
+        "optional_params": [
+            "start_time",
+            "end_time",
+            "limit",
+            "page",
+            "size",
+            "cursor",
+            "pagination",
+            "total_mode",
+        ],
     },
     "direct_staff_statistics": {
         "name": "客户或员工用户统计",
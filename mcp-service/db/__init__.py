@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 # MCP Service Database Package
 from .admin import admin_db
+from .tdengine import tdengine_client
 from .warehouse import warehouse_db
 
-__all__ = ["warehouse_db", "admin_db"]
+__all__ = ["warehouse_db", "admin_db", "tdengine_client"]
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+import httpx
+
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class TDengineClient:
+    """TDengine REST接口异步客户端 - 复用长连接，不阻塞事件循环"""
+
+    def __init__(self, base_url: Optional[str] = None):
+        self.base_url = (base_url or settings.TDENGINE_REST_URL).rstrip("/")
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """获取当前事件循环下复用的HTTP客户端"""
+        loop = asyncio.get_running_loop()
+        if (
+            self._client is None
+            or self._client.is_closed
+            or self._client_loop is not loop
+        ):
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                auth=(settings.TDENGINE_USER, settings.TDENGINE_PASSWORD),
+                timeout=settings.TDENGINE_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=settings.TDENGINE_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.TDENGINE_MAX_KEEPALIVE_CONNECTIONS,
+                ),
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def query(self, sql: str) -> Optional[Dict[str, Any]]:
+        """
+        执行SQL
+
+        参数:
+            sql: SQL语句
+
+        返回:
+            REST接口返回的结果（column_meta、data等），请求失败时返回None
+        """
+        response = await self._get_client().post(
+            "/rest/sql", content=sql.encode("utf-8")
+        )
+        if response.status_code != 200:
+            logger.warning(
+                f"TDengine查询失败: {response.status_code} {response.text[:200]}"
+            )
+            return None
+        result = response.json()
+        if result.get("code", 0) != 0:
+            logger.warning(f"TDengine查询失败: {result.get('code')} {result.get('desc')}")
+            return None
+        return result
+
+    async def close(self):
+        """关闭HTTP连接"""
+        client, self._client, self._client_loop = self._client, None, None
+        if client is not None and not client.is_closed:
+            await client.aclose()
+
+
+tdengine_client = TDengineClient()
@@ -4,11 +4,13 @@ import asyncio
 import logging
 import time
 from contextlib import asynccontextmanager
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
 
 import aiomysql
 
 from core.config import settings
+from utils.cache import TTLCache
+from utils.pagination import encode_cursor
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +28,13 @@ class WarehouseDB:
         self.min_size = 10  # 连接池最小连接数（提高最小连接数）
         self.max_size = 50  # 连接池最大连接数（适应当前连接负载）
         self.query_timeout = 60  # 查询超时时间（秒）- 给复杂查询更多时间
+        self.stream_batch_size = 1000  # 流式查询每批返回的行数
+        # 分页查询精确总数缓存（按COUNT语句与参数），翻页时避免重复全量扫描
+        self.count_cache = TTLCache(
+            "paginated_count",
+            max_size=settings.PAGINATION_COUNT_CACHE_MAX_SIZE,
+            ttl=settings.PAGINATION_COUNT_CACHE_TTL,
+        )
         self.connection_timeout = 10  # 连接超时时间（秒）
         self.max_retries = 3  # 最大重试次数
         # 连接验证超时时间
@@ -248,6 +257,58 @@ class WarehouseDB:
             raise last_error
         return []
 
+    async def stream_query(
+        self,
+        sql: str,
+        params: Optional[tuple] = None,
+        batch_size: Optional[int] = None,
+        timeout: Optional[int] = None,
+    ) -> AsyncIterator[Tuple[List[str], List[tuple]]]:
+        """流式执行SQL查询 - 使用服务端游标（SSCursor）分批读取
+
+        结果不在客户端整体缓冲，内存占用与批大小成正比。已开始返回数据后无法重试，
+        因此不做重试；调用方提前退出时游标会在关闭前读尽剩余结果。
+
+        参数:
+            sql: SQL查询语句
+            params: 查询参数
+            batch_size: 每批行数，None表示使用默认值
+            timeout: 单次读取超时时间（秒），None表示使用默认值
+
+        返回:
+            异步迭代器，每项为 (列名列表, 行元组列表)；无数据时返回一次空批次
+        """
+        if timeout is None:
+            timeout = self.query_timeout
+        if batch_size is None:
+            batch_size = self.stream_batch_size
+
+        async with self.connection() as conn:
+            async with conn.cursor(aiomysql.SSCursor) as cursor:
+                try:
+                    await asyncio.wait_for(
+                        cursor.execute(sql, params or ()), timeout=timeout
+                    )
+                    columns = [column[0] for column in cursor.description or ()]
+                    has_rows = False
+                    while True:
+                        rows = await asyncio.wait_for(
+                            cursor.fetchmany(batch_size), timeout=timeout
+                        )
+                        if not rows:
+                            break
+                        has_rows = True
+                        yield columns, list(rows)
+                    if not has_rows:
+                        yield columns, []
+                except asyncio.TimeoutError as e:
+                    logger.error(f"流式查询超时: {sql[:100]}...")
+                    raise TimeoutError(f"数据库查询超时（{timeout}秒）") from e
+                except aiomysql.OperationalError as e:
+                    logger.error(f"流式查询连接错误: {e}, SQL: {sql[:100]}...")
+                    await self.refresh_pool()
+                    raise
+
     async def execute_batch_query(
         self, queries: Dict[str, Dict[str, Any]], timeout: Optional[int] = None
     ) -> Dict[str, Any]:
@@ -294,72 +355,146 @@ class WarehouseDB:
                 await self.refresh_pool()
             raise
 
+    async def _fetch_all(
+        self, conn, sql: str, params: Optional[Any], timeout: int
+    ) -> List[Dict[str, Any]]:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await asyncio.wait_for(cursor.execute(sql, params or ()), timeout=timeout)
+            return await asyncio.wait_for(cursor.fetchall(), timeout=timeout)
+
+    async def _count_total(
+        self,
+        conn,
+        count_sql: str,
+        count_params: Optional[Any],
+        total_mode: str,
+        timeout: int,
+    ) -> Tuple[Optional[int], bool]:
+        """获取总记录数，返回 (总数, 是否为估算值)
+
+        - exact: 精确COUNT，结果按 (SQL, 参数) 短时缓存，翻页时不重复扫描
+        - estimate: 使用 EXPLAIN 的预估扫描行数，不扫描数据
+        - none: 不计算总数
+        """
+        if total_mode == "none":
+            return None, False
+
+        cache_key = (count_sql, tuple(count_params or ()))
+        if total_mode == "estimate":
+            rows = await self._fetch_all(
+                conn, f"EXPLAIN {count_sql}", count_params, timeout
+            )
+            if not rows:
+                return None, True
+            first = rows[0]
+            estimated = float(first.get("rows") or 0)
+            filtered = first.get("filtered")
+            if filtered is not None:
+                estimated = estimated * float(filtered) / 100
+            return int(estimated), True
+
+        cached = self.count_cache.get(cache_key)
+        if cached is not None:
+            return cached, False
+        rows = await self._fetch_all(conn, count_sql, count_params, timeout)
+        total = int(list(rows[0].values())[0]) if rows else 0
+        self.count_cache.set(cache_key, total)
+        return total, False
+
     async def execute_paginated_query(
         self,
         sql: str,
-        params: Optional[tuple] = None,
+        params: Optional[Any] = None,
         page_size: int = 100,
         page: int = 1,
         timeout: Optional[int] = None,
+        keyset_fields: Optional[Sequence[str]] = None,
+        count_sql: Optional[str] = None,
+        count_params: Optional[Any] = None,
+        total_mode: str = "exact",
     ) -> Dict[str, Any]:
         """执行分页查询 - 为大数据集优化
 
+        支持两种模式：
+        - 键集模式（传入keyset_fields）：sql 需由 SQLGenerator.seek 生成（已包含游标条件、
+          排序与 LIMIT page_size+1），按上一页最后一条记录定位，深翻页耗时不随页码增长
+        - 偏移模式（默认）：在 sql 后追加 LIMIT offset, page_size+1，按页码访问
+
+        两种模式均多取1条判断 has_more，总数按 total_mode 获取（exact/estimate/none）。
+
         参数:
-            sql: 基础SQL查询语句（不包含LIMIT）
+            sql: 查询SQL语句
             params: 查询参数
             page_size: 每页记录数
-            page: 页码（从1开始）
+            page: 页码（从1开始，仅偏移模式使用）
             timeout: 查询超时时间（秒）
+            keyset_fields: 游标排序键字段，如 ("create_time", "id")
+            count_sql: 计算总数的SQL，为空时包装原SQL计算
+            count_params: 计算总数的SQL参数
+            total_mode: 总数获取方式，exact（默认，按条件缓存）/estimate/none
 
         返回:
-            包含分页数据和元信息的字典
+            包含分页数据和元信息的字典，键集模式下 metadata.next_cursor 为下一页游标
         """
         if timeout is None:
             timeout = self.query_timeout
+        if total_mode not in ("exact", "estimate", "none"):
+            raise ValueError(f"无效的总数获取方式: {total_mode}")
+        if page_size <= 0:
+            raise ValueError("每页记录数必须是正整数")
 
-        # 计算总记录数
-        count_sql = f"SELECT COUNT(*) as total FROM ({sql}) as t"
+        if keyset_fields:
+            paginated_sql = sql
+        else:
+            page = max(int(page or 1), 1)
+            offset = (page - 1) * page_size
+            paginated_sql = f"{sql} LIMIT {offset}, {page_size + 1}"
 
-        # 添加分页
-        offset = (page - 1) * page_size
-        paginated_sql = f"{sql} LIMIT {offset}, {page_size}"
+        if count_sql is None:
+            count_sql = f"SELECT COUNT(*) as total FROM ({sql}) as t"
+            count_params = params
 
         try:
             # 使用上下文管理器确保连接被正确释放
             async with self.connection() as conn:
-                total_count = 0
-
-                # 获取总记录数
-                async with conn.cursor(aiomysql.DictCursor) as cursor:
-                    await asyncio.wait_for(
-                        cursor.execute(count_sql, params or ()), timeout=timeout
-                    )
-                    count_result = await asyncio.wait_for(
-                        cursor.fetchone(), timeout=timeout
-                    )
-                    if count_result:
-                        total_count = count_result["total"]
-
-                # 获取分页数据
-                async with conn.cursor(aiomysql.DictCursor) as cursor:
-                    await asyncio.wait_for(
-                        cursor.execute(paginated_sql, params or ()), timeout=timeout
+                data = await self._fetch_all(conn, paginated_sql, params, timeout)
+                has_more = len(data) > page_size
+                data = data[:page_size]
+
+                # 首页数据不足一页时无需再计算总数
+                if (
+                    total_mode != "none"
+                    and not has_more
+                    and not keyset_fields
+                    and page == 1
+                ):
+                    total_count, total_is_estimate = len(data), False
+                else:
+                    total_count, total_is_estimate = await self._count_total(
+                        conn, count_sql, count_params, total_mode, timeout
                     )
-                    data = await asyncio.wait_for(cursor.fetchall(), timeout=timeout)
 
-                total_pages = (
-                    (total_count + page_size - 1) // page_size if page_size > 0 else 0
+            metadata: Dict[str, Any] = {
+                "page_size": page_size,
+                "has_more": has_more,
+                "total_count": total_count,
+                "total_is_estimate": total_is_estimate,
+                "total_pages": (
+                    (total_count + page_size - 1) // page_size
+                    if total_count is not None
+                    else None
+                ),
+            }
+            if keyset_fields:
+                metadata["next_cursor"] = (
+                    encode_cursor([data[-1].get(f) for f in keyset_fields])
+                    if has_more and data
+                    else None
                 )
+            else:
+                metadata["page"] = page
 
-                return {
-                    "data": data,
-                    "metadata": {
-                        "page": page,
-                        "page_size": page_size,
-                        "total_pages": total_pages,
-                        "total_count": total_count,
-                    },
-                }
+            return {"data": data, "metadata": metadata}
         except asyncio.TimeoutError:
             logger.error(f"分页查询超时: {paginated_sql[:100]}...")
             raise TimeoutError(f"分页查询超时（{timeout}秒）")
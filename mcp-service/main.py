@@ -8,8 +8,10 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.api_v1.api import api_router
+from app.services.access_scope_service import member_tree_index
 from core.config import settings
 from core.log import logger, set_custom_logfile, setup_logging
+from db.tdengine import tdengine_client
 from db.warehouse import warehouse_db
 
 # 初始化日志系统
@@ -29,8 +31,14 @@ async def lifespan(app: FastAPI):
         logger.error(f"数据库连接池初始化失败: {e}")
         raise
 
+    # 启动成员层级索引定时刷新（后台构建，未就绪前权限校验回退到SQL）
+    member_tree_index.start()
+
     yield
 
+    await member_tree_index.stop()
+    await tdengine_client.close()
+
     # 关闭时清理数据库连接池
     logger.info("正在关闭数据库连接池...")
     try:
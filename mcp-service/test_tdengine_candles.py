@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试K线查询（TDengine REST客户端与已收盘K线缓存）
+
+在本地启动模拟的 TDengine REST 服务，TDENGINE_REST_URL 指向该服务，
+校验首次完整查询、增量查询合并最新一根K线，以及超出时间范围的K线被移除。
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COLUMN_META = [
+    ["t", "TIMESTAMP", 8],
+    ["o", "DOUBLE", 8],
+    ["h", "DOUBLE", 8],
+    ["l", "DOUBLE", 8],
+    ["c", "DOUBLE", 8],
+    ["v", "DOUBLE", 8],
+]
+
+NOW = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def bar(minutes_ago: int, close: float) -> list:
+    """生成一根1分钟K线，时间桶为RFC3339字符串"""
+    t = (NOW - timedelta(minutes=minutes_ago)).isoformat(timespec="milliseconds")
+    return [t, close, close + 1, close - 1, close, 10]
+
+
+class FakeTDengine:
+    """按SQL返回预设结果的模拟服务，记录收到的SQL"""
+
+    def __init__(self):
+        self.queries = []
+        self.full_rows = []
+        self.incremental_rows = []
+
+    def handle(self, sql: str) -> dict:
+        self.queries.append(sql)
+        rows = self.incremental_rows if "t >= '" in sql else self.full_rows
+        return {"code": 0, "column_meta": COLUMN_META, "data": rows, "rows": len(rows)}
+
+
+fake = FakeTDengine()
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        sql = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode(
+            "utf-8"
+        )
+        body = json.dumps(fake.handle(sql)).encode("utf-8")
+        self.send_response(200 if self.path == "/rest/sql" else 404)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+# 客户端在导入时读取配置，需先指向模拟服务
+os.environ["TDENGINE_REST_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+
+from app.services.query.tool_service import ToolService  # noqa: E402
+from db.tdengine import tdengine_client  # noqa: E402
+
+
+async def test_first_load():
+    """测试首次完整查询"""
+    print("1. 测试首次完整查询...")
+    service = ToolService()
+    fake.queries.clear()
+    fake.full_rows = [bar(0, 1.5), bar(1, 1.4), bar(2, 1.3)]
+
+    response = await service.get_wh_data({"code": "EURUSD", "days": "1", "period": "1"})
+    rows = response.data["rows"]
+    if len(fake.queries) != 1 or "now()-1*86400*1000" not in fake.queries[0]:
+        print(f"✗ 查询异常: {fake.queries}")
+        return False
+    if response.data["columns"][0] != "MT_DATE" or rows != fake.full_rows:
+        print(f"✗ 返回数据异常: {response.data}")
+        return False
+    print("✓ 首次查询返回完整K线")
+    return True
+
+
+async def test_incremental_merge():
+    """测试增量查询合并最新一根K线"""
+    print("\n2. 测试增量查询合并...")
+    service = ToolService()
+    fake.full_rows = [bar(1, 1.4), bar(2, 1.3), bar(3, 1.2)]
+    await service.get_wh_data({"code": "EURUSD", "days": "1", "period": "1"})
+
+    # 原最新一根收盘（收盘价更新），并产生新的一根
+    fake.queries.clear()
+    fake.incremental_rows = [bar(0, 1.6), bar(1, 1.45)]
+    response = await service.get_wh_data({"code": "EURUSD", "days": "1", "period": "1"})
+
+    open_from = bar(1, 0)[0]
+    if len(fake.queries) != 1 or f"t >= '{open_from}'" not in fake.queries[0]:
+        print(f"✗ 未按最新一根时间桶增量查询: {fake.queries}")
+        return False
+    expected = [bar(0, 1.6), bar(1, 1.45), bar(2, 1.3), bar(3, 1.2)]
+    if response.data["rows"] != expected:
+        print(f"✗ 合并结果异常: {response.data['rows']}")
+        return False
+    if "now()-1*86400*1000" not in response.sql_info["sql"]:
+        print(f"✗ sql_info 应为请求参数对应的完整查询: {response.sql_info}")
+        return False
+    print("✓ 增量查询只更新最新一根及之后的K线")
+    return True
+
+
+async def test_trim_to_window():
+    """测试移除超出时间范围的K线"""
+    print("\n3. 测试按时间范围裁剪...")
+    service = ToolService()
+    # days=0.002（约2.9分钟），结束时间早于范围起点的K线应被移除
+    fake.full_rows = [bar(0, 1.5), bar(1, 1.4), bar(3, 1.3), bar(5, 1.2)]
+    await service.get_wh_data({"code": "GBPUSD", "days": "0.002", "period": "1"})
+    fake.incremental_rows = [bar(0, 1.55)]
+    response = await service.get_wh_data(
+        {"code": "GBPUSD", "days": "0.002", "period": "1"}
+    )
+
+    if response.data["rows"] != [bar(0, 1.55), bar(1, 1.4), bar(3, 1.3)]:
+        print(f"✗ 裁剪结果异常: {response.data['rows']}")
+        return False
+    print("✓ 超出时间范围的K线已移除")
+    return True
+
+
+async def run_all_tests():
+    """运行所有测试"""
+    print("=" * 50)
+    print("K线查询测试")
+    print("=" * 50)
+
+    tests = [
+        ("首次完整查询", test_first_load),
+        ("增量查询合并", test_incremental_merge),
+        ("按时间范围裁剪", test_trim_to_window),
+    ]
+
+    results = []
+    for test_name, test_func in tests:
+        try:
+            result = await test_func()
+            results.append((test_name, result))
+        except Exception as e:
+            print(f"✗ {test_name} 测试异常: {e}")
+            results.append((test_name, False))
+
+    await tdengine_client.close()
+    server.shutdown()
+
+    print("\n" + "=" * 50)
+    print("测试结果汇总:")
+    print("=" * 50)
+    for test_name, result in results:
+        status = "✓ 通过" if result else "✗ 失败"
+        print(f"{test_name}: {status}")
+
+    all_passed = all(result for _, result in results)
+    print("\n" + "=" * 50)
+    print("✓ 所有测试通过！" if all_passed else "✗ 部分测试失败，请检查问题")
+    print("=" * 50)
+    return all_passed
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(run_all_tests()) else 1)
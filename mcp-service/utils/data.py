@@ -56,6 +56,20 @@ def compress_data(
     return {"columns": columns, "rows": rows, "count": len(rows)}
 
 
+def compress_rows(columns: List[str], rows: List[Any]) -> List[List[Any]]:
+    """
+    将游标返回的行元组转换为压缩格式中的rows（过滤null值）
+
+    参数:
+        columns: 列名列表
+        rows: 行元组列表，如 [(val1, val2), (val3, val4)]
+
+    返回:
+        行列表，如 [[val1, val2], [val3, val4]]
+    """
+    return [[filter_null_values(value) for value in row] for row in rows]
+
+
 def decompress_data(
     compressed_data: Dict[str, Union[List[str], List[List[Any]]]]
 ) -> List[Dict[str, Any]]:
@@ -7,15 +7,16 @@
 
 import json
 import re
-from typing import Dict, List, Optional
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
 
 
 class DeviceNameExtractor:
     """设备名称提取器类"""
 
-    def __init__(self):
+    def __init__(self, max_cache_size: int = 4096):
         # 定义各种设备类型的正则表达式
-        self.patterns = {
+        patterns = {
             "desktop": {
                 "windows": r"Windows NT (\d+\.\d+)",
                 "mac": r"Macintosh; Intel Mac OS X (\d+_\d+_\d+)",
@@ -37,6 +38,15 @@ class DeviceNameExtractor:
                 "custom_app": r"(\w+)/(\d+\.\d+\.\d+)",
             },
         }
+        # 预编译正则，避免每行数据重复查找/编译
+        self.patterns = {
+            category: {name: re.compile(pattern) for name, pattern in items.items()}
+            for category, items in patterns.items()
+        }
+        # User-Agent -> 设备名称 的有界缓存，登录日志中大量行共用少量User-Agent
+        self._cached_device_name = lru_cache(maxsize=max_cache_size)(
+            self._parse_device_name
+        )
 
     def extract_device_name(self, user_agent: str) -> Dict[str, str]:
         """
@@ -81,56 +91,56 @@ class DeviceNameExtractor:
         # 检测操作系统
         if "windows" in user_agent_lower:
             result["os"] = "Windows"
-            match = re.search(self.patterns["desktop"]["windows"], user_agent)
+            match = self.patterns["desktop"]["windows"].search(user_agent)
             if match:
                 result["os_version"] = match.group(1)
         elif "macintosh" in user_agent_lower:
             result["os"] = "macOS"
-            match = re.search(self.patterns["desktop"]["mac"], user_agent)
+            match = self.patterns["desktop"]["mac"].search(user_agent)
             if match:
                 result["os_version"] = match.group(1).replace("_", ".")
         elif "linux" in user_agent_lower:
             result["os"] = "Linux"
-            match = re.search(self.patterns["desktop"]["linux"], user_agent)
+            match = self.patterns["desktop"]["linux"].search(user_agent)
             if match:
                 result["os_version"] = match.group(0)
         elif "android" in user_agent_lower:
             result["os"] = "Android"
-            match = re.search(self.patterns["mobile"]["android"], user_agent)
+            match = self.patterns["mobile"]["android"].search(user_agent)
             if match:
                 result["os_version"] = match.group(0)
         elif "iphone" in user_agent_lower:
             result["os"] = "iOS"
-            match = re.search(self.patterns["mobile"]["iphone"], user_agent)
+            match = self.patterns["mobile"]["iphone"].search(user_agent)
             if match:
                 result["os_version"] = match.group(1).replace("_", ".")
 
         # 检测浏览器
         if "chrome" in user_agent_lower:
             result["browser"] = "Chrome"
-            match = re.search(self.patterns["browser"]["chrome"], user_agent)
+            match = self.patterns["browser"]["chrome"].search(user_agent)
             if match:
                 result["browser_version"] = match.group(1)
         elif "firefox" in user_agent_lower:
             result["browser"] = "Firefox"
-            match = re.search(self.patterns["browser"]["firefox"], user_agent)
+            match = self.patterns["browser"]["firefox"].search(user_agent)
             if match:
                 result["browser_version"] = match.group(1)
         elif "safari" in user_agent_lower:
             result["browser"] = "Safari"
-            match = re.search(self.patterns["browser"]["safari"], user_agent)
+            match = self.patterns["browser"]["safari"].search(user_agent)
             if match:
                 result["browser_version"] = match.group(1)
         elif "edge" in user_agent_lower:
             result["browser"] = "Edge"
-            match = re.search(self.patterns["browser"]["edge"], user_agent)
+            match = self.patterns["browser"]["edge"].search(user_agent)
             if match:
                 result["browser_version"] = match.group(1)
 
         # 检测应用
         if "fxapp" in user_agent_lower:
             result["app_name"] = "fxapp"
-            match = re.search(self.patterns["app"]["fxapp"], user_agent)
+            match = self.patterns["app"]["fxapp"].search(user_agent)
             if match:
                 result["app_version"] = match.group(2)
 
@@ -167,6 +177,40 @@ class DeviceNameExtractor:
         """批量处理多个User-Agent字符串"""
         return [self.extract_device_name(ua) for ua in user_agents]
 
+    def _parse_device_name(self, user_agent: str) -> str:
+        return self.extract_device_name(user_agent)["device_name"]
+
+    def get_device_name(self, user_agent: Optional[str]) -> str:
+        """
+        获取User-Agent对应的设备名称（带缓存）
+
+        Args:
+            user_agent: User-Agent字符串，None视为空字符串
+
+        Returns:
+            设备名称
+        """
+        return self._cached_device_name(user_agent or "")
+
+    def batch_device_names(self, user_agents: Iterable[Optional[str]]) -> List[str]:
+        """
+        批量获取设备名称，同一批次中相同的User-Agent只解析一次
+
+        Args:
+            user_agents: User-Agent字符串序列
+
+        Returns:
+            与输入顺序一致的设备名称列表
+        """
+        names: Dict[Optional[str], str] = {}
+        result = []
+        for user_agent in user_agents:
+            name = names.get(user_agent)
+            if name is None:
+                name = names[user_agent] = self.get_device_name(user_agent)
+            result.append(name)
+        return result
+
     def filter_by_device_type(
         self, results: List[Dict[str, str]], device_type: str
     ) -> List[Dict[str, str]]: